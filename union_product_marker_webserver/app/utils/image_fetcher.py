@@ -0,0 +1,238 @@
+"""
+图片按需下载模块
+
+爬虫开启延迟下载（crawler.lazy_images）时只在商品目录中写入图片清单
+（<prefix>_<id>.images.json），不下载图片。这个模块负责在图片首次被请求时下载：
+1. 按清单查找图片文件名对应的下载 URL（按优先级排列，前者失败时依次尝试）
+2. 后台线程从队列中取任务下载，同一张图片的并发请求只下载一次
+3. 先写入 .part 临时文件，完成后原子改名，保存位置与立即下载模式完全相同
+4. 请求方只短暂等待，未下载完时先返回 404，前端稍后重新请求时直接读取文件
+
+注意：按需下载的图片不经过爬虫的图片存储（image_store）、尺寸探测（image_probe）和
+衍生图生成（image_derivatives），只保存清单中的文件本身；需要这些处理时请关闭延迟下载模式
+
+主要功能：
+- 为 /images/<path> 路由提供缺失图片的按需下载
+- 使用标准库 urllib，不引入额外依赖
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import json
+import glob
+import queue
+import threading
+import urllib.request
+
+# 图片清单文件后缀（与爬虫 BaseScraper.write_image_manifest 一致）
+MANIFEST_SUFFIX = ".images.json"
+
+# 后台下载线程数
+FETCH_WORKERS = 4
+
+# 单张图片的下载超时秒数
+FETCH_TIMEOUT = 15
+
+# 请求方等待下载完成的最长秒数（超过后先返回，避免占满 Web 服务的工作线程）
+REQUEST_WAIT = 2
+
+# 下载图片时使用的 User-Agent（部分 CDN 拒绝默认的 Python UA）
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+
+class ImageFetchQueue:
+    """
+    图片按需下载队列
+
+    请求方调用 fetch() 提交下载并短暂等待；多个请求同一张图片时共享同一个下载任务。
+    """
+
+    def __init__(self, image_dir, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT):
+        """
+        初始化下载队列（后台线程在首次提交任务时启动）
+
+        Args:
+            image_dir (str): 图片根目录（爬虫的 output 目录）
+            workers (int): 后台下载线程数
+            timeout (float): 单张图片的下载超时秒数
+        """
+        self.image_dir = os.path.abspath(image_dir)
+        self.workers = workers
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._events = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def resolve_path(self, filename):
+        """
+        将请求的相对路径转换为图片根目录下的绝对路径
+
+        Args:
+            filename (str): 相对于图片根目录的路径，如 "123/a_123_1.jpg"
+
+        Returns:
+            str: 绝对路径；路径超出图片根目录时返回None
+        """
+        path = os.path.abspath(os.path.join(self.image_dir, filename))
+        if os.path.commonpath([path, self.image_dir]) != self.image_dir:
+            return None
+        return path
+
+    def find_urls(self, filename):
+        """
+        在图片所在目录的清单中查找下载 URL
+
+        Args:
+            filename (str): 相对于图片根目录的路径
+
+        Returns:
+            list: 按优先级排列的 URL 列表，清单中没有该图片时返回空列表
+        """
+        path = self.resolve_path(filename)
+        if path is None:
+            return []
+
+        folder, name = os.path.split(path)
+        for manifest_path in sorted(glob.glob(os.path.join(folder, "*" + MANIFEST_SUFFIX))):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"图片清单读取失败 {manifest_path}: {e}")
+                continue
+            for image in manifest.get("images", []):
+                if image.get("file") == name:
+                    return image.get("urls", [])
+        return []
+
+    def submit(self, filename):
+        """
+        提交一张图片的下载任务，不等待完成
+
+        Args:
+            filename (str): 相对于图片根目录的路径
+
+        Returns:
+            threading.Event: 下载结束（无论成功与否）时被设置；清单中没有该图片时返回None
+        """
+        urls = self.find_urls(filename)
+        if not urls:
+            return None
+
+        with self._lock:
+            event = self._events.get(filename)
+            if event is not None:
+                # 同一张图片已在队列中，共享同一个任务
+                return event
+            event = threading.Event()
+            self._events[filename] = event
+            self._ensure_workers()
+        self._queue.put((filename, urls))
+        return event
+
+    def fetch(self, filename, wait=REQUEST_WAIT):
+        """
+        提交一张图片的下载任务，最多等待 wait 秒
+
+        下载在后台继续进行，超时返回后再次请求时即可读到文件。
+
+        Args:
+            filename (str): 相对于图片根目录的路径
+            wait (float): 最长等待秒数
+
+        Returns:
+            bool: 图片文件已存在时返回True
+        """
+        event = self.submit(filename)
+        if event is None:
+            return False
+        event.wait(wait)
+        return os.path.exists(self.resolve_path(filename))
+
+    def _ensure_workers(self):
+        """按需启动后台下载线程（调用方持有锁）"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"image-fetch-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        """后台线程：从队列中取任务下载"""
+        while True:
+            filename, urls = self._queue.get()
+            try:
+                self._download(filename, urls)
+            finally:
+                with self._lock:
+                    event = self._events.pop(filename, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    def _download(self, filename, urls):
+        """
+        依次尝试各个 URL，下载成功后保存到目标路径
+
+        Args:
+            filename (str): 相对于图片根目录的路径
+            urls (list): 按优先级排列的 URL 列表
+
+        Returns:
+            bool: 是否下载成功
+        """
+        target = self.resolve_path(filename)
+        if os.path.exists(target):
+            return True
+
+        part_path = target + ".part"
+        for url in urls:
+            try:
+                request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    content_type = response.headers.get("Content-Type", "")
+                    if content_type and not content_type.startswith("image/"):
+                        raise ValueError(f"不是图片: {content_type}")
+                    content = response.read()
+                if not content:
+                    raise ValueError("内容为空")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(part_path, "wb") as f:
+                    f.write(content)
+                os.replace(part_path, target)
+                print(f"图片按需下载完成: {filename}")
+                return True
+            except Exception as e:
+                print(f"图片下载失败 {url}: {e}")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+        return False
+
+
+# 全局下载队列
+_fetch_queue = None
+_fetch_queue_lock = threading.Lock()
+
+
+def get_image_fetch_queue(image_dir):
+    """
+    获取全局图片下载队列，首次调用时创建
+
+    Args:
+        image_dir (str): 图片根目录
+
+    Returns:
+        ImageFetchQueue: 全局下载队列
+    """
+    global _fetch_queue
+    with _fetch_queue_lock:
+        if _fetch_queue is None:
+            _fetch_queue = ImageFetchQueue(image_dir)
+        return _fetch_queue
@@ -4,7 +4,8 @@
 这个模块提供静态文件（主要是图片）的服务功能，包括：
 1. 本地图片文件访问
 2. 多级路径支持
-3. 错误处理和404响应
+3. 延迟下载模式下缺失图片的按需下载
+4. 错误处理和404响应
 
 主要功能：
 - 为爬虫下载的图片提供HTTP访问服务
@@ -18,6 +19,7 @@
 import os
 from flask import Blueprint, send_from_directory, request, abort
 from app.utils.db_util import BASE_DIR
+from app.utils.image_fetcher import get_image_fetch_queue
 
 # 创建静态图片服务蓝图
 static_images_bp = Blueprint("static_images", __name__)
@@ -29,6 +31,9 @@ def serve_image(filename):
     
     这个路由用于访问爬虫下载的图片文件。图片文件存储在
     union_scraper/output目录下，通过HTTP请求可以访问这些图片。
+    图片尚未下载但在商品目录的图片清单中时（爬虫延迟下载模式），
+    提交后台下载并短暂等待；未完成时返回404，下载在后台继续，
+    之后的请求直接返回文件。
     
     Args:
         filename (str): 图片文件名，支持包含路径的文件名
@@ -51,6 +56,10 @@ def serve_image(filename):
             # 这可以防止路径遍历攻击
             return send_from_directory(image_dir, filename)
         
+        # 文件不存在时按图片清单下载（延迟下载模式），只等待 REQUEST_WAIT 秒，不长时间占用请求线程
+        if get_image_fetch_queue(image_dir).fetch(filename):
+            return send_from_directory(image_dir, filename)
+        
         # 文件不存在，返回404错误
         abort(404)
         
@@ -0,0 +1,97 @@
+"""
+图片按需下载测试模块
+
+测试延迟下载模式下的图片按需下载，包括：
+1. 按图片清单查找下载 URL
+2. 首个 URL 失败时回退到下一个 URL
+3. 清单中没有的图片和越界路径不会被下载
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.image_fetcher import ImageFetchQueue
+
+# 最小的 1x1 PNG 图片
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+def start_image_server(root):
+    """在后台线程中启动提供 root 目录文件的 HTTP 服务，返回 (server, base_url)"""
+    handler = partial(SimpleHTTPRequestHandler, directory=root)
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_fetch_from_manifest():
+    """测试按清单下载图片，首个 URL 404 时回退到原图 URL"""
+    print("🧪 测试按清单下载图片...")
+
+    remote_dir = tempfile.mkdtemp()
+    output_dir = tempfile.mkdtemp()
+    server, base_url = start_image_server(remote_dir)
+    try:
+        with open(os.path.join(remote_dir, "original.png"), "wb") as f:
+            f.write(PNG_BYTES)
+
+        product_dir = os.path.join(output_dir, "123")
+        os.makedirs(product_dir)
+        manifest = {
+            "id": "123",
+            "images": [
+                {"file": "a_123_1.jpg", "urls": [f"{base_url}/missing.png", f"{base_url}/original.png"]},
+            ],
+        }
+        with open(os.path.join(product_dir, "a_123.images.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        fetch_queue = ImageFetchQueue(output_dir, workers=2, timeout=5)
+        assert fetch_queue.find_urls("123/a_123_1.jpg") == manifest["images"][0]["urls"]
+        assert fetch_queue.fetch("123/a_123_1.jpg", wait=10)
+
+        with open(os.path.join(product_dir, "a_123_1.jpg"), "rb") as f:
+            assert f.read() == PNG_BYTES
+        assert not os.path.exists(os.path.join(product_dir, "a_123_1.jpg.part"))
+        print("✅ 按清单下载测试通过")
+    finally:
+        server.shutdown()
+        shutil.rmtree(remote_dir)
+        shutil.rmtree(output_dir)
+
+
+def test_unknown_and_outside_paths():
+    """测试清单中没有的图片和超出图片根目录的路径"""
+    print("🧪 测试无效路径...")
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        fetch_queue = ImageFetchQueue(output_dir)
+        assert fetch_queue.resolve_path("../secret.jpg") is None
+        assert fetch_queue.find_urls("../secret.jpg") == []
+        assert fetch_queue.submit("123/a_123_9.jpg") is None
+        assert not fetch_queue.fetch("123/a_123_9.jpg")
+        print("✅ 无效路径测试通过")
+    finally:
+        shutil.rmtree(output_dir)
+
+
+if __name__ == "__main__":
+    test_fetch_from_manifest()
+    test_unknown_and_outside_paths()
+    print("🎉 所有测试通过")
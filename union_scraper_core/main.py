@@ -5,14 +5,42 @@ import sys
 import time
 import random
 import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from loguru import logger
-from src.core.input_loader import load_input_files
+from src.core.input_loader import load_input_files, build_url_fanout
+from src.core.driver_pool import init_driver_pool, shutdown_driver_pool, pop_lease_wait
+from src.core.browser_profile import get_profile_config
+from src.core.fetch_timing import init_fetch_timing, get_fetch_timing, shutdown_fetch_timing
+from src.core.image_downloader import init_image_downloader, get_image_downloader, shutdown_image_downloader
+from src.core.page_fetcher import flush_html_archive
+from src.core.fetch_engine import init_fetch_engine, BACKEND_CDP, ENGINE_BROWSER
+from src.core.fetch_rules import get_fetch_rules
+from src.core.cdp_fetcher import init_cdp_fetcher, shutdown_cdp_fetcher
+from src.core.crawl_journal import create_crawl_journal, hash_content, MODE_RESUME, MODE_FORCE, MODE_ONLY_FAILED
+from src.core.crawl_pipeline import CrawlPipeline, DEFAULT_PIPELINE_CONFIG
+from src.core.db_sink import create_db_sink
+from src.core.crawl_retry import (
+    FailureTracker, PermanentFetchError, FAILURE_PARSE, FAILURE_PERMANENT, FAILURE_TRANSIENT
+)
+from src.core.crawl_scheduler import (
+    CrawlScheduler, DEFAULT_SCHEDULER_CONFIG, DEFAULT_ADAPTIVE_CONFIG, UNKNOWN_SITE, get_site_budget
+)
 from src.models.scraper_factory import ScraperFactory
+from src.models.site_type import SiteType
 from tools.tool_merge_json import main as merge_json_main
 
-def setup_logger(log_file='log.txt'):
+# 解析进程中的配置（由 init_parse_worker 设置，用于重建爬虫）
+_parse_config = None
+
+def setup_logger(log_file='log.txt', mode='w'):
     """
     配置logger，同时输出到控制台和文件
+
+    参数：
+        log_file (str): 日志文件
+        mode (str): 'w' 每次运行时覆盖文件；解析进程使用 'a' 追加到主进程的日志
     """
     # 移除默认的控制台输出
     logger.remove()
@@ -32,82 +60,654 @@ def setup_logger(log_file='log.txt'):
         compression="zip",  # 压缩旧日志
         encoding='utf-8',
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}",
-        mode='w'  # 使用写入模式，而不是追加模式
+        mode=mode  # 主进程使用写入模式，而不是追加模式
     )
 
+def is_valid_url(url):
+    """检查商品 URL 是否有效"""
+    return isinstance(url, str) and url != '--' and url.startswith(('http://', 'https://'))
+
+def prefetch_in_tabs(batch, config, fetch_engine, max_tabs):
+    """
+    在同一个浏览器的多个标签页中预取一批商品页面
+
+    参数：
+        batch (list[tuple]): [(序号, 商品), ...]
+        config (dict): 配置字典
+        fetch_engine (FetchEngine): 抓取引擎
+        max_tabs (int): 标签页数量
+
+    返回：
+        dict: {序号: HTML 或 PermanentFetchError}，只包含抓取成功和页面不存在的商品
+    """
+    jobs, keys = [], []
+    for idx, product in batch:
+        if not is_valid_url(product["url"]):
+            continue
+        try:
+            scraper = ScraperFactory.create_scraper(product["url"], product["id"], config, product["url_tag"])
+        except Exception:
+            continue  # 不支持的站点交由主循环报告
+        job = scraper.get_fetch_job()
+        if job:
+            jobs.append(job)
+            keys.append(idx)
+
+    if not jobs:
+        return {}
+
+    logger.info(f"Prefetching {len(jobs)} pages in {min(max_tabs, len(jobs))} tabs...")
+    results = fetch_engine.fetch_in_tabs(jobs, max_tabs=max_tabs)
+    return {idx: html for idx, html in zip(keys, results) if html}
+
+def get_site_name(url, config):
+    """获取商品所属站点名称，无效 URL 或未支持的网站归入 UNKNOWN_SITE"""
+    if not is_valid_url(url):
+        return UNKNOWN_SITE
+    try:
+        return SiteType.from_url(url, config).site_name
+    except ValueError:
+        return UNKNOWN_SITE
+
+def get_browser_capacity(config):
+    """
+    Selenium 驱动池能同时提供的浏览器数
+
+    返回：
+        tuple: (每个驱动池的浏览器数, 是否所有站点共用一个池)；不使用驱动池（本地 HTML、CDP 后端）时为 (None, False)
+    """
+    if config['debug']['use_local_html'] or config['crawler'].get('fetch_backend') == BACKEND_CDP:
+        return None, False
+    size = max(1, int(config['crawler'].get('driver_pool', {}).get('size', 1)))
+    return size, not get_profile_config(config['crawler'])['enabled']
+
+def limit_browser_budgets(config, budgets):
+    """
+    按驱动池大小限制浏览器站点的并发数：单个站点的并发数超过池中的浏览器数时只会排队等待租借，
+    多个站点共用一个池且并发数之和超过池大小时给出警告
+    """
+    pool_size, shared = get_browser_capacity(config)
+    if pool_size is None:
+        return
+    browser_sites = [site['name'] for site in config['sites'] if get_fetch_rules(site)['engine'] == ENGINE_BROWSER]
+    for site_name in browser_sites:
+        budget = budgets[site_name]
+        if budget['max_concurrency'] > pool_size:
+            logger.warning(f"{site_name}: max_concurrency {budget['max_concurrency']} exceeds "
+                           f"crawler.driver_pool.size {pool_size}, capping at {pool_size}")
+            budget['max_concurrency'] = pool_size
+            budget['min_concurrency'] = min(budget['min_concurrency'], pool_size)
+    total = sum(budgets[site_name]['max_concurrency'] for site_name in browser_sites)
+    if shared and total > pool_size:
+        logger.warning(f"Browser sites {', '.join(browser_sites)} allow {total} concurrent pages but share "
+                       f"{pool_size} Chrome instance(s); they will wait for each other's leases. "
+                       f"Raise crawler.driver_pool.size to {total} or enable crawler.browser_profile")
+
+def build_scheduler(config, batch_size=1, progress_extra=None):
+    """
+    按 sites[].crawl 和 crawler.scheduler 配置创建调度器
+
+    参数：
+        config (dict): 配置字典
+        batch_size (int): 每个工作线程一次取出的商品数
+        progress_extra (callable): 返回附加进度行的函数
+
+    返回：
+        CrawlScheduler: 调度器
+    """
+    scheduler_config = dict(DEFAULT_SCHEDULER_CONFIG)
+    scheduler_config.update(config['crawler'].get('scheduler', {}))
+    adaptive = dict(DEFAULT_ADAPTIVE_CONFIG)
+    adaptive.update(scheduler_config['adaptive'])
+    budgets = {site['name']: get_site_budget(site) for site in config['sites']}
+    if config['debug']['use_local_html']:
+        # 读取本地 HTML 不访问网站，不需要限速，也不需要自适应并发
+        adaptive['enabled'] = False
+        for budget in budgets.values():
+            budget['requests_per_minute'] = 0
+    limit_browser_budgets(config, budgets)
+    for site_name, budget in budgets.items():
+        if adaptive['enabled']:
+            concurrency = f"{budget['min_concurrency']}-{budget['max_concurrency']} adaptive"
+        else:
+            concurrency = budget['max_concurrency']
+        logger.info(f"Site budget - {site_name}: {concurrency} concurrent, "
+                    f"{budget['requests_per_minute'] or 'unlimited'} requests/min, burst {budget['burst']}")
+    return CrawlScheduler(budgets, batch_size=batch_size, progress_interval=scheduler_config['progress_interval'],
+                          progress_extra=progress_extra, adaptive=adaptive)
+
+def journal_mark(context, product_id, stage, **fields):
+    """在抓取日志中记录商品完成了某个阶段（未启用日志时忽略）"""
+    if context["journal"] is not None:
+        context["journal"].mark(product_id, stage, **fields)
+
+def journal_done(context, product_id, **fields):
+    """
+    在抓取日志中记录商品处理完成。读取本地 HTML 或跳过图片下载（调试、离线运行）时只记为 saved，
+    以免下次正常运行时在 fresh_hours 内跳过这些未真正抓取或缺少图片的商品
+    """
+    config = context["config"]
+    if config['debug']['use_local_html'] or config['debug'].get('skip_image_download', False):
+        journal_mark(context, product_id, "saved", **fields)
+    else:
+        journal_mark(context, product_id, "done", **fields)
+
+def journal_fail(context, product_id, stage, error, **fields):
+    """在抓取日志中记录商品在某个阶段失败（未启用日志时忽略）"""
+    if context["journal"] is not None:
+        context["journal"].mark_failed(product_id, stage, error, **fields)
+
+def fetch_failed(idx, product, site_name, context, error, kind=None, **fields):
+    """
+    记录抓取失败：临时失败（超时、5xx、浏览器崩溃）在次数上限内按退避时间重新加入该站点的队列，
+    等待期间该站点继续抓取其他商品；永久失败（404、无效 URL、未支持的网站）直接放弃。
+    失败次数按 product["key"]（站点:ID）计，与抓取日志一致
+
+    参数：
+        idx (int): 商品序号
+        product (dict): build_url_fanout 返回的商品
+        site_name (str): 调度器中的站点名称
+        context (dict): 运行期间共享的对象
+        error: 异常对象或错误信息
+        kind (str): 失败类型，None 时按错误自动判断
+        **fields: 写入抓取日志的其他列
+    """
+    product_id = product["key"]
+    kind, delay = context["failures"].record_failure(product_id, str(product["url"]), site_name, "fetch", error, kind)
+    journal_fail(context, product_id, "fetch", f"{kind}: {error}", url=str(product["url"]), **fields)
+    if kind == FAILURE_TRANSIENT:
+        # 临时失败计入站点错误率，过高时降低该站点的并发数
+        context["scheduler"].report(site_name, ok=False)
+    if delay is not None:
+        attempt = context["failures"].attempt(product_id)
+        logger.warning(f"Retrying ID={product_id} in {delay:.0f}s (attempt {attempt}/"
+                       f"{context['failures'].max_attempts}, {kind} failure: {error})")
+        context["scheduler"].retry(site_name, (idx, product), delay)
+    else:
+        logger.error(f"Giving up ID={product_id} ({kind} failure: {error})")
+
+def parse_failed(job, context, error, empty=False):
+    """
+    记录解析失败（解析异常或结果为空），不重试，可用 --only-failed 重新处理。
+    结果为空多为验证码等软封锁页面，计入站点空解析率，过高时降低该站点的并发数
+    """
+    product = job["product"]
+    context["failures"].record_failure(product["key"], product["url"], job["site"], "parse", error, FAILURE_PARSE)
+    journal_fail(context, product["key"], "parse", error)
+    if empty:
+        context["scheduler"].report(job["site"], empty=True)
+
+def stage_failed(stage, job, error, context):
+    """
+    流水线阶段的处理函数抛出异常时记录失败（与解析失败一样不重试），
+    共享该页面的商品 ID 都记为在该阶段失败，可用 --only-failed 重新处理
+    """
+    product = job["product"]
+    logger.error(f"Pipeline stage {stage} failed for ID={product['key']}: {error}")
+    context["failures"].record_failure(product["key"], product["url"], job["site"], stage, error, FAILURE_PARSE)
+    for key in product["keys"]:
+        journal_fail(context, key, stage, error, url=product["url"])
+
+def crawl_batch(site_name, batch, context):
+    """
+    抓取阶段：处理调度器交给工作线程的一批商品（同一站点；多标签页模式下先在标签页中一起预取），
+    抓取到的页面交给流水线的解析阶段，解析队列已满时在此等待
+
+    参数：
+        site_name (str): 调度器中的站点名称
+        batch (list[tuple]): [(序号, 商品), ...]
+        context (dict): 运行期间共享的对象（配置、抓取引擎、流水线等）
+    """
+    config = context["config"]
+    prefetched = {}
+    if context["use_tabs"] and len(batch) > 1:
+        prefetched = prefetch_in_tabs(batch, config, context["fetch_engine"], context["tabs_per_browser"])
+    for idx, product in batch:
+        pop_lease_wait()
+        started = time.monotonic()
+        job = fetch_product(idx, product, site_name, context, prefetched.get(idx))
+        elapsed = time.monotonic() - started
+        context["fetch_metrics"].record(elapsed, job is not None)
+        if job is not None:
+            # 成功抓取的耗时用于判断站点是否变慢（标签页中一起预取的页面不计耗时）；
+            # 扣除等待空闲浏览器的时间，避免并发数上调后本地排队被当成站点变慢
+            latency = None if idx in prefetched else max(0.0, elapsed - pop_lease_wait())
+            context["scheduler"].report(site_name, latency=latency)
+            context["pipeline"].submit(job)
+
+        # 10. 延时控制（只延后当前站点的工作线程，其他站点照常进行）；
+        #     抓取失败后同样等待，避免连续请求正在出错的站点
+        if config['crawler']['enable_random_delay']:
+            delay = random.uniform(1, config['crawler']['max_sleep_seconds'])
+            logger.info(f"Sleeping for {delay:.2f} seconds...")
+            time.sleep(delay)
+
+def fetch_product(idx, product, site_name, context, html=None):
+    """
+    获取一个商品的页面，失败时按失败类型决定是否稍后重试（见 fetch_failed）
+
+    参数：
+        idx (int): 商品序号（从 1 开始）
+        product (dict): build_url_fanout 返回的商品
+        site_name (str): 调度器中的站点名称
+        context (dict): 运行期间共享的对象
+        html (str): 已在标签页中预取的 HTML（页面不存在时为 PermanentFetchError），None 时自行获取
+
+    返回：
+        dict: 交给后续阶段的任务 {idx, product, site, scraper, html}；URL 无效或获取失败时返回 None
+    """
+    config = context["config"]
+    # 同一商品的不同 URL（single / package / subpack）按 key 分别记录
+    product_id = product["key"]
+    url = product["url"]
+
+    attempt = context["failures"].attempt(product_id)
+    retry_note = f" (attempt {attempt})" if attempt > 1 else ""
+    logger.info(f"\n({idx}/{context['total']}) Processing ID={product_id}, URL={url}{retry_note}")
+
+    # 检查 URL 是否有效
+    if not is_valid_url(url):
+        logger.info(f"Skipping invalid URL for ID={product_id}")
+        fetch_failed(idx, product, site_name, context, "invalid url", FAILURE_PERMANENT)
+        return None
+
+    try:
+        # 5. 创建爬虫实例
+        scraper = ScraperFactory.create_scraper(url, product["id"], config, product["url_tag"])
+        
+        # 6. 获取HTML内容
+        if config['debug']['use_local_html']:
+            logger.info("Using local HTML file...")
+            html = scraper.get_local_html()
+        elif isinstance(html, PermanentFetchError):
+            # 标签页预取时主文档返回 404 / 410
+            raise html
+        elif html is not None:
+            logger.info("Using page prefetched in tab...")
+        else:
+            logger.info("Fetching page...")
+            html = scraper.fetch_page()
+    except Exception as e:
+        logger.error(f"Failed to process ID={product_id}: {e}")
+        logger.exception(e)  # 输出完整的异常堆栈
+        fetch_failed(idx, product, site_name, context, e)
+        return None
+
+    if not html:
+        logger.error(f"Failed to get HTML(NO HTML) for ID={product_id}")
+        fetch_failed(idx, product, site_name, context, "no html", site=scraper.site_config['name'])
+        return None
+    context["failures"].record_success(product_id)
+    journal_mark(context, product_id, "fetched", url=url, site=scraper.site_config['name'],
+                 content_hash=hash_content(html))
+    return {"idx": idx, "product": product, "site": site_name, "scraper": scraper, "html": html}
+
+def init_parse_worker(config):
+    """解析进程的初始化函数：日志追加到主进程的 log.txt，并保存配置供 parse_in_process 重建爬虫"""
+    global _parse_config
+    setup_logger(mode='a')
+    _parse_config = config
+
+def create_parse_executor(config):
+    """
+    按 crawler.pipeline.parse_workers 创建解析进程池。
+    使用 spawn 启动子进程（不复制主进程中运行的下载、CDP、调度线程），应在启动任何线程之前调用
+
+    返回：
+        ProcessPoolExecutor: 解析进程池；parse_workers 为 0 时返回 None（在线程中解析）
+    """
+    pipeline_config = dict(DEFAULT_PIPELINE_CONFIG)
+    pipeline_config.update(config['crawler'].get('pipeline', {}))
+    parse_workers = int(pipeline_config['parse_workers'])
+    if parse_workers <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_parse_worker, initargs=(config,))
+
+def parse_in_process(url, product_id, url_tag, html):
+    """
+    在解析进程中解析页面（需为模块级函数，以便进程池序列化）。
+    只传入商品信息和 HTML，在子进程中重建爬虫，不序列化整个爬虫和配置
+
+    返回：
+        ProductData: 解析后的数据对象
+    """
+    scraper = ScraperFactory.create_scraper(url, product_id, _parse_config, url_tag)
+    scraper.parse_data(html)
+    return scraper.get_parsed_data()
+
+def parse_job(job, context):
+    """
+    解析阶段：在进程池中解析 HTML，CPU 密集的解析不再阻塞抓取和下载
+
+    返回：
+        dict: 加入 data 后的任务；解析失败时返回 None
+    """
+    product = job["product"]
+    product_id = product["key"]
+    scraper = job["scraper"]
+    logger.info(f"Parsing HTML for ID={product_id}...")
+    try:
+        executor = context["parse_executor"]
+        if executor is not None:
+            data = scraper.set_parsed_data(executor.submit(
+                parse_in_process, product["url"], product["id"], product["url_tag"], job["html"]
+            ).result())
+        else:
+            data = scraper.parse_data(job["html"])
+    except Exception as e:
+        logger.error(f"Failed to parse HTML for ID={product_id}: {e}")
+        logger.exception(e)  # 这会输出完整的异常堆栈
+        parse_failed(job, context, e)
+        return None
+    job.update(data=data, html=None)
+    journal_mark(context, product_id, "parsed")
+    return job
+
+def image_job(job, context):
+    """
+    图片阶段：探测图片尺寸（结果随数据一起保存），写图片清单或提交图片下载
+
+    返回：
+        dict: 加入 image_future 和 image_count（提交下载的图片数）后的任务
+    """
+    config = context["config"]
+    lazy_images = context["lazy_images"]
+    scraper = job["scraper"]
+    job["image_future"] = None
+    job["image_count"] = 0
+    if config['debug'].get('skip_image_download', False):
+        logger.info("Skipping image download (debug mode)...")
+        return job
+
+    # 探测图片尺寸，跳过占位图和小缩略图
+    job["data"] = scraper.probe_images()
+
+    # 9. 提交图片下载，与后续商品的抓取并发进行
+    image_count = len(scraper.get_image_download_urls())
+    if lazy_images['enabled']:
+        # 延迟下载：只写图片清单，预取前 prefetch_first 张，其余在网页端首次请求时下载
+        logger.info(f"Writing image manifest for ID={job['product']['key']}...")
+        scraper.write_image_manifest()
+        if lazy_images['prefetch_first'] > 0:
+            job["image_future"] = scraper.download_images_async(limit=lazy_images['prefetch_first'])
+            job["image_count"] = min(image_count, lazy_images['prefetch_first'])
+    else:
+        logger.info(f"Queueing image download for ID={job['product']['key']}...")
+        job["image_future"] = scraper.download_images_async()
+        job["image_count"] = image_count
+    return job
+
+def save_product(scraper, data, context, image_future=None):
+    """
+    保存商品数据：写出 JSON 文件，启用 output.db_sink 时同时提交到网页端数据库
+    （keep_json 为 false 时只写数据库）。解析结果为空的商品不写入数据库，以免覆盖已有的数据。
+    立即下载模式下传入图片下载任务时，等下载完成后再提交，local_images 只包含实际保存的图片
+    """
+    config = context["config"]
+    db_sink = context["db_sink"]
+    if db_sink is None or db_sink.keep_json:
+        scraper.save_product_data(data, config['output']['data_dir'])
+    if db_sink is None or not data.get("product_name"):
+        return
+    if image_future is not None and not context["lazy_images"]['enabled']:
+        image_future.add_done_callback(lambda future: sink_product(scraper, data, context, future))
+    else:
+        sink_product(scraper, data, context)
+
+def sink_product(scraper, data, context, image_future=None):
+    """
+    提交商品到数据库输出。local_images 取自已完成的图片下载任务；没有下载任务时，
+    延迟下载模式为图片清单中的全部图片（网页端按需下载），其余情况为空
+    """
+    config = context["config"]
+    if image_future is not None:
+        try:
+            local_images = scraper.get_local_image_paths(image_future.result())
+        except Exception as e:
+            logger.warning(f"Image download failed for ID={data.get('id')}, writing without local images: {e}")
+            local_images = []
+    elif context["lazy_images"]['enabled'] and not config['debug'].get('skip_image_download', False):
+        local_images = scraper.get_local_image_paths()
+    else:
+        local_images = []
+    context["db_sink"].put(scraper.site_config['name'], dict(data, local_images=local_images))
+
+def write_job(job, context):
+    """
+    写出阶段：保存商品 JSON，并写出共享同一页面的其他商品 ID（复用解析结果，图片下载完成后复制）
+    """
+    config = context["config"]
+    product = job["product"]
+    scraper = job["scraper"]
+
+    # 8. 保存数据
+    logger.info(f"Saving data for ID={product['key']}...")
+    save_product(scraper, job["data"], context, job["image_future"])
+
+    # 记录处理状态：解析结果为空（如验证码页面）视为失败，下次运行时重新抓取
+    empty = not job["data"].get("product_name")
+    for alias_id, alias_key in zip(product["ids"][1:], product["keys"][1:]):
+        logger.info(f"Reusing page for ID={alias_id}")
+        alias_scraper = ScraperFactory.create_scraper(product["url"], alias_id, config, product["url_tag"])
+        alias_data = alias_scraper.adopt_parsed_data(scraper)
+        save_product(alias_scraper, alias_data, context, job["image_future"])
+        if context["lazy_images"]['enabled'] and not config['debug'].get('skip_image_download', False):
+            alias_scraper.write_image_manifest()
+        # 共享页面的商品 ID 各自记录状态，下次运行时只要有一个未完成就重新处理该页面
+        fields = {"url": product["url"], "site": scraper.site_config['name']}
+        if empty:
+            journal_fail(context, alias_key, "parse", "empty data", **fields)
+        elif job["image_future"] is not None:
+            journal_mark(context, alias_key, "saved", **fields)
+            context["pending_image_copies"].append((job["image_future"], alias_scraper, alias_key, job["image_count"]))
+        else:
+            journal_done(context, alias_key, **fields)
+
+    if empty:
+        parse_failed(job, context, "empty data", empty=True)
+    elif job["image_future"] is None:
+        journal_done(context, product["key"])
+    else:
+        journal_mark(context, product["key"], "saved")
+        job["image_future"].add_done_callback(
+            lambda future: finish_images(future, product["key"], job["image_count"], context)
+        )
+    return None
+
+def record_images(context, product_id, saved, expected):
+    """
+    按实际保存的图片数记录商品状态：全部保存时为 done（见 journal_done），有图片下载失败时记录 images 阶段失败，
+    下次运行时重新处理（已保存的图片由图片存储复用，不会重复下载）
+
+    参数：
+        saved (int): 实际保存的图片数
+        expected (int): 提交下载的图片数
+    """
+    if saved < expected:
+        journal_fail(context, product_id, "images", f"saved {saved}/{expected} images")
+    else:
+        journal_done(context, product_id)
+
+def finish_images(future, product_id, expected, context):
+    """图片下载完成后在抓取日志中记录商品状态（在下载线程中回调）"""
+    try:
+        record_images(context, product_id, len(future.result()), expected)
+    except Exception as e:
+        journal_fail(context, product_id, "images", e)
+
+def build_pipeline(config, context):
+    """
+    按 crawler.pipeline 配置创建解析 → 图片 → 写出三个阶段的流水线（抓取阶段由调度器驱动）
+
+    返回：
+        CrawlPipeline: 流水线（解析进程池由 create_parse_executor 预先创建，放在 context["parse_executor"]）
+    """
+    pipeline_config = dict(DEFAULT_PIPELINE_CONFIG)
+    pipeline_config.update(config['crawler'].get('pipeline', {}))
+    parse_workers = int(pipeline_config['parse_workers'])
+
+    queue_size = pipeline_config['queue_size']
+    pipeline = CrawlPipeline(on_error=lambda stage, job, error: stage_failed(stage, job, error, context))
+    pipeline.add_stage("parse", lambda job: parse_job(job, context), max(1, parse_workers), queue_size)
+    pipeline.add_stage("images", lambda job: image_job(job, context), pipeline_config['image_workers'], queue_size)
+    pipeline.add_stage("write", lambda job: write_job(job, context), pipeline_config['write_workers'], queue_size)
+    return pipeline
+
+def parse_args(argv=None):
+    """
+    解析命令行参数
+
+    返回：
+        argparse.Namespace: force / only_failed
+    """
+    parser = argparse.ArgumentParser(description="Union product scraper")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--force", action="store_true", help="忽略抓取日志，重新处理全部商品")
+    group.add_argument("--only-failed", action="store_true", help="只处理上次失败的商品")
+    return parser.parse_args(argv)
+
 def main():
+    args = parse_args()
+    journal = None
+    db_sink = None
+    parse_executor = None
     try:
         # 1. 加载配置
         config = json.load(open('config.json', 'r', encoding='utf-8'))
         
         # 2. 设置日志
         setup_logger()
+
+        # 解析进程池须在下载、数据库输出等后台线程启动之前创建
+        parse_executor = create_parse_executor(config)
         
         # 3. 加载输入文件
         logger.info("Loading input files...")
-        product_list = load_input_files(config)
-        logger.info(f"Loaded {len(product_list)} products in total.\n")
+        input_rows = load_input_files(config)
+        # 多个商品 ID 指向同一页面时只抓取和解析一次，结果写入每个 ID
+        # 抓取日志和失败记录按 站点:ID 区分，不同站点的同一商品 ID 互不覆盖
+        product_list = build_url_fanout(input_rows, lambda url: get_site_name(url, config))
+        unique_pages = len(product_list)
+        logger.info(f"Loaded {len(input_rows)} products in total ({unique_pages} unique pages).\n")
 
-        # 4. 处理每个商品
-        for idx, product in enumerate(product_list, 1):
-            product_id = product["id"]
-            url = product["url"]
-            logger.info(f"\n({idx}/{len(product_list)}) Processing ID={product_id}, URL={url}")
+        # 按抓取日志跳过新近完成的商品，只处理未完成的部分
+        journal = create_crawl_journal(config['crawler'].get('journal', {}))
+        if journal is not None:
+            mode = MODE_FORCE if args.force else MODE_ONLY_FAILED if args.only_failed else MODE_RESUME
+            product_list = journal.select(product_list, mode)
+            logger.info(f"Crawl journal {journal.path} ({mode}): {len(product_list)}/{unique_pages} pages to process")
 
-            # 检查 URL 是否有效
-            if url == '--' or not url.startswith(('http://', 'https://')):
-                logger.info(f"Skipping invalid URL for ID={product_id}")
-                continue
+        # 初始化抓取引擎和浏览器驱动池（整个运行期间复用，不再每个商品启动一次 Chrome）
+        fetch_engine = init_fetch_engine(config['crawler'])
+        # 图片下载在后台并发进行，不阻塞下一个商品的抓取
+        init_image_downloader(
+            config['crawler'].get('image_download', {}),
+            config['crawler'].get('image_store', {}),
+            config['crawler'].get('image_derivatives', {})
+        )
+        pending_image_copies = []
+        # 解析后的商品直接写入网页端数据库（可选），不必再合并和上传
+        db_sink = create_db_sink(config['output'].get('db_sink', {}))
+        if db_sink is not None:
+            logger.info(f"Writing products to {db_sink.path} in batches of {db_sink.batch_size}")
+        lazy_images = {"enabled": False, "prefetch_first": 1}
+        lazy_images.update(config['crawler'].get('lazy_images', {}))
+        if not config['debug']['use_local_html']:
+            # 计时日志需在浏览器启动前创建（驱动据此开启 performance 日志）
+            timing_log = init_fetch_timing(config['crawler'].get('fetch_timing', {}))
+            if timing_log:
+                logger.info(f"Recording fetch timing to {timing_log.path}")
+            profile_config = get_profile_config(config['crawler'])
+            if profile_config['enabled']:
+                logger.info(f"Using persistent browser profiles under {profile_config['root']}")
+            if fetch_engine.backend == BACKEND_CDP:
+                logger.info("Using CDP fetch backend...")
+                init_cdp_fetcher(config['crawler'].get('cdp', {}), profile_config)
+            else:
+                pool = init_driver_pool(config['crawler'].get('driver_pool', {}), profile_config)
+                # 启用持久化目录时每个站点使用独立的驱动池，首次抓取该站点时才启动
+                if pool is not None:
+                    logger.info(f"Warming up {pool.size} Chrome instance(s)...")
+                    pool.warm_up()
 
-            try:
-                # 5. 创建爬虫实例
-                scraper = ScraperFactory.create_scraper(url, product_id, config)
-                
-                # 6. 获取HTML内容
-                if config['debug']['use_local_html']:
-                    logger.info("Using local HTML file...")
-                    html = scraper.get_local_html()
-                else:
-                    logger.info("Fetching page...")
-                    html = scraper.fetch_page()
-
-                if not html:
-                    logger.error(f"Failed to get HTML(NO HTML) for ID={product_id}")
-                    continue
-
-                # 7. 解析HTML
-                logger.info("Parsing HTML...")
-                try:
-                    data = scraper.parse_data(html)
-                except Exception as e:
-                    logger.error(f"Failed to parse HTML for ID={product_id}: {e}")
-                    logger.exception(e)  # 这会输出完整的异常堆栈
-                    continue
-
-                # 8. 保存数据
-                logger.info("Saving data...")
-                scraper.save_product_data(data, config['output']['data_dir'])
-
-                # 9. 下载图片（如果不是调试模式）
-                if not config['debug'].get('skip_image_download', False):
-                    logger.info("Downloading images...")
-                    local_images = scraper.download_images()
-                    data['local_images'] = local_images
-                else:
-                    logger.info("Skipping image download (debug mode)...")
-
-                # 10. 延时控制
-                if config['crawler']['enable_random_delay']:
-                    delay = random.uniform(1, config['crawler']['max_sleep_seconds'])
-                    logger.info(f"Sleeping for {delay:.2f} seconds...")
-                    time.sleep(delay)
+        # 多标签页模式：同一浏览器中并发加载 tabs_per_browser 个页面
+        tabs_per_browser = config['crawler'].get('tabs_per_browser', 1)
+        use_tabs = tabs_per_browser > 1 and not config['debug']['use_local_html']
+
+        # 4. 按站点并发抓取商品：每个站点有独立的令牌桶和并发上限，互不等待；
+        #    抓取到的页面经有界队列依次交给解析（进程池）、图片、写出阶段
+        context = {
+            "config": config,
+            "fetch_engine": fetch_engine,
+            "lazy_images": lazy_images,
+            "pending_image_copies": pending_image_copies,
+            "journal": journal,
+            "db_sink": db_sink,
+            "total": len(product_list),
+            "use_tabs": use_tabs,
+            "tabs_per_browser": tabs_per_browser,
+            # 临时失败的商品稍后重试，永久失败和解析失败在运行结束时汇总
+            "failures": FailureTracker(config['crawler'].get('retry', {})),
+            "parse_executor": parse_executor,
+        }
+        pipeline = build_pipeline(config, context)
+        context["pipeline"] = pipeline
+        scheduler = build_scheduler(config, batch_size=tabs_per_browser if use_tabs else 1,
+                                    progress_extra=pipeline.format_stats)
+        context["scheduler"] = scheduler
+        for idx, product in enumerate(product_list, 1):
+            scheduler.add(get_site_name(product["url"], config), (idx, product))
+        context["fetch_metrics"] = pipeline.add_source(
+            "fetch", sum(min(site.max_concurrency, site.total) for site in scheduler.sites.values())
+        )
+        pipeline.start()
+        try:
+            scheduler.run(lambda site_name, batch: crawl_batch(site_name, batch, context))
+        finally:
+            # 等待流水线处理完已抓取的页面
+            pipeline.close()
+            if parse_executor is not None:
+                parse_executor.shutdown()
+                parse_executor = None
+        for line in scheduler.format_progress():
+            logger.info(line)
+        for line in pipeline.format_stats():
+            logger.info(f"Pipeline stats - {line}")
+        for line in context["failures"].format_summary():
+            logger.info(f"Failures - {line}")
 
+        # 等待所有图片下载完成，再把图片复制给共享页面的商品 ID
+        logger.info("Waiting for image downloads to finish...")
+        for image_future, alias_scraper, alias_key, image_count in pending_image_copies:
+            try:
+                copied = alias_scraper.copy_images(image_future.result())
+                record_images(context, alias_key, len(copied), image_count)
             except Exception as e:
-                logger.error(f"Failed to process ID={product_id}: {e}")
-                logger.exception(e)  # 输出完整的异常堆栈
-                continue
+                logger.error(f"Failed to copy images: {e}")
+                journal_fail(context, alias_key, "images", e)
+        image_downloader = get_image_downloader()
+        image_downloader.wait()
+        logger.info(f"Image stats - {image_downloader.format_stats()}")
+        # 关闭下载器时事件循环已执行完所有下载任务的完成回调（抓取日志、数据库输出），之后才关闭二者
+        shutdown_image_downloader()
+
+        # 11. 输出抓取引擎统计（HTTP / 浏览器命中比例）
+        logger.info(f"Saved {len(input_rows) - unique_pages} fetches by deduplicating rows that share the same URL")
+        if journal is not None:
+            logger.info(f"Crawl journal - {journal.format_summary()}")
+        if db_sink is not None:
+            db_sink.close()
+            logger.info(f"DB sink - {db_sink.format_stats()}")
+            db_sink = None
+        for line in fetch_engine.format_stats():
+            logger.info(f"Fetch stats - {line}")
+        timing_log = get_fetch_timing()
+        if timing_log:
+            for line in timing_log.format_summary():
+                logger.info(f"Fetch timing - {line}")
 
-        # 11. 如果配置了自动合并JSON，则执行合并
+        # 12. 如果配置了自动合并JSON，则执行合并
         if config.get('crawler', {}).get('enable_merge_json', False):
             merge_json_main(add_timestamp_suffix=False)
 
@@ -116,5 +716,19 @@ def main():
         logger.exception(e)  # 输出完整的异常堆栈
         return 1
 
+    finally:
+        # 等待后台 HTML 存档写完，并关闭驱动池中的所有浏览器
+        flush_html_archive()
+        shutdown_driver_pool()
+        shutdown_cdp_fetcher()
+        shutdown_fetch_timing()
+        shutdown_image_downloader()
+        if journal is not None:
+            journal.close()
+        if db_sink is not None:
+            db_sink.close()
+        if parse_executor is not None:
+            parse_executor.shutdown()
+
 if __name__ == "__main__":
     sys.exit(main())
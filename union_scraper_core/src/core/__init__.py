@@ -2,6 +2,7 @@
 Core functionality for the scraper
 """
 
-from .input_loader import load_input_files
+from .input_loader import load_input_files, build_url_fanout
+from .driver_pool import DriverPool, init_driver_pool, get_driver_pool, shutdown_driver_pool
 
-__all__ = ['load_input_files'] 
\ No newline at end of file
+__all__ = ['load_input_files', 'build_url_fanout', 'DriverPool', 'init_driver_pool', 'get_driver_pool', 'shutdown_driver_pool']
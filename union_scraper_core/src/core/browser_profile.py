@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# union_scraper/browser_profile.py
+
+import os
+import shutil
+
+# Chrome 用户数据目录中存放缓存的子目录（相对于 user-data-dir）
+CACHE_DIRS = [
+    os.path.join("Default", "Cache"),
+    os.path.join("Default", "Code Cache"),
+    os.path.join("Default", "GPUCache"),
+]
+
+# Chrome 进程锁文件，异常退出后可能残留，导致同一目录无法再次启动
+SINGLETON_FILES = ["SingletonLock", "SingletonSocket", "SingletonCookie"]
+
+# 默认配置：不启用持久化目录
+DEFAULT_PROFILE_CONFIG = {
+    "enabled": False,
+    "root": "profiles",
+    "disk_cache_mb": 512,
+    "cache_check_pages": 20,   # 每个浏览器每加载多少页面检查一次缓存大小，超过上限时回收重启并清空，0 表示只在启动时检查
+}
+
+
+def get_profile_config(crawler_config: dict) -> dict:
+    """
+    读取 crawler.browser_profile 配置，缺失字段使用默认值
+
+    参数：
+        crawler_config (dict): crawler 配置
+
+    返回：
+        dict: 完整的浏览器持久化目录配置
+    """
+    profile_config = dict(DEFAULT_PROFILE_CONFIG)
+    profile_config.update((crawler_config or {}).get('browser_profile', {}))
+    return profile_config
+
+
+def get_profile_dir(profile_config: dict, site_name: str, slot: int) -> str:
+    """
+    获取某站点某个池槽位专用的 user-data-dir（每个槽位独立，避免多个浏览器争用同一目录）
+
+    参数：
+        profile_config (dict): 浏览器持久化目录配置
+        site_name (str): 站点名称
+        slot (int): 驱动池槽位序号
+
+    返回：
+        str: 用户数据目录的绝对路径
+    """
+    return os.path.abspath(os.path.join(profile_config['root'], site_name, f"slot_{slot}"))
+
+
+def get_dir_size(path: str) -> int:
+    """统计目录下所有文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                continue
+    return total
+
+
+def get_cache_mb(profile_dir: str) -> float:
+    """用户数据目录中缓存的总大小（MB）"""
+    cache_paths = [os.path.join(profile_dir, d) for d in CACHE_DIRS]
+    return sum(get_dir_size(p) for p in cache_paths if os.path.isdir(p)) / (1024 * 1024)
+
+
+def prepare_profile_dir(profile_dir: str, max_cache_mb: float):
+    """
+    启动浏览器前整理用户数据目录：清除残留的进程锁，缓存超过上限时清空缓存
+
+    只能在使用该目录的浏览器已关闭时调用。
+
+    参数：
+        profile_dir (str): 用户数据目录
+        max_cache_mb (float): 缓存上限（MB），0 表示不限制
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+
+    for name in SINGLETON_FILES:
+        path = os.path.join(profile_dir, name)
+        if os.path.lexists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    if not max_cache_mb:
+        return
+
+    cache_mb = get_cache_mb(profile_dir)
+    if cache_mb > max_cache_mb:
+        print(f"[INFO] Pruning browser cache {profile_dir} ({cache_mb:.0f} MB)")
+        for path in CACHE_DIRS:
+            shutil.rmtree(os.path.join(profile_dir, path), ignore_errors=True)
+
+
+def get_profile_args(profile_dir: str, max_cache_mb: float) -> list:
+    """
+    生成使用持久化目录及磁盘缓存上限的 Chrome 启动参数
+
+    参数：
+        profile_dir (str): 用户数据目录
+        max_cache_mb (float): 缓存上限（MB），0 表示使用 Chrome 默认值
+
+    返回：
+        list[str]: 启动参数
+    """
+    args = [f"--user-data-dir={profile_dir}"]
+    if max_cache_mb:
+        args.append(f"--disk-cache-size={int(max_cache_mb * 1024 * 1024)}")
+    return args
@@ -0,0 +1,555 @@
+# -*- coding: utf-8 -*-
+# union_scraper/cdp_fetcher.py
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    import websockets
+except ImportError:  # 仅 CDP 后端需要 websockets，未安装时 Selenium 后端不受影响
+    websockets = None
+
+from .browser_profile import get_profile_config, get_profile_dir, prepare_profile_dir
+from .fetch_timing import (
+    NAVIGATION_TIMING_SCRIPT,
+    count_network_event,
+    new_network_counts,
+    normalize_navigation_timing,
+)
+from .crawl_retry import PermanentFetchError, PERMANENT_HTTP_STATUS
+from .page_fetcher import (
+    IN_PAGE_EXTRACT_SCRIPT,
+    NAVIGATION_STATUS_SCRIPT,
+    payload_to_html,
+    save_html_async,
+    save_html_snapshot,
+)
+
+# 常见的 Chrome / Chromium 可执行文件名与安装位置
+CHROME_CANDIDATES = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+# 与 Selenium 后端保持一致的启动参数
+CHROME_ARGS = [
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-notifications",
+    "--disable-popup-blocking",
+    "--disable-gpu",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--ignore-certificate-errors",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--window-size=1280,800",
+    "--force-device-scale-factor=1",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+]
+
+# fetch_rules 中的资源类型到 DevTools Fetch 域资源类型的映射
+CDP_RESOURCE_TYPES = {
+    "image": "Image",
+    "font": "Font",
+    "media": "Media",
+    "stylesheet": "Stylesheet",
+}
+
+# 就绪检查表达式：任一就绪选择器出现时返回 true
+READY_EXPRESSION = """
+(function (selectors) {
+    if (document.readyState === 'loading') { return false; }
+    for (var i = 0; i < selectors.length; i++) {
+        if (document.querySelector(selectors[i])) { return true; }
+    }
+    return false;
+})(%s)
+"""
+
+# 全局 CDP 抓取器
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def find_chrome_binary(configured_path: str = None) -> str:
+    """
+    查找 Chrome 可执行文件
+
+    参数：
+        configured_path (str): 配置中指定的路径（可选）
+
+    返回：
+        str: Chrome 可执行文件路径
+    """
+    if configured_path:
+        return configured_path
+    for candidate in CHROME_CANDIDATES:
+        path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+        if path:
+            return path
+    raise FileNotFoundError("Chrome executable not found, please set crawler.cdp.chrome_binary")
+
+
+class CdpBrowser:
+    """
+    通过 DevTools 协议 WebSocket 直接控制的无头 Chrome
+
+    所有方法都在同一个 asyncio 事件循环中运行；每个页面是一个独立的 target，
+    通过 flatten 模式的 sessionId 复用同一条 WebSocket 连接。
+    """
+
+    def __init__(self, chrome_binary: str, user_data_dir: str = None, max_cache_mb: float = 0):
+        """
+        初始化（不会立即启动浏览器，需调用 start()）
+
+        参数：
+            chrome_binary (str): Chrome 可执行文件路径
+            user_data_dir (str): 用户数据目录，None 时使用临时目录
+            max_cache_mb (float): 持久化目录的磁盘缓存上限（MB），0 表示不限制
+        """
+        self.chrome_binary = chrome_binary
+        self.user_data_dir = user_data_dir
+        self.max_cache_mb = max_cache_mb
+        self._temp_dir = None
+        self._process = None
+        self._ws = None
+        self._reader = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = {}
+
+    async def start(self):
+        """启动 Chrome 并连接到浏览器级 WebSocket"""
+        if websockets is None:
+            raise RuntimeError("CDP backend requires the 'websockets' package")
+        if not self.user_data_dir:
+            self._temp_dir = tempfile.mkdtemp(prefix="cdp_profile_")
+            self.user_data_dir = self._temp_dir
+        else:
+            # 持久化目录：清除上次异常退出残留的锁文件，缓存超过上限时清空
+            prepare_profile_dir(self.user_data_dir, self.max_cache_mb)
+        os.makedirs(self.user_data_dir, exist_ok=True)
+
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        args = [self.chrome_binary, "--remote-debugging-port=0", f"--user-data-dir={self.user_data_dir}"]
+        if self.max_cache_mb:
+            args.append(f"--disk-cache-size={int(self.max_cache_mb * 1024 * 1024)}")
+        args += CHROME_ARGS + ["about:blank"]
+        self._process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome 启动后会把调试端口和 WebSocket 路径写入 DevToolsActivePort
+        deadline = time.time() + 30
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file, "r", encoding="utf-8") as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    break
+            if time.time() > deadline or self._process.poll() is not None:
+                raise RuntimeError("Chrome did not expose a DevTools port")
+            await asyncio.sleep(0.1)
+
+        self._ws = await websockets.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}", max_size=None)
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self):
+        """读取 WebSocket 消息：响应交给等待中的请求，事件交给对应会话的监听器"""
+        try:
+            async for message in self._ws:
+                data = json.loads(message)
+                if "id" in data:
+                    future = self._pending.pop(data["id"], None)
+                    if future and not future.done():
+                        if "error" in data:
+                            future.set_exception(RuntimeError(data["error"].get("message", str(data["error"]))))
+                        else:
+                            future.set_result(data.get("result", {}))
+                else:
+                    listener = self._listeners.get(data.get("sessionId"))
+                    if listener:
+                        listener(data.get("method"), data.get("params", {}))
+        except Exception as e:
+            print(f"[WARNING] DevTools connection closed: {str(e)}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("DevTools connection closed"))
+            self._pending.clear()
+
+    async def send(self, method: str, params: dict = None, session_id: str = None, timeout: float = 30) -> dict:
+        """
+        发送一条 DevTools 命令并等待结果
+
+        参数：
+            method (str): 命令名称，如 Page.navigate
+            params (dict): 命令参数
+            session_id (str): 页面会话 ID，None 表示浏览器级命令
+            timeout (float): 等待结果的最长秒数
+
+        返回：
+            dict: 命令结果
+        """
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # 超时或发送失败时结果不会再被读取，避免 _pending 无限增长
+            self._pending.pop(message_id, None)
+
+    async def evaluate(self, session_id: str, expression: str, timeout: float = 30):
+        """在页面中执行表达式并返回结果值"""
+        result = await self.send(
+            "Runtime.evaluate",
+            {"expression": expression, "returnByValue": True},
+            session_id=session_id,
+            timeout=timeout
+        )
+        if result.get("exceptionDetails"):
+            raise RuntimeError(result["exceptionDetails"].get("text", "Runtime.evaluate failed"))
+        return result.get("result", {}).get("value")
+
+    async def fetch(self, url: str, fetch_rules: dict = None, wait_time: int = 5, extract_spec: dict = None,
+                    timing: dict = None, archive: dict = None) -> str:
+        """
+        在新的页面 target 中加载 URL，返回 HTML（或页内提取后的精简 HTML）
+
+        参数：
+            url (str): 页面 URL
+            fetch_rules (dict): 站点抓取规则
+            wait_time (int): 未配置就绪选择器时的页面等待秒数
+            extract_spec (dict): 页内提取规格，见 page_fetcher.fetch_page
+            timing (dict): 传入时写入 wait_ms / Navigation Timing 及请求计数
+            archive (dict): 页内提取模式下传入时写入整页源码 archive['html']（用于存档原始 HTML）
+
+        返回：
+            str: HTML
+
+        异常：
+            PermanentFetchError: 主文档返回 404 / 410
+        """
+        fetch_rules = fetch_rules or {}
+        target = await self.send("Target.createTarget", {"url": "about:blank"})
+        target_id = target["targetId"]
+        attached = await self.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+        session_id = attached["sessionId"]
+        counts = new_network_counts()
+        document = {}
+
+        def on_event(method, params):
+            count_network_event(counts, method, params)
+            # 主框架（frameId 与页面 targetId 相同）的文档响应状态码
+            if (method == "Network.responseReceived" and params.get("type") == "Document"
+                    and params.get("frameId") == target_id):
+                document["status"] = params.get("response", {}).get("status")
+            # 被拦截的资源类型直接失败返回，不下载
+            if method == "Fetch.requestPaused":
+                asyncio.ensure_future(self.send(
+                    "Fetch.failRequest",
+                    {"requestId": params["requestId"], "errorReason": "BlockedByClient"},
+                    session_id=session_id
+                ))
+
+        self._listeners[session_id] = on_event
+        try:
+            resource_types = [
+                CDP_RESOURCE_TYPES[t] for t in fetch_rules.get('block_resource_types', []) if t in CDP_RESOURCE_TYPES
+            ]
+            if resource_types:
+                await self.send("Fetch.enable", {
+                    "patterns": [{"resourceType": t, "requestStage": "Request"} for t in resource_types]
+                }, session_id=session_id)
+            url_patterns = fetch_rules.get('block_url_patterns', [])
+            await self.send("Network.enable", {}, session_id=session_id)
+            if url_patterns:
+                await self.send("Network.setBlockedURLs", {"urls": url_patterns}, session_id=session_id)
+
+            timeout = fetch_rules.get('ready_timeout') or wait_time * 2
+            navigation = await self.send("Page.navigate", {"url": url}, session_id=session_id, timeout=timeout)
+            if navigation.get("errorText"):
+                raise RuntimeError(navigation["errorText"])
+
+            # 页面不存在时不再等待就绪选择器，交由调用方记为永久失败
+            # （响应事件未到达时退回 Navigation Timing 的 responseStatus）
+            status = document.get("status") or await self.evaluate(
+                session_id, f"(function () {{ {NAVIGATION_STATUS_SCRIPT} }})()"
+            )
+            if status in PERMANENT_HTTP_STATUS:
+                raise PermanentFetchError(f"HTTP {status}", status)
+
+            # 等待就绪选择器；未配置时退回固定等待
+            selectors = fetch_rules.get('ready_selectors') or []
+            wait_started = time.time()
+            ready = True
+            if selectors:
+                expression = READY_EXPRESSION % json.dumps(selectors)
+                deadline = time.time() + timeout
+                while not await self.evaluate(session_id, expression):
+                    if time.time() > deadline:
+                        print(f"[WARNING] Ready selectors not found before timeout: {url}")
+                        ready = False
+                        break
+                    await asyncio.sleep(0.2)
+            else:
+                await asyncio.sleep(wait_time)
+
+            if timing is not None:
+                timing['wait_ms'] = round((time.time() - wait_started) * 1000, 1)
+                timing['ready'] = ready
+                timing.update(normalize_navigation_timing(
+                    await self.evaluate(session_id, f"(function () {{ {NAVIGATION_TIMING_SCRIPT} }})()")
+                ))
+                timing.update(counts)
+
+            if extract_spec:
+                payload = await self.evaluate(
+                    session_id,
+                    f"(function () {{ {IN_PAGE_EXTRACT_SCRIPT} }}).apply(null, [{json.dumps(extract_spec)}])"
+                )
+                if archive is not None:
+                    archive['html'] = await self.evaluate(session_id, "document.documentElement.outerHTML")
+                return payload_to_html(payload)
+            return await self.evaluate(session_id, "document.documentElement.outerHTML")
+        finally:
+            self._listeners.pop(session_id, None)
+            try:
+                await self.send("Target.closeTarget", {"targetId": target_id})
+            except Exception:
+                pass
+
+    async def close(self):
+        """关闭 WebSocket 连接和 Chrome 进程"""
+        if self._ws is not None:
+            try:
+                await self.send("Browser.close", timeout=5)
+            except Exception:
+                pass
+            await self._ws.close()
+            self._ws = None
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+
+class CdpFetcher:
+    """
+    CDP 抓取后端：在后台线程中运行 asyncio 事件循环，
+    同一个 Chrome 中可以同时有数十个页面在加载，对外提供与 page_fetcher.fetch_page 相同的同步接口。
+    """
+
+    def __init__(self, chrome_binary: str = None, max_pages: int = 24, user_data_dir: str = None,
+                 max_cache_mb: float = 0):
+        """
+        初始化 CDP 抓取后端（浏览器在首次抓取时启动）
+
+        参数：
+            chrome_binary (str): Chrome 可执行文件路径，None 时自动查找
+            max_pages (int): 同时加载的最大页面数
+            user_data_dir (str): 用户数据目录，None 时使用临时目录
+            max_cache_mb (float): 持久化目录的磁盘缓存上限（MB）
+        """
+        self.chrome_binary = chrome_binary
+        self.max_pages = max(1, int(max_pages))
+        self.user_data_dir = user_data_dir
+        self.max_cache_mb = max_cache_mb
+        self._browser = None
+        self._semaphore = None
+        self._start_lock = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cdp-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine):
+        """在后台事件循环中执行协程并同步等待结果"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _ensure_browser(self) -> CdpBrowser:
+        """按需启动浏览器"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+        async with self._start_lock:
+            if self._browser is None:
+                browser = CdpBrowser(find_chrome_binary(self.chrome_binary), self.user_data_dir, self.max_cache_mb)
+                await browser.start()
+                self._browser = browser
+        return self._browser
+
+    async def _fetch_one(self, job: dict, wait_time: int = 5) -> str:
+        """抓取单个任务，失败时返回 None，页面不存在时抛出 PermanentFetchError"""
+        url = job['url']
+        try:
+            browser = await self._ensure_browser()
+            save_path, filename = job.get('save_path'), job.get('filename')
+            timing = job.get('timing')
+            # 页内提取模式下启用 archive_raw_html 时在关闭页面前另取整页源码存档
+            archive = {} if save_path and (job.get('fetch_rules') or {}).get('archive_raw_html') else None
+            async with self._semaphore:
+                started = time.time()
+                html = await browser.fetch(url, job.get('fetch_rules'), wait_time, job.get('extract_spec'),
+                                           timing=timing, archive=archive)
+                if timing is not None:
+                    timing['wall_ms'] = round((time.time() - started) * 1000, 1)
+            if job.get('extract_spec'):
+                # 默认只存档提取结果，启用 archive_raw_html 时存档整页源码
+                save_html_async((archive or {}).get('html') or html, save_path, filename, job.get('fetch_rules'))
+            else:
+                save_html_snapshot(html, save_path, filename, job.get('fetch_rules'))
+            return html
+        except PermanentFetchError:
+            print(f"[WARNING] Page not found: {url}")
+            raise
+        except asyncio.TimeoutError:
+            print(f"[ERROR] Timeout when loading: {url}")
+            return None
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch page {url}: {str(e)}")
+            return None
+
+    async def _fetch_many(self, jobs: list, wait_time: int = 5) -> list:
+        """并发抓取多个任务，页面不存在的任务在结果中为 PermanentFetchError"""
+        return await asyncio.gather(*(self._fetch_one(job, wait_time) for job in jobs), return_exceptions=True)
+
+    def fetch_page(self, url, save_path=None, filename=None, wait_time=5, fetch_rules=None, extract_spec=None,
+                   timing=None):
+        """与 page_fetcher.fetch_page 相同的同步接口"""
+        job = {
+            "url": url,
+            "save_path": save_path,
+            "filename": filename,
+            "fetch_rules": fetch_rules,
+            "extract_spec": extract_spec,
+            "timing": timing,
+        }
+        return self._run(self._fetch_one(job, wait_time))
+
+    def fetch_pages(self, jobs: list, wait_time: int = 5) -> list:
+        """
+        同时抓取多个页面
+
+        参数：
+            jobs (list[dict]): 抓取任务，见 BaseScraper.get_fetch_job
+            wait_time (int): 未配置就绪选择器时的页面等待秒数
+
+        返回：
+            list: 与 jobs 顺序一致的 HTML 列表，失败项为 None，页面不存在的项为 PermanentFetchError
+        """
+        return self._run(self._fetch_many(jobs, wait_time))
+
+    def close(self):
+        """关闭浏览器并停止事件循环"""
+        if self._browser is not None:
+            try:
+                self._run(self._browser.close())
+            except Exception as e:
+                print(f"[WARNING] Error while closing Chrome: {str(e)}")
+            self._browser = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+def init_cdp_fetcher(cdp_config: dict = None, profile_config: dict = None) -> CdpFetcher:
+    """
+    按配置创建全局 CDP 抓取后端（若已存在则先关闭）
+
+    参数：
+        cdp_config (dict): crawler.cdp 配置，包含 chrome_binary / max_pages / user_data_dir
+        profile_config (dict): crawler.browser_profile 配置；启用且未指定 user_data_dir 时
+                               使用 <root>/cdp 下的持久化目录，跨运行复用 HTTP 缓存
+
+    返回：
+        CdpFetcher: 全局 CDP 抓取后端
+    """
+    global _fetcher
+    cdp_config = cdp_config or {}
+    profile_config = get_profile_config({'browser_profile': profile_config or {}})
+    user_data_dir = cdp_config.get('user_data_dir') or None
+    max_cache_mb = 0
+    if profile_config.get('enabled'):
+        # CDP 后端所有站点共用一个浏览器，因此只有一个持久化目录
+        user_data_dir = user_data_dir or get_profile_dir(profile_config, "cdp", 0)
+        max_cache_mb = profile_config.get('disk_cache_mb', 0)
+    with _fetcher_lock:
+        if _fetcher is not None:
+            _fetcher.close()
+        _fetcher = CdpFetcher(
+            chrome_binary=cdp_config.get('chrome_binary') or None,
+            max_pages=cdp_config.get('max_pages', 24),
+            user_data_dir=user_data_dir,
+            max_cache_mb=max_cache_mb
+        )
+        return _fetcher
+
+
+def get_cdp_fetcher() -> CdpFetcher:
+    """获取全局 CDP 抓取后端，未初始化时按默认配置创建"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = CdpFetcher()
+        return _fetcher
+
+
+def shutdown_cdp_fetcher():
+    """关闭全局 CDP 抓取后端"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is not None:
+            _fetcher.close()
+            _fetcher = None
+
+
+def fetch_page(url, save_path=None, filename=None, wait_time=5, fetch_rules=None, extract_spec=None, site_name=None,
+               timing=None):
+    """
+    使用 CDP 后端加载商品页面，返回完整 HTML，可选保存到本地（与 page_fetcher.fetch_page 参数一致）
+
+    参数：
+        url (str): 商品页面 URL
+        save_path (str): 保存 HTML 的目录（可选）
+        filename (str): HTML 文件名（如 f_1.html）
+        wait_time (int): 未配置就绪选择器时的页面等待秒数
+        fetch_rules (dict): 站点抓取规则
+        extract_spec (dict): 页内提取规格
+        site_name (str): 站点名称（CDP 后端所有站点共用一个浏览器，仅为保持接口一致）
+        timing (dict): 传入时写入本次抓取的计时及请求计数
+
+    返回：
+        str: 页面 HTML 字符串，失败时返回 None
+
+    异常：
+        PermanentFetchError: 主文档返回 404 / 410
+    """
+    return get_cdp_fetcher().fetch_page(url, save_path, filename, wait_time, fetch_rules, extract_spec, timing)
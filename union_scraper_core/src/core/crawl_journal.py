@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# union_scraper/crawl_journal.py
+
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 默认配置（crawler.journal）
+DEFAULT_JOURNAL_CONFIG = {
+    "enabled": True,
+    "file": "crawl_journal.sqlite",  # 与 output/ 同级
+    "fresh_hours": 72,               # 在该时长内完成的商品再次运行时跳过；0 表示已完成的商品一律跳过
+}
+
+# 运行模式
+MODE_RESUME = "resume"            # 默认：跳过新近完成的商品，其余（未完成、失败、过期）重新处理
+MODE_FORCE = "force"              # 忽略日志，处理全部商品
+MODE_ONLY_FAILED = "only_failed"  # 只处理上次失败的商品
+
+# 阶段 → 记录完成时间的列
+STAGE_COLUMNS = {
+    "fetched": "fetched_at",
+    "parsed": "parsed_at",
+    "saved": "saved_at",
+    "done": "images_at",
+}
+
+# 商品处理状态表
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    url TEXT,
+    site TEXT,
+    status TEXT NOT NULL,
+    failed_stage TEXT,
+    error TEXT,
+    content_hash TEXT,
+    fetched_at REAL,
+    parsed_at REAL,
+    saved_at REAL,
+    images_at REAL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def hash_content(html: str) -> str:
+    """页面内容的 SHA-256，用于判断两次抓取的页面是否相同"""
+    return hashlib.sha256(html.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class CrawlJournal:
+    """
+    抓取日志：记录每个商品的处理阶段（fetched / parsed / saved / done，或 failed）、
+    页面内容哈希和时间戳。程序中断后重新运行时只处理未完成的商品
+    """
+
+    def __init__(self, path: str, fresh_hours: float = 72):
+        """
+        参数：
+            path (str): SQLite 文件路径
+            fresh_hours (float): 新近完成的时长（小时），0 表示不过期
+        """
+        self.path = path
+        self.fresh_seconds = float(fresh_hours or 0) * 3600
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(JOURNAL_SCHEMA)
+        self._db.commit()
+
+    def _upsert(self, product_id: str, values: dict):
+        """插入或更新一个商品的记录"""
+        values = dict(values, updated_at=time.time())
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO products (product_id, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT(product_id) DO UPDATE SET {updates}",
+                (product_id, *values.values())
+            )
+            self._db.commit()
+
+    def mark(self, product_id: str, stage: str, **fields):
+        """
+        记录商品完成了某个阶段
+
+        参数：
+            product_id (str): 商品键（站点:ID，带 URL 标签时为 站点:ID_标签，见 input_loader.get_product_key）
+            stage (str): fetched / parsed / saved / done
+            **fields: 同时更新的其他列（url / site / content_hash）
+        """
+        values = dict(fields, status=stage, failed_stage=None, error=None)
+        values[STAGE_COLUMNS[stage]] = time.time()
+        if stage == "fetched":
+            # 重新抓取时清除上次运行的后续阶段
+            values.update(parsed_at=None, saved_at=None, images_at=None)
+        self._upsert(product_id, values)
+
+    def mark_failed(self, product_id: str, stage: str, error: str, **fields):
+        """
+        记录商品在某个阶段失败
+
+        参数：
+            product_id (str): 商品 ID
+            stage (str): 失败的阶段（fetch / parse / save / images / write）
+            error (str): 错误信息
+            **fields: 同时更新的其他列（url / site）
+        """
+        self._upsert(product_id, dict(fields, status="failed", failed_stage=stage, error=str(error)[:500]))
+
+    def get(self, product_id: str) -> dict:
+        """读取一个商品的记录，没有时返回 None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
+        return dict(row) if row else None
+
+    def is_fresh(self, record: dict, url: str) -> bool:
+        """记录是否为同一 URL 且在新近时长内完成"""
+        if not record or record["status"] != "done" or record["url"] != url:
+            return False
+        return not self.fresh_seconds or time.time() - record["images_at"] < self.fresh_seconds
+
+    def select(self, products: list, mode: str = MODE_RESUME) -> list:
+        """
+        按运行模式筛选需要处理的页面。共享同一页面的商品 ID 各有一条记录：
+        默认模式下任一 ID 未新近完成即重新处理该页面，MODE_ONLY_FAILED 下任一 ID 失败即重新处理
+
+        参数：
+            products (list[dict]): build_url_fanout 返回的商品（按 keys 查找记录，没有时按 key）
+            mode (str): MODE_RESUME / MODE_FORCE / MODE_ONLY_FAILED
+
+        返回：
+            list[dict]: 需要处理的商品（保持原顺序）
+        """
+        if mode == MODE_FORCE:
+            return list(products)
+        selected = []
+        for product in products:
+            records = [self.get(key) for key in product.get("keys", [product["key"]])]
+            if mode == MODE_ONLY_FAILED:
+                if any(record and record["status"] == "failed" for record in records):
+                    selected.append(product)
+            elif not all(self.is_fresh(record, product["url"]) for record in records):
+                selected.append(product)
+        return selected
+
+    def format_summary(self) -> str:
+        """各状态的商品数量"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM products GROUP BY status").fetchall()
+        return ", ".join(f"{row['status']} {row['n']}" for row in rows) or "empty"
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            self._db.close()
+
+
+def create_crawl_journal(journal_config: dict = None):
+    """
+    按 crawler.journal 配置创建抓取日志
+
+    参数：
+        journal_config (dict): 包含 enabled / file / fresh_hours
+
+    返回：
+        CrawlJournal: 抓取日志，未启用时返回 None
+    """
+    config = dict(DEFAULT_JOURNAL_CONFIG)
+    config.update(journal_config or {})
+    if not config["enabled"]:
+        return None
+    return CrawlJournal(config["file"], config["fresh_hours"])
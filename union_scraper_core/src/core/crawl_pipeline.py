@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# union_scraper/crawl_pipeline.py
+
+import time
+import queue
+import threading
+
+# 默认配置（crawler.pipeline）
+DEFAULT_PIPELINE_CONFIG = {
+    "parse_workers": 2,   # 解析进程数，0 表示在线程中解析（便于调试）
+    "image_workers": 2,   # 图片探测和提交下载的线程数
+    "write_workers": 1,   # 写出 JSON 的线程数
+    "queue_size": 16,     # 各阶段之间队列的容量，队列满时上游阶段等待（背压）
+}
+
+# 通知工作线程退出的哨兵
+_STOP = object()
+
+
+class StageMetrics:
+    """单个阶段的统计：处理数量、失败数量和忙碌时间（用于计算利用率）"""
+
+    def __init__(self, name: str, workers: int):
+        """
+        参数：
+            name (str): 阶段名称
+            workers (int): 工作线程数
+        """
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True):
+        """记录一次处理"""
+        with self._lock:
+            self.processed += 1
+            self.busy += seconds
+            if not ok:
+                self.failed += 1
+
+    def utilization(self) -> float:
+        """工作线程的忙碌比例（0~1）"""
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0 or not self.workers:
+            return 0.0
+        return min(1.0, self.busy / (elapsed * self.workers))
+
+
+class PipelineStage:
+    """
+    流水线中的一个阶段：从有界队列中取任务交给处理函数，结果放入下一阶段的队列。
+    下一阶段的队列已满时当前阶段等待，从而把压力传回上游
+    """
+
+    def __init__(self, name: str, handler, workers: int = 1, queue_size: int = 16, on_error=None):
+        """
+        参数：
+            name (str): 阶段名称
+            handler (callable): 处理函数，接收任务，返回交给下一阶段的任务；返回 None 表示任务到此结束
+            workers (int): 工作线程数
+            queue_size (int): 输入队列容量
+            on_error (callable): 处理函数抛出异常时调用 on_error(阶段名称, 任务, 异常)，用于记录失败
+        """
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.next_stage = None
+        self.metrics = StageMetrics(name, self.workers)
+        self.max_depth = 0
+        self._threads = []
+
+    def put(self, item):
+        """放入任务，队列已满时阻塞"""
+        self.queue.put(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def start(self):
+        """启动工作线程"""
+        self.metrics.started = time.monotonic()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"pipeline-{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        """工作线程：处理任务直到收到哨兵"""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            started = time.monotonic()
+            result, ok = None, True
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                ok = False
+                print(f"[ERROR] Pipeline stage {self.name} failed: {e}")
+                if self.on_error is not None:
+                    try:
+                        self.on_error(self.name, item, e)
+                    except Exception as error:
+                        print(f"[ERROR] Failed to record pipeline stage {self.name} failure: {error}")
+            self.metrics.record(time.monotonic() - started, ok)
+            if result is not None and self.next_stage is not None:
+                self.next_stage.put(result)
+
+    def close(self):
+        """所有任务处理完后停止工作线程"""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def format_stats(self) -> str:
+        """当前队列深度、处理数量和利用率"""
+        metrics = self.metrics
+        return (
+            f"{self.name}: queue {self.queue.qsize()}/{self.queue.maxsize} (max {self.max_depth}), "
+            f"processed {metrics.processed}, failed {metrics.failed}, "
+            f"{metrics.workers} workers {metrics.utilization() * 100:.0f}% busy"
+        )
+
+
+class CrawlPipeline:
+    """
+    分阶段的抓取流水线：各阶段由有界队列串联，独立并发运行，
+    通过各阶段的队列深度和利用率可以看出瓶颈所在（队列常满、利用率接近 100% 的阶段）
+    """
+
+    def __init__(self, on_error=None):
+        """
+        参数：
+            on_error (callable): 任一阶段的处理函数抛出异常时调用 on_error(阶段名称, 任务, 异常)
+        """
+        self.on_error = on_error
+        self.stages = []
+        self.sources = {}
+
+    def add_source(self, name: str, workers: int) -> StageMetrics:
+        """
+        登记由外部线程驱动的首个阶段（如由调度器驱动的抓取阶段），只统计利用率
+
+        参数：
+            name (str): 阶段名称
+            workers (int): 外部工作线程数
+
+        返回：
+            StageMetrics: 由外部线程调用 record() 记录每次处理
+        """
+        self.sources[name] = StageMetrics(name, workers)
+        return self.sources[name]
+
+    def add_stage(self, name: str, handler, workers: int = 1, queue_size: int = 16) -> PipelineStage:
+        """
+        在末尾追加一个阶段
+
+        参数：
+            name (str): 阶段名称
+            handler (callable): 处理函数，见 PipelineStage
+            workers (int): 工作线程数
+            queue_size (int): 输入队列容量
+
+        返回：
+            PipelineStage: 新阶段
+        """
+        stage = PipelineStage(name, handler, workers, queue_size, self.on_error)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        """启动所有阶段"""
+        for stage in self.stages:
+            stage.start()
+
+    def submit(self, item):
+        """将任务放入第一个阶段，队列已满时阻塞"""
+        self.stages[0].put(item)
+
+    def close(self):
+        """按顺序等待各阶段处理完剩余任务并停止"""
+        for stage in self.stages:
+            stage.close()
+
+    def format_stats(self) -> list:
+        """
+        生成各阶段的统计
+
+        返回：
+            list[str]: 每个阶段一行
+        """
+        lines = []
+        for metrics in self.sources.values():
+            lines.append(
+                f"{metrics.name}: processed {metrics.processed}, failed {metrics.failed}, "
+                f"{metrics.workers} workers {metrics.utilization() * 100:.0f}% busy"
+            )
+        lines.extend(stage.format_stats() for stage in self.stages)
+        return lines
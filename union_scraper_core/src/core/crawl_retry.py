@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# union_scraper/crawl_retry.py
+
+import random
+import threading
+
+# 失败类型
+FAILURE_TRANSIENT = "transient"  # 超时、5xx、浏览器崩溃、未取到页面：稍后重试
+FAILURE_PERMANENT = "permanent"  # 404、无效 URL、未支持的网站：重试无意义
+FAILURE_PARSE = "parse"          # 取到页面但解析失败或结果为空（如验证码页面）
+
+# 默认配置（crawler.retry）
+DEFAULT_RETRY_CONFIG = {
+    "max_attempts": 3,            # 每个商品最多抓取的次数（含第一次），1 表示不重试
+    "backoff_seconds": 30,        # 第一次重试前的等待秒数
+    "backoff_factor": 2,          # 每次重试的等待时间倍数
+    "max_backoff_seconds": 600,   # 等待时间上限
+}
+
+# 页面不存在，重试和改用浏览器都没有意义
+PERMANENT_HTTP_STATUS = {404, 410}
+
+# 只有错误信息字符串（而非异常对象）时，表示永久失败的关键字
+PERMANENT_KEYWORDS = ("invalid url", "unsupported", "no scraper implemented", "not found")
+
+
+class PermanentFetchError(Exception):
+    """页面永久不可用（如 HTTP 404 / 410），不再重试"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnsupportedSiteError(ValueError):
+    """URL 不属于已支持的网站，或该网站缺少站点配置 / 爬虫实现（重试无意义）"""
+
+
+def get_http_status(error) -> int:
+    """从异常中读取 HTTP 状态码（PermanentFetchError 或 requests 的 HTTPError），没有时返回 None"""
+    status = getattr(error, "status", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error) -> str:
+    """
+    判断抓取失败的类型
+
+    参数：
+        error: 异常对象或错误信息字符串
+
+    返回：
+        str: FAILURE_TRANSIENT 或 FAILURE_PERMANENT（无法判断时按临时失败处理）
+    """
+    if isinstance(error, (PermanentFetchError, UnsupportedSiteError, FileNotFoundError)):
+        # 页面不存在、未支持的网站或缺少站点配置、本地 HTML 不存在
+        return FAILURE_PERMANENT
+    if isinstance(error, BaseException):
+        # 其余异常（包括抓取和驱动中的一般 ValueError）只按 HTTP 状态码区分，默认为临时失败
+        status = get_http_status(error)
+        if status in PERMANENT_HTTP_STATUS:
+            return FAILURE_PERMANENT
+        return FAILURE_TRANSIENT
+    message = str(error).lower()
+    if any(keyword in message for keyword in PERMANENT_KEYWORDS):
+        return FAILURE_PERMANENT
+    return FAILURE_TRANSIENT
+
+
+def get_backoff(attempt: int, retry_config: dict) -> float:
+    """
+    第 attempt 次失败后的等待秒数（指数退避，加入 ±20% 抖动避免重试集中在同一时刻）
+
+    参数：
+        attempt (int): 已抓取的次数（从 1 开始）
+        retry_config (dict): 完整的 crawler.retry 配置
+
+    返回：
+        float: 等待秒数
+    """
+    delay = float(retry_config["backoff_seconds"]) * float(retry_config["backoff_factor"]) ** (attempt - 1)
+    delay = min(delay, float(retry_config["max_backoff_seconds"]))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class FailureTracker:
+    """
+    记录抓取失败并决定是否重试：临时失败在次数上限内返回等待时间，由调度器延后重新抓取；
+    永久失败和解析失败只记录，运行结束时分别汇总。
+    按商品键（站点:ID，见 input_loader.get_product_key）计数，不同站点的同一商品 ID 各自重试
+    """
+
+    def __init__(self, retry_config: dict = None):
+        """
+        参数：
+            retry_config (dict): crawler.retry 配置，缺失字段使用默认值
+        """
+        self.config = dict(DEFAULT_RETRY_CONFIG)
+        self.config.update(retry_config or {})
+        self.max_attempts = max(1, int(self.config["max_attempts"]))
+        self._attempts = {}
+        self._failures = {}
+        self._retried = 0
+        self._recovered = 0
+        self._lock = threading.Lock()
+
+    def attempt(self, product_id: str) -> int:
+        """当前是该商品的第几次抓取（从 1 开始）"""
+        with self._lock:
+            return self._attempts.get(product_id, 0) + 1
+
+    def record_failure(self, product_id: str, url: str, site: str, stage: str, error, kind: str = None):
+        """
+        记录一次失败
+
+        参数：
+            product_id (str): 商品键（站点:ID）
+            url (str): 商品 URL
+            site (str): 站点名称
+            stage (str): 失败的阶段（fetch / parse，或流水线阶段 images / write）
+            error: 异常对象或错误信息
+            kind (str): 失败类型，None 时按 classify_error 判断
+
+        返回：
+            tuple: (失败类型, 重试前的等待秒数；不重试时为 None)
+        """
+        kind = kind or classify_error(error)
+        with self._lock:
+            attempt = self._attempts.get(product_id, 0) + 1
+            self._attempts[product_id] = attempt
+            delay = None
+            if kind == FAILURE_TRANSIENT and attempt < self.max_attempts:
+                delay = get_backoff(attempt, self.config)
+                self._retried += 1
+            self._failures[product_id] = {
+                "id": product_id, "url": url, "site": site, "kind": kind, "stage": stage,
+                "error": str(error)[:200], "attempts": attempt, "retrying": delay is not None,
+            }
+        return kind, delay
+
+    def record_success(self, product_id: str):
+        """抓取成功：清除之前的失败记录（重试后成功的计入 recovered）"""
+        with self._lock:
+            if self._failures.pop(product_id, None) is not None:
+                self._recovered += 1
+
+    def failures(self, kind: str = None) -> list:
+        """
+        最终失败的商品（不含等待重试的）
+
+        参数：
+            kind (str): 只返回该类型，None 返回全部
+
+        返回：
+            list[dict]: {id, url, site, kind, stage, error, attempts}
+        """
+        with self._lock:
+            return [dict(failure) for failure in self._failures.values()
+                    if not failure["retrying"] and (kind is None or failure["kind"] == kind)]
+
+    def format_summary(self) -> list:
+        """
+        生成失败汇总
+
+        返回：
+            list[str]: 第一行为各类型数量和重试情况，之后逐条列出永久失败的商品
+        """
+        failures = self.failures()
+        counts = {kind: 0 for kind in (FAILURE_TRANSIENT, FAILURE_PERMANENT, FAILURE_PARSE)}
+        for failure in failures:
+            counts[failure["kind"]] = counts.get(failure["kind"], 0) + 1
+        lines = [
+            f"transient {counts[FAILURE_TRANSIENT]} (gave up after {self.max_attempts} attempts), "
+            f"permanent {counts[FAILURE_PERMANENT]}, parse {counts[FAILURE_PARSE]}; "
+            f"retried {self._retried}, recovered {self._recovered}"
+        ]
+        for failure in failures:
+            if failure["kind"] == FAILURE_PERMANENT:
+                lines.append(f"  permanent ID={failure['id']} [{failure['site']}] {failure['url']}: {failure['error']}")
+        return lines
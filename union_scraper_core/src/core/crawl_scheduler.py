@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+# union_scraper/crawl_scheduler.py
+
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+
+# 未配置 sites[].crawl 时的站点预算
+DEFAULT_SITE_BUDGET = {
+    "max_concurrency": 1,      # 该站点同时处理的商品数（启用自适应并发时为上限）
+    "min_concurrency": 1,      # 自适应并发的下限，也是起始并发数
+    "requests_per_minute": 30, # 令牌桶速率，0 表示不限速
+    "burst": 1,                # 令牌桶容量（允许的瞬时突发请求数）
+}
+
+# 默认配置（crawler.scheduler）
+DEFAULT_SCHEDULER_CONFIG = {
+    "progress_interval": 30,   # 输出进度的间隔秒数，0 表示不输出
+    "adaptive": {},            # 自适应并发配置，见 DEFAULT_ADAPTIVE_CONFIG
+}
+
+# 自适应并发默认配置（crawler.scheduler.adaptive）
+DEFAULT_ADAPTIVE_CONFIG = {
+    "enabled": False,
+    "window": 10,              # 每处理多少个商品评估一次
+    "increase": 1,             # 评估正常时并发数的加量
+    "decrease": 0.5,           # 评估异常时并发数的乘数
+    "max_error_rate": 0.2,     # 窗口内临时失败比例上限
+    "max_empty_rate": 0.1,     # 窗口内解析结果为空（多为验证码页面）比例上限
+    "latency_factor": 2.0,     # 窗口内抓取耗时中位数超过基线的倍数时视为站点变慢
+}
+
+# 无法识别站点的商品（无效 URL、未支持的网站）归入该队列，不限速
+UNKNOWN_SITE = "other"
+
+
+def get_site_budget(site_config: dict) -> dict:
+    """
+    读取站点配置中的抓取预算（sites[].crawl），缺失字段使用默认值
+
+    参数：
+        site_config (dict): config.json 中单个站点的配置
+
+    返回：
+        dict: 完整的站点预算
+    """
+    budget = dict(DEFAULT_SITE_BUDGET)
+    budget.update((site_config or {}).get('crawl', {}))
+    return budget
+
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为 1h02m03s / 2m03s / 3s"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class TokenBucket:
+    """线程安全的令牌桶：按固定速率补充令牌，取不到令牌时阻塞等待"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        参数：
+            requests_per_minute (float): 每分钟补充的令牌数，0 表示不限速
+            burst (int): 令牌桶容量
+        """
+        self.rate = float(requests_per_minute or 0) / 60
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，必要时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AimdController:
+    """
+    加性增、乘性减（AIMD）的并发控制：每个窗口评估一次，错误率、空解析率和抓取耗时都正常时并发数加 increase，
+    任一项超标时乘以 decrease；并发数最终稳定在站点能承受的最高水平附近
+    """
+
+    def __init__(self, minimum: int, maximum: int, config: dict):
+        """
+        参数：
+            minimum (int): 并发数下限（起始值）
+            maximum (int): 并发数上限
+            config (dict): 完整的自适应并发配置
+        """
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.config = config
+        self.window = max(1, int(config["window"]))
+        self.baseline = None
+        self._reset()
+
+    def _reset(self):
+        """开始新的评估窗口"""
+        self.latencies = []
+        self.samples = 0
+        self.errors = 0
+        self.empty = 0
+
+    def record(self, limit: int, latency: float = None, ok: bool = True, empty: bool = False):
+        """
+        记录一次结果，窗口满时评估
+
+        参数：
+            limit (int): 当前并发数
+            latency (float): 抓取耗时（秒），失败时为 None
+            ok (bool): 是否抓取成功
+            empty (bool): 解析结果是否为空（只记录，不作为新样本）
+
+        返回：
+            tuple: (新的并发数, 调整原因)；未评估时为 (limit, None)
+        """
+        if empty:
+            # 解析结果在抓取之后才反馈，该商品已在抓取时计入窗口
+            self.empty += 1
+            return limit, None
+        self.samples += 1
+        if not ok:
+            self.errors += 1
+        if latency is not None:
+            self.latencies.append(latency)
+        if self.samples < self.window:
+            return limit, None
+
+        error_rate = self.errors / self.samples
+        empty_rate = min(1.0, self.empty / self.samples)
+        latency = sorted(self.latencies)[len(self.latencies) // 2] if self.latencies else None
+        self._reset()
+
+        reason = None
+        if error_rate > self.config["max_error_rate"]:
+            reason = f"error rate {error_rate:.0%}"
+        elif empty_rate > self.config["max_empty_rate"]:
+            reason = f"empty parse rate {empty_rate:.0%}"
+        elif latency is not None and self.baseline and latency > self.baseline * self.config["latency_factor"]:
+            reason = f"latency {latency:.1f}s (baseline {self.baseline:.1f}s)"
+        if reason is not None:
+            return max(self.minimum, int(limit * float(self.config["decrease"]))), reason
+
+        if latency is not None:
+            # 基线跟随正常窗口的耗时缓慢变化
+            self.baseline = latency if self.baseline is None else self.baseline * 0.7 + latency * 0.3
+        return min(self.maximum, limit + int(self.config["increase"])), "healthy"
+
+
+class SiteState:
+    """单个站点的待处理队列、令牌桶、并发限制和进度统计"""
+
+    def __init__(self, name: str, budget: dict, adaptive: dict = None):
+        """
+        参数：
+            name (str): 站点名称
+            budget (dict): 完整的站点预算
+            adaptive (dict): 完整的自适应并发配置，未启用时并发数固定为 max_concurrency
+        """
+        self.name = name
+        self.bucket = TokenBucket(budget['requests_per_minute'], budget['burst'])
+        self.max_concurrency = max(1, int(budget['max_concurrency']))
+        self.limit = self.max_concurrency
+        self.controller = None
+        if adaptive and adaptive['enabled']:
+            self.controller = AimdController(budget['min_concurrency'], self.max_concurrency, adaptive)
+            self.limit = self.controller.minimum
+        self.active = 0
+        self.queue = deque()
+        self.delayed = []  # 等待重试的商品：(可重试的时间, 序号, 商品) 小顶堆
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = None
+        self.finished = None
+        self.condition = threading.Condition()
+
+    def throughput(self) -> float:
+        """已完成商品的处理速率（个/分钟）"""
+        if not self.started or not self.done:
+            return 0.0
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+
+class CrawlScheduler:
+    """
+    按站点并发调度商品：每个站点有独立的队列、令牌桶和并发上限，
+    不同站点互不等待，同一站点始终在自己的预算内运行；运行期间定期输出进度、ETA 和各站点吞吐量
+    """
+
+    def __init__(self, budgets: dict, batch_size: int = 1, progress_interval: float = 30, progress_extra=None,
+                 adaptive: dict = None):
+        """
+        参数：
+            budgets (dict): {站点名称: 完整的站点预算}
+            batch_size (int): 每个工作线程一次取出的商品数（多标签页模式下一批一起抓取）
+            progress_interval (float): 输出进度的间隔秒数，0 表示不输出
+            progress_extra (callable): 返回附加进度行（list[str]）的函数，如流水线各阶段的统计
+            adaptive (dict): 自适应并发配置（crawler.scheduler.adaptive），缺失字段使用默认值
+        """
+        self.adaptive = dict(DEFAULT_ADAPTIVE_CONFIG)
+        self.adaptive.update(adaptive or {})
+        self.sites = {name: SiteState(name, budget, self.adaptive) for name, budget in budgets.items()}
+        self.batch_size = max(1, int(batch_size))
+        self.progress_interval = progress_interval
+        self.progress_extra = progress_extra
+        self._started = None
+        self._stop = threading.Event()
+        self._sequence = itertools.count()
+
+    def add(self, site_name: str, item):
+        """
+        将商品加入对应站点的队列（未配置的站点使用默认预算）
+
+        参数：
+            site_name (str): 站点名称
+            item: 交给工作函数的商品
+        """
+        if site_name not in self.sites:
+            budget = dict(DEFAULT_SITE_BUDGET)
+            if site_name == UNKNOWN_SITE:
+                budget['requests_per_minute'] = 0
+            # 不访问网站的队列不需要自适应并发
+            self.sites[site_name] = SiteState(site_name, budget, None if site_name == UNKNOWN_SITE else self.adaptive)
+        site = self.sites[site_name]
+        site.queue.append(item)
+        site.total += 1
+
+    def retry(self, site_name: str, item, delay: float):
+        """
+        在 delay 秒后将商品重新交给该站点的工作线程（每次重试计为一个新任务）。
+        等待期间工作线程继续处理队列中的其他商品，不阻塞抓取
+
+        参数：
+            site_name (str): 站点名称（须已通过 add 加入过商品）
+            item: 交给工作函数的商品
+            delay (float): 等待秒数
+        """
+        site = self.sites[site_name]
+        with site.condition:
+            heapq.heappush(site.delayed, (time.monotonic() + max(0.0, delay), next(self._sequence), item))
+            site.total += 1
+            site.retries += 1
+            site.condition.notify_all()
+
+    def report(self, site_name: str, latency: float = None, ok: bool = True, empty: bool = False):
+        """
+        反馈一次处理结果，用于调整站点的并发数（未启用自适应并发时忽略）
+
+        参数：
+            site_name (str): 站点名称
+            latency (float): 抓取耗时（秒）
+            ok (bool): 抓取是否成功（只应反馈临时失败，永久失败与站点负载无关）
+            empty (bool): 解析结果是否为空（验证码等软封锁页面）
+        """
+        site = self.sites.get(site_name)
+        if site is None or site.controller is None:
+            return
+        with site.condition:
+            limit, reason = site.controller.record(site.limit, latency, ok, empty)
+            if limit != site.limit:
+                print(f"[INFO] {site.name} concurrency {site.limit} -> {limit} ({reason})")
+                site.limit = limit
+                site.condition.notify_all()
+
+    def _take_batch(self, site: SiteState) -> list:
+        """
+        从站点队列中取出一批商品：先取已到重试时间的商品，再取新商品；
+        只剩等待重试的商品时等到最早的重试时间，全部处理完时返回空列表
+        """
+        with site.condition:
+            while True:
+                batch = []
+                now = time.monotonic()
+                while site.delayed and site.delayed[0][0] <= now and len(batch) < self.batch_size:
+                    batch.append(heapq.heappop(site.delayed)[2])
+                while site.queue and len(batch) < self.batch_size:
+                    batch.append(site.queue.popleft())
+                if batch or not site.delayed:
+                    return batch
+                site.condition.wait(site.delayed[0][0] - now)
+
+    def _site_worker(self, site: SiteState, worker_fn):
+        """站点工作线程：在令牌桶和并发上限内不断取出商品交给工作函数"""
+        while True:
+            batch = self._take_batch(site)
+            if not batch:
+                return
+            with site.condition:
+                while site.active >= site.limit:
+                    site.condition.wait()
+                site.active += 1
+                if site.started is None:
+                    site.started = time.monotonic()
+            try:
+                for _ in batch:
+                    site.bucket.acquire()
+                worker_fn(site.name, batch)
+                with site.condition:
+                    site.done += len(batch)
+            except Exception as e:
+                print(f"[ERROR] Crawl worker for {site.name} failed: {e}")
+                with site.condition:
+                    site.done += len(batch)
+                    site.failed += len(batch)
+            finally:
+                with site.condition:
+                    site.active -= 1
+                    if site.done >= site.total and not site.delayed:
+                        site.finished = time.monotonic()
+                    site.condition.notify_all()
+
+    def _report_progress(self):
+        """进度线程：定期输出进度"""
+        while not self._stop.wait(self.progress_interval):
+            for line in self.format_progress():
+                print(f"[INFO] {line}")
+
+    def run(self, worker_fn):
+        """
+        处理所有已加入的商品，全部完成后返回
+
+        参数：
+            worker_fn (callable): 工作函数，接收 (站点名称, 商品列表)；抛出的异常只记录，不影响其他商品。
+                                  需要重试的商品由工作函数调用 retry() 重新加入
+        """
+        self._started = time.monotonic()
+        threads = []
+        for site in self.sites.values():
+            for slot in range(min(site.max_concurrency, max(1, len(site.queue)))):
+                thread = threading.Thread(
+                    target=self._site_worker, args=(site, worker_fn), name=f"crawl-{site.name}-{slot}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        reporter = None
+        if self.progress_interval:
+            reporter = threading.Thread(target=self._report_progress, name="crawl-progress", daemon=True)
+            reporter.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self._stop.set()
+            if reporter is not None:
+                reporter.join()
+
+    def format_progress(self) -> list:
+        """
+        生成进度报告
+
+        返回：
+            list[str]: 第一行为总体进度和 ETA，之后每个站点一行（已完成/总数、当前并发上限、吞吐量），最后是附加进度行
+        """
+        total = sum(site.total for site in self.sites.values())
+        done = sum(site.done for site in self.sites.values())
+        elapsed = time.monotonic() - self._started if self._started else 0
+        percent = done / total * 100 if total else 100.0
+        if done and done < total:
+            eta = format_duration(elapsed / done * (total - done))
+        else:
+            eta = "-"
+        lines = [f"Progress {done}/{total} ({percent:.1f}%), elapsed {format_duration(elapsed)}, ETA {eta}"]
+        for site in self.sites.values():
+            if not site.total:
+                continue
+            adaptive = ""
+            if site.controller is not None:
+                adaptive = f" (adaptive {site.controller.minimum}-{site.controller.maximum})"
+            lines.append(
+                f"  {site.name}: {site.done}/{site.total}, failed {site.failed}, retries {site.retries}, "
+                f"waiting {len(site.delayed)}, active {site.active}/{site.limit}{adaptive}, "
+                f"{site.throughput():.1f}/min"
+            )
+        if self.progress_extra is not None:
+            lines.extend(f"  {line}" for line in self.progress_extra())
+        return lines
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# union_scraper/db_sink.py
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# 默认配置（output.db_sink）
+DEFAULT_DB_SINK_CONFIG = {
+    "enabled": False,
+    "path": "../union_product_marker_webserver/data/database.db",  # 网页端数据库
+    "batch_size": 50,        # 每个事务写入的商品数
+    "flush_seconds": 5,      # 不足一批时最多等待的秒数
+    "keep_json": True,       # 同时保留每个商品的 JSON 文件（合并、上传流程照常可用）
+}
+
+# 与网页端 /crawler-upload/import 相同的时间格式
+UPLOAD_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 通知写入线程退出的哨兵
+_STOP = object()
+
+
+class DbSink:
+    """
+    将解析后的商品直接写入网页端数据库的 sources / products 表（与 /crawler-upload/import 的写入方式一致），
+    在后台线程中按批写入，每批一个事务；抓取完成后几秒内即可在网页端标注，不再需要合并和上传
+    """
+
+    def __init__(self, path: str, batch_size: int = 50, flush_seconds: float = 5, keep_json: bool = True):
+        """
+        参数：
+            path (str): 网页端 SQLite 数据库路径
+            batch_size (int): 每个事务写入的商品数
+            flush_seconds (float): 不足一批时最多等待的秒数
+            keep_json (bool): 是否同时保留每个商品的 JSON 文件
+        """
+        self.path = path
+        self.keep_json = keep_json
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = float(flush_seconds)
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        # 网页端同时在读写数据库，等待锁释放而不是立即失败
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._thread = threading.Thread(target=self._run, name="db-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, source_name: str, product: dict):
+        """
+        提交一个商品（不阻塞）
+
+        参数：
+            source_name (str): 数据来源（站点名称，与网页端导入的来源一致）
+            product (dict): 商品数据（含 local_images）
+        """
+        self._queue.put((source_name, product))
+
+    def _run(self):
+        """写入线程：攒够一批或等待超时后写入一个事务"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: list):
+        """
+        在一个事务中写入一批商品；事务失败时整批回滚，再逐个商品单独写入，
+        只有本身写入失败的商品计入 failed（keep_json 为 false 时这些商品没有其他副本）
+        """
+        try:
+            inserted, updated = self._write_transaction(batch)
+        except sqlite3.Error as e:
+            if len(batch) == 1:
+                source_name, product = batch[0]
+                print(f"[ERROR] Failed to write product {product.get('id')} ({source_name}) to {self.path}: {e}")
+                self.failed += 1
+                return
+            print(f"[WARNING] Failed to write {len(batch)} products to {self.path}, retrying one by one: {e}")
+            for item in batch:
+                self._write([item])
+            return
+        self.inserted += inserted
+        self.updated += updated
+        self.batches += 1
+
+    def _write_transaction(self, batch: list) -> tuple:
+        """
+        在一个事务中写入一批商品（出错时回滚并抛出 sqlite3.Error）
+
+        返回：
+            tuple: (新增数, 更新数)
+        """
+        now = datetime.now().strftime(UPLOAD_TIME_FORMAT)
+        inserted = updated = 0
+        with self._db:
+            for source_name, product in batch:
+                product_id = str(product.get("id", ""))
+                raw_json = json.dumps(product)
+                cursor = self._db.execute(
+                    "UPDATE sources SET raw_json = ?, uploaded_at = ? WHERE product_id = ? AND source_name = ?",
+                    (raw_json, now, product_id, source_name)
+                )
+                if cursor.rowcount:
+                    updated += 1
+                else:
+                    self._db.execute(
+                        "INSERT INTO sources (product_id, source_name, raw_json, uploaded_at) VALUES (?, ?, ?, ?)",
+                        (product_id, source_name, raw_json, now)
+                    )
+                    inserted += 1
+                # 确保 products 表中存在该商品（已有的商品保留标注数据）
+                self._db.execute(
+                    "INSERT OR IGNORE INTO products (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (product_id, product.get("product_name") or "未命名", now, now)
+                )
+        return inserted, updated
+
+    def format_stats(self) -> str:
+        """写入统计"""
+        return (
+            f"inserted {self.inserted}, updated {self.updated}, failed {self.failed}, "
+            f"{self.batches} transactions"
+        )
+
+    def close(self):
+        """写完队列中剩余的商品后关闭数据库"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._db.close()
+
+
+def create_db_sink(sink_config: dict = None):
+    """
+    按 output.db_sink 配置创建数据库输出
+
+    参数：
+        sink_config (dict): 包含 enabled / path / batch_size / flush_seconds / keep_json
+
+    返回：
+        DbSink: 数据库输出；未启用时返回 None
+    """
+    config = dict(DEFAULT_DB_SINK_CONFIG)
+    config.update(sink_config or {})
+    if not config["enabled"]:
+        return None
+    if not os.path.exists(config["path"]):
+        # 不自动创建空数据库，表结构由网页端初始化
+        raise FileNotFoundError(f"Web server database not found: {config['path']}")
+    return DbSink(config["path"], config["batch_size"], config["flush_seconds"], config["keep_json"])
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+# union_scraper/driver_pool.py
+
+import platform
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+
+from .browser_profile import get_profile_config, get_profile_dir, prepare_profile_dir, get_profile_args, get_cache_mb
+from .fetch_timing import is_timing_enabled
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，缺失时不做内存回收检查
+    psutil = None
+
+# 进程内只解析一次 chromedriver 路径
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# 全局驱动池：未启用持久化目录时所有站点共用 "default" 池，启用后每个站点一个池
+DEFAULT_POOL = "default"
+_pools = {}
+_pool_config = {}
+_profile_config = get_profile_config({})
+_pool_lock = threading.RLock()
+
+# 当前线程租借浏览器时等待空闲槽位和启动 Chrome 的累计秒数（见 pop_lease_wait）
+_lease_wait = threading.local()
+
+
+def resolve_driver_path() -> str:
+    """
+    解析 chromedriver 可执行文件路径（每个进程只执行一次 ChromeDriverManager().install()）
+
+    返回：
+        str: chromedriver 路径
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def build_chrome_options(extra_args: list = None) -> Options:
+    """
+    构建无头 Chrome 的启动参数
+
+    参数：
+        extra_args (list[str]): 额外的启动参数（如持久化用户数据目录）
+
+    返回：
+        Options: Chrome 选项
+    """
+    options = Options()
+
+    # 基本配置
+    options.add_argument("--headless=new")  # 使用新版无头模式
+    options.add_argument("--no-sandbox")  # 禁用沙箱
+    options.add_argument("--disable-dev-shm-usage")  # 禁用/dev/shm使用
+
+    # 禁用不必要的功能
+    options.add_argument("--disable-extensions")  # 禁用扩展
+    options.add_argument("--disable-notifications")  # 禁用通知
+    options.add_argument("--disable-popup-blocking")  # 禁用弹窗阻止
+
+    # GPU相关（保持基本渲染功能）
+    options.add_argument("--disable-gpu")  # 禁用GPU加速
+
+    # 内存相关
+    options.add_argument("--disable-features=IsolateOrigins,site-per-process")  # 禁用站点隔离
+
+    # 安全相关
+    options.add_argument("--ignore-certificate-errors")  # 忽略证书错误
+    options.add_argument("--allow-insecure-localhost")  # 允许不安全的本地连接
+
+    # 页面加载策略：DOMContentLoaded 后即返回，由就绪选择器决定何时取源码
+    options.page_load_strategy = "eager"
+
+    # 窗口设置
+    options.add_argument("--window-size=1280,800")
+    options.add_argument("--force-device-scale-factor=1")
+
+    # 用户代理
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36")
+
+    # 实验性选项
+    options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
+    options.add_experimental_option("useAutomationExtension", False)
+
+    # 记录抓取计时时开启 performance 日志，用于统计被拦截/放行的请求数
+    if is_timing_enabled():
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    for arg in extra_args or []:
+        options.add_argument(arg)
+
+    return options
+
+
+def create_driver(extra_args: list = None) -> webdriver.Chrome:
+    """
+    启动一个新的无头 Chrome 实例
+
+    参数：
+        extra_args (list[str]): 额外的启动参数
+
+    返回：
+        webdriver.Chrome: Chrome 驱动实例
+    """
+    service = ChromeService(resolve_driver_path())
+
+    # Windows特定配置
+    if platform.system() == "Windows":
+        service.creation_flags = 0x08000000  # CREATE_NO_WINDOW
+
+    return webdriver.Chrome(service=service, options=build_chrome_options(extra_args))
+
+
+class PooledDriver:
+    """驱动池中的一个槽位，记录驱动实例及其已加载的页面数"""
+
+    def __init__(self, slot: int, profile_dir: str = None, max_cache_mb: float = 0):
+        """
+        参数：
+            slot (int): 槽位序号
+            profile_dir (str): 该槽位专用的持久化用户数据目录，None 表示使用临时目录
+            max_cache_mb (float): 持久化目录的磁盘缓存上限（MB）
+        """
+        self.slot = slot
+        self.profile_dir = profile_dir
+        self.max_cache_mb = max_cache_mb
+        self.driver = None
+        self.pages = 0
+        self.pages_since_cache_check = 0
+
+    def start(self):
+        """启动（或重启）该槽位的浏览器；使用持久化目录时先清理锁文件并按上限修剪缓存"""
+        extra_args = []
+        if self.profile_dir:
+            prepare_profile_dir(self.profile_dir, self.max_cache_mb)
+            extra_args = get_profile_args(self.profile_dir, self.max_cache_mb)
+        self.driver = create_driver(extra_args)
+        self.pages = 0
+        self.pages_since_cache_check = 0
+
+    def quit(self):
+        """关闭该槽位的浏览器，不抛出异常"""
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"[WARNING] Error while closing Chrome driver: {str(e)}")
+        finally:
+            self.driver = None
+            self.pages = 0
+
+    def is_healthy(self) -> bool:
+        """通过一次轻量脚本调用检查浏览器是否仍可用"""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def cache_over_limit(self, check_pages: int) -> float:
+        """
+        每加载 check_pages 个页面检查一次持久化目录的缓存大小
+
+        返回：
+            float: 超过上限时返回缓存大小（MB），否则返回 0
+        """
+        if not self.profile_dir or not self.max_cache_mb or not check_pages:
+            return 0
+        if self.pages_since_cache_check < check_pages:
+            return 0
+        self.pages_since_cache_check = 0
+        cache_mb = get_cache_mb(self.profile_dir)
+        return cache_mb if cache_mb > self.max_cache_mb else 0
+
+    def rss_mb(self) -> float:
+        """统计 chromedriver 及其所有子进程（Chrome）的常驻内存，单位 MB"""
+        if psutil is None or self.driver is None:
+            return 0.0
+        try:
+            root = psutil.Process(self.driver.service.process.pid)
+            processes = [root] + root.children(recursive=True)
+            total = 0
+            for proc in processes:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+
+class DriverPool:
+    """
+    Chrome 驱动池：预热 N 个浏览器实例，按次租借，
+    归还时做健康检查，并在达到页面数或内存上限后回收重启。
+    """
+
+    def __init__(self, size: int = 1, max_pages_per_driver: int = 50, max_rss_mb: float = 0,
+                 profile_dirs: list = None, max_cache_mb: float = 0, cache_check_pages: int = 0):
+        """
+        初始化驱动池（浏览器在首次租借时才启动）
+
+        参数：
+            size (int): 浏览器实例数量
+            max_pages_per_driver (int): 单个浏览器加载多少页面后回收，0 表示不限制
+            max_rss_mb (float): 单个浏览器内存上限（MB），0 表示不限制
+            profile_dirs (list[str]): 每个槽位的持久化用户数据目录，None 表示使用临时目录
+            max_cache_mb (float): 持久化目录的磁盘缓存上限（MB），回收重启时修剪
+            cache_check_pages (int): 每加载多少页面检查一次缓存大小，超过上限时回收（重启时修剪），0 表示不检查
+        """
+        self.size = max(1, int(size))
+        self.max_pages_per_driver = int(max_pages_per_driver or 0)
+        self.max_rss_mb = float(max_rss_mb or 0)
+        self.cache_check_pages = int(cache_check_pages or 0)
+        self._idle = queue.Queue()
+        profile_dirs = profile_dirs or [None] * self.size
+        self._slots = [PooledDriver(i, profile_dirs[i], max_cache_mb) for i in range(self.size)]
+        for slot in self._slots:
+            self._idle.put(slot)
+        self._closed = False
+
+    def warm_up(self):
+        """预先启动池中所有浏览器，避免首批页面承担启动耗时"""
+        slots = []
+        try:
+            while True:
+                slots.append(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            for slot in slots:
+                if not slot.is_healthy():
+                    slot.start()
+        finally:
+            for slot in slots:
+                self._idle.put(slot)
+
+    @contextmanager
+    def lease(self, timeout: float = None, pages: int = 1):
+        """
+        租借一个浏览器，使用结束后自动归还
+
+        参数：
+            timeout (float): 等待空闲浏览器的最长秒数，None 表示一直等待
+            pages (int): 本次租借将加载的页面数（多标签页批量抓取时大于 1），计入回收阈值
+
+        返回：
+            webdriver.Chrome: 可用的 Chrome 驱动
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        wait_started = time.monotonic()
+        slot = self._idle.get(timeout=timeout)
+        try:
+            if not slot.is_healthy():
+                if slot.driver is not None:
+                    print(f"[WARNING] Chrome slot {slot.slot} is unhealthy, restarting")
+                slot.quit()
+                slot.start()
+            slot.pages += pages
+            slot.pages_since_cache_check += pages
+            _lease_wait.seconds = getattr(_lease_wait, "seconds", 0.0) + time.monotonic() - wait_started
+            yield slot.driver
+        finally:
+            self._release(slot)
+
+    def _release(self, slot: PooledDriver):
+        """归还浏览器，必要时回收"""
+        if self._closed:
+            slot.quit()
+            return
+
+        reason = None
+        if self.max_pages_per_driver and slot.pages >= self.max_pages_per_driver:
+            reason = f"page count {slot.pages}"
+        elif self.max_rss_mb:
+            rss = slot.rss_mb()
+            if rss > self.max_rss_mb:
+                reason = f"RSS {rss:.0f} MB"
+        if reason is None:
+            # 运行中的浏览器不能清理缓存目录，超过上限时回收，下次启动前修剪
+            cache_mb = slot.cache_over_limit(self.cache_check_pages)
+            if cache_mb:
+                reason = f"disk cache {cache_mb:.0f} MB"
+
+        if reason:
+            print(f"[INFO] Recycling Chrome slot {slot.slot} ({reason})")
+            slot.quit()
+
+        self._idle.put(slot)
+
+    def rss_mb(self) -> float:
+        """池中所有浏览器当前的常驻内存总和（MB），未安装 psutil 时为 0"""
+        return sum(slot.rss_mb() for slot in self._slots)
+
+    def close(self):
+        """关闭池中所有浏览器"""
+        self._closed = True
+        for slot in self._slots:
+            slot.quit()
+
+
+def _create_pool(name: str) -> DriverPool:
+    """按当前配置创建一个驱动池；name 为站点名时使用该站点的持久化目录"""
+    size = max(1, int(_pool_config.get('size', 1)))
+    profile_dirs = None
+    if _profile_config.get('enabled') and name != DEFAULT_POOL:
+        profile_dirs = [get_profile_dir(_profile_config, name, slot) for slot in range(size)]
+    return DriverPool(
+        size=size,
+        max_pages_per_driver=_pool_config.get('max_pages_per_driver', 50),
+        max_rss_mb=_pool_config.get('max_rss_mb', 0),
+        profile_dirs=profile_dirs,
+        max_cache_mb=_profile_config.get('disk_cache_mb', 0),
+        cache_check_pages=_profile_config.get('cache_check_pages', 0)
+    )
+
+
+def init_driver_pool(pool_config: dict = None, profile_config: dict = None) -> DriverPool:
+    """
+    按配置重建全局驱动池（已存在的池会先关闭）
+
+    参数：
+        pool_config (dict): crawler.driver_pool 配置，包含 size / max_pages_per_driver / max_rss_mb
+        profile_config (dict): crawler.browser_profile 配置；启用后每个站点使用独立的池和持久化目录
+
+    返回：
+        DriverPool: 共用的默认驱动池；启用持久化目录时各站点的池在首次使用时创建，返回 None
+    """
+    global _pool_config, _profile_config
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _pool_config = dict(pool_config or {})
+        _profile_config = get_profile_config({'browser_profile': profile_config or {}})
+        if uses_site_pools():
+            return None
+        return get_driver_pool()
+
+
+def pop_lease_wait() -> float:
+    """
+    读取并清零当前线程累计的租借等待秒数（排队等待空闲浏览器和启动 Chrome 的时间），
+    用于从抓取耗时中扣除本地排队时间，只保留站点本身的响应时间
+
+    返回：
+        float: 上次调用以来的等待秒数
+    """
+    seconds = getattr(_lease_wait, "seconds", 0.0)
+    _lease_wait.seconds = 0.0
+    return seconds
+
+
+def uses_site_pools() -> bool:
+    """是否为每个站点使用独立的驱动池（启用了持久化用户数据目录）"""
+    return bool(_profile_config.get('enabled'))
+
+
+def get_driver_pool(site_name: str = None) -> DriverPool:
+    """
+    获取驱动池，未创建时按当前配置创建
+
+    参数：
+        site_name (str): 站点名称；启用持久化目录时每个站点一个池，否则忽略
+
+    返回：
+        DriverPool: 驱动池
+    """
+    name = site_name if (site_name and uses_site_pools()) else DEFAULT_POOL
+    with _pool_lock:
+        if name not in _pools:
+            _pools[name] = _create_pool(name)
+        return _pools[name]
+
+
+def shutdown_driver_pool():
+    """关闭所有驱动池"""
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# union_scraper/fetch_engine.py
+
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from .driver_pool import uses_site_pools
+from .fetch_timing import get_fetch_timing
+from .page_fetcher import fetch_page, save_html_snapshot
+from .tab_fetcher import fetch_pages_in_tabs
+from .cdp_fetcher import fetch_page as cdp_fetch_page, get_cdp_fetcher
+from .crawl_retry import PermanentFetchError, PERMANENT_HTTP_STATUS
+
+# 抓取引擎类型
+ENGINE_BROWSER = "browser"        # 始终使用浏览器渲染
+ENGINE_HTTP_FIRST = "http_first"  # 先用 HTTP 获取，内容不完整时回退到浏览器
+
+# 浏览器后端类型
+BACKEND_SELENIUM = "selenium"     # Selenium + chromedriver（驱动池）
+BACKEND_CDP = "cdp"               # 直接通过 DevTools 协议 WebSocket 控制 Chrome
+
+# 与浏览器保持一致的请求头
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-SG,en;q=0.9",
+}
+
+# 全局抓取引擎
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def is_html_complete(html: str, fetch_rules: dict) -> bool:
+    """
+    判断 HTTP 返回的 HTML 是否已包含解析所需内容
+
+    使用站点规则中的 complete_selectors（未配置时使用 ready_selectors），任一匹配即视为完整。
+
+    参数：
+        html (str): 页面 HTML
+        fetch_rules (dict): 站点抓取规则
+
+    返回：
+        bool: 内容是否完整
+    """
+    if not html:
+        return False
+    selectors = fetch_rules.get('complete_selectors') or fetch_rules.get('ready_selectors') or []
+    if not selectors:
+        return False
+    soup = BeautifulSoup(html, 'html.parser')
+    return any(soup.select_one(selector) is not None for selector in selectors)
+
+
+def get_wire_bytes(response) -> int:
+    """
+    响应在网络上传输的字节数（压缩后）：优先取 Content-Length，分块传输时取底层连接已读取的字节数
+
+    参数：
+        response (requests.Response): 已读取内容的响应
+
+    返回：
+        int: 字节数，无法获得时退回解码后的大小
+    """
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return int(content_length)
+    try:
+        return int(response.raw.tell())
+    except Exception:
+        return len(response.content)
+
+
+class FetchEngine:
+    """
+    页面抓取引擎：按站点规则选择 HTTP 或浏览器获取页面，并统计各自命中次数
+    """
+
+    def __init__(self, http_pool_size: int = 10, http_timeout: float = 15, backend: str = BACKEND_SELENIUM):
+        """
+        初始化抓取引擎
+
+        参数：
+            http_pool_size (int): 每个主机保持的 keep-alive 连接数
+            http_timeout (float): HTTP 请求超时秒数
+            backend (str): 浏览器后端，selenium 或 cdp
+        """
+        if backend not in (BACKEND_SELENIUM, BACKEND_CDP):
+            print(f"[WARNING] Unknown fetch backend '{backend}', using selenium")
+            backend = BACKEND_SELENIUM
+        self.backend = backend
+        self.http_timeout = http_timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=http_pool_size, pool_maxsize=http_pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats = defaultdict(lambda: {"http": 0, "browser": 0, "failed": 0})
+        self._stats_lock = threading.Lock()
+
+    def _count(self, site_name: str, key: str):
+        """累加统计计数"""
+        with self._stats_lock:
+            self._stats[site_name][key] += 1
+
+    def _record_timing(self, product_id, site_name: str, url: str, engine: str, html, timing: dict, started: float):
+        """写入一条抓取计时（未启用计时日志时忽略）"""
+        timing_log = get_fetch_timing()
+        if timing_log is None or timing is None:
+            return
+        timing.setdefault('wall_ms', round((time.time() - started) * 1000, 1))
+        timing_log.record(product_id, site_name, url, engine, bool(html), timing)
+
+    def fetch_http(self, url: str, fetch_rules: dict, timing: dict = None) -> str:
+        """
+        通过 HTTP 获取页面，内容不完整或请求失败时返回 None
+
+        参数：
+            url (str): 页面 URL
+            fetch_rules (dict): 站点抓取规则
+            timing (dict): 传入时写入首字节时间和响应大小
+
+        返回：
+            str: 完整的 HTML，或 None
+
+        异常：
+            PermanentFetchError: 页面不存在（HTTP 404 / 410），无需再用浏览器尝试
+        """
+        try:
+            response = self.session.get(url, timeout=fetch_rules.get('http_timeout', self.http_timeout))
+            if response.status_code in PERMANENT_HTTP_STATUS:
+                raise PermanentFetchError(f"HTTP {response.status_code} for {url}", response.status_code)
+            response.raise_for_status()
+            html = response.text
+            if timing is not None:
+                timing['ttfb_ms'] = round(response.elapsed.total_seconds() * 1000, 1)
+                timing['document_bytes'] = len(response.content)
+                timing['transfer_bytes'] = get_wire_bytes(response)
+        except PermanentFetchError:
+            raise
+        except Exception as e:
+            print(f"[WARNING] HTTP fetch failed for {url}: {str(e)}")
+            return None
+
+        if not is_html_complete(html, fetch_rules):
+            print(f"[INFO] HTTP response incomplete, falling back to browser: {url}")
+            return None
+        return html
+
+    def fetch(self, url: str, fetch_rules: dict, save_path=None, filename=None, site_name: str = "unknown",
+              extract_spec: dict = None, product_id=None) -> str:
+        """
+        按站点规则获取页面 HTML，可选保存到本地
+
+        参数：
+            url (str): 页面 URL
+            fetch_rules (dict): 站点抓取规则（engine 字段选择引擎）
+            save_path (str): 保存 HTML 的目录（可选）
+            filename (str): HTML 文件名
+            site_name (str): 站点名称，用于统计
+            extract_spec (dict): 浏览器页内提取规格（仅浏览器引擎使用），见 page_fetcher.fetch_page
+            product_id (str): 商品 ID，用于计时日志
+
+        返回：
+            str: 页面 HTML，失败时返回 None
+
+        异常：
+            PermanentFetchError: 页面不存在（HTTP 获取或浏览器加载的主文档返回 404 / 410）
+        """
+        fetch_rules = fetch_rules or {}
+        engine = fetch_rules.get('engine', ENGINE_BROWSER)
+        timing = {} if get_fetch_timing() is not None else None
+        started = time.time()
+
+        if engine == ENGINE_HTTP_FIRST:
+            try:
+                html = self.fetch_http(url, fetch_rules, timing)
+            except PermanentFetchError:
+                self._count(site_name, "failed")
+                raise
+            if html:
+                save_html_snapshot(html, save_path, filename, fetch_rules)
+                self._count(site_name, "http")
+                self._record_timing(product_id, site_name, url, "http", html, timing, started)
+                return html
+            if timing is not None:
+                # HTTP 尝试失败，记录其耗时后改用浏览器计时
+                timing = {"http_attempt_ms": round((time.time() - started) * 1000, 1)}
+        elif engine != ENGINE_BROWSER:
+            print(f"[WARNING] Unknown fetch engine '{engine}', using browser")
+
+        browser_started = time.time()
+        browser_fetch = cdp_fetch_page if self.backend == BACKEND_CDP else fetch_page
+        try:
+            html = browser_fetch(url, save_path=save_path, filename=filename, fetch_rules=fetch_rules,
+                                 extract_spec=extract_spec, site_name=site_name, timing=timing)
+        except PermanentFetchError:
+            self._count(site_name, "failed")
+            raise
+        self._count(site_name, "browser" if html else "failed")
+        self._record_timing(product_id, site_name, url, "browser", html, timing, browser_started)
+        return html
+
+    def fetch_in_tabs(self, jobs: list, max_tabs: int = 4) -> list:
+        """
+        在一个浏览器的多个标签页中批量抓取（仅用于浏览器引擎的站点）
+
+        参数：
+            jobs (list[dict]): 抓取任务，见 BaseScraper.get_fetch_job
+            max_tabs (int): 同时打开的标签页数量
+
+        返回：
+            list: 与 jobs 顺序一致的 HTML 列表，失败项为 None，页面不存在的项为 PermanentFetchError
+        """
+        if get_fetch_timing() is not None:
+            for job in jobs:
+                job['timing'] = {}
+        started = time.time()
+
+        if self.backend == BACKEND_CDP:
+            # CDP 后端本身即可在同一浏览器中并发加载多个页面
+            results = get_cdp_fetcher().fetch_pages(jobs)
+        else:
+            results = [None] * len(jobs)
+            if uses_site_pools():
+                # 每个站点有独立的浏览器（持久化目录），按站点分组后分别在各自的浏览器中抓取
+                groups = {}
+                for index, job in enumerate(jobs):
+                    groups.setdefault(job.get('site_name'), []).append(index)
+            else:
+                groups = {None: list(range(len(jobs)))}
+            for site_name, indexes in groups.items():
+                group_results = fetch_pages_in_tabs([jobs[i] for i in indexes], max_tabs=max_tabs,
+                                                    site_name=site_name)
+                for index, html in zip(indexes, group_results):
+                    results[index] = html
+        for job, html in zip(jobs, results):
+            fetched = isinstance(html, str) and bool(html)
+            self._count(job.get('site_name', 'unknown'), "browser" if fetched else "failed")
+            self._record_timing(job.get('product_id'), job.get('site_name', 'unknown'), job['url'], "browser",
+                                html if fetched else None, job.get('timing'), started)
+        return results
+
+    def get_stats(self) -> dict:
+        """
+        获取各站点的命中统计
+
+        返回：
+            dict: {站点名: {"http": n, "browser": n, "failed": n}}
+        """
+        with self._stats_lock:
+            return {site: dict(counts) for site, counts in self._stats.items()}
+
+    def format_stats(self) -> list:
+        """
+        生成 HTTP / 浏览器命中比例的报告行
+
+        返回：
+            list[str]: 每个站点一行
+        """
+        lines = []
+        for site, counts in sorted(self.get_stats().items()):
+            fetched = counts["http"] + counts["browser"]
+            http_ratio = counts["http"] / fetched * 100 if fetched else 0
+            lines.append(
+                f"{site}: HTTP {counts['http']} / browser {counts['browser']} / failed {counts['failed']} "
+                f"(HTTP hit ratio {http_ratio:.1f}%)"
+            )
+        return lines
+
+
+def init_fetch_engine(crawler_config: dict = None) -> FetchEngine:
+    """
+    按 crawler 配置创建全局抓取引擎
+
+    参数：
+        crawler_config (dict): crawler 配置，读取 http_pool_size / http_timeout / fetch_backend
+
+    返回：
+        FetchEngine: 全局抓取引擎
+    """
+    global _engine
+    crawler_config = crawler_config or {}
+    with _engine_lock:
+        _engine = FetchEngine(
+            http_pool_size=crawler_config.get('http_pool_size', 10),
+            http_timeout=crawler_config.get('http_timeout', 15),
+            backend=crawler_config.get('fetch_backend', BACKEND_SELENIUM)
+        )
+        return _engine
+
+
+def get_fetch_engine() -> FetchEngine:
+    """获取全局抓取引擎，未初始化时按默认配置创建"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
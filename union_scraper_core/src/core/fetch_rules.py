@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# union_scraper/fetch_rules.py
+
+from typing import Dict, List
+
+# 资源类型到 URL 通配模式的映射（DevTools Network.setBlockedURLs 只支持按 URL 匹配）
+RESOURCE_TYPE_PATTERNS: Dict[str, List[str]] = {
+    "image": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+    "font": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*"],
+    "stylesheet": ["*.css*"],
+}
+
+# 未配置时的默认抓取规则：不拦截任何请求，固定等待 wait_time 秒
+DEFAULT_FETCH_RULES = {
+    "engine": "browser",
+    "ready_selectors": [],
+    "ready_timeout": 15,
+    "in_page_extract": False,
+    "archive_raw_html": False,  # 页内提取模式下另取整页源码存档（供 use_local_html 重放和 tool_verify_minify 使用）
+    "block_resource_types": [],
+    "block_url_patterns": [],
+}
+
+
+def get_fetch_rules(site_config: dict) -> dict:
+    """
+    读取站点配置中的抓取规则（sites[].fetch），缺失字段使用默认值
+
+    参数：
+        site_config (dict): config.json 中单个站点的配置
+
+    返回：
+        dict: 完整的抓取规则
+    """
+    rules = dict(DEFAULT_FETCH_RULES)
+    rules.update((site_config or {}).get('fetch', {}))
+    return rules
+
+
+def build_block_patterns(fetch_rules: dict) -> List[str]:
+    """
+    根据抓取规则生成需要拦截的 URL 通配模式列表
+
+    参数：
+        fetch_rules (dict): 抓取规则
+
+    返回：
+        list[str]: 去重后的 URL 通配模式
+    """
+    if not fetch_rules:
+        return []
+
+    patterns = []
+    for resource_type in fetch_rules.get('block_resource_types', []):
+        if resource_type not in RESOURCE_TYPE_PATTERNS:
+            print(f"[WARNING] Unknown resource type to block: {resource_type}")
+            continue
+        patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+    patterns.extend(fetch_rules.get('block_url_patterns', []))
+    return list(dict.fromkeys(patterns))
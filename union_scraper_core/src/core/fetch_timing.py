@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# union_scraper/fetch_timing.py
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+# 在页面中读取 Navigation Timing 和资源传输量（毫秒均相对于导航开始时间）
+NAVIGATION_TIMING_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+if (!nav) { return null; }
+var resources = performance.getEntriesByType('resource');
+var transfer = nav.transferSize || 0;
+for (var i = 0; i < resources.length; i++) { transfer += resources[i].transferSize || 0; }
+return {
+    dns_ms: nav.domainLookupEnd - nav.domainLookupStart,
+    connect_ms: nav.connectEnd - nav.connectStart,
+    ttfb_ms: nav.responseStart - nav.startTime,
+    response_ms: nav.responseEnd - nav.responseStart,
+    dom_content_loaded_ms: nav.domContentLoadedEventEnd - nav.startTime,
+    load_ms: nav.loadEventEnd ? nav.loadEventEnd - nav.startTime : null,
+    document_bytes: nav.transferSize || 0,
+    transfer_bytes: transfer,
+    resources: resources.length
+};
+"""
+
+# 运行结束时汇总的指标及其在报告中的名称
+SUMMARY_METRICS = [
+    ("wall_ms", "wall"),
+    ("ttfb_ms", "ttfb"),
+    ("dom_content_loaded_ms", "dcl"),
+    ("wait_ms", "wait"),
+    ("transfer_bytes", "bytes"),
+    ("blocked", "blocked"),
+]
+
+# 汇总的分位数
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+# 默认配置
+DEFAULT_TIMING_CONFIG = {
+    "enabled": False,  # 开启后每个浏览器都记录 performance 日志，每次抓取都会读取，只在排查性能时启用
+    "file": "fetch_timing.jsonl",
+}
+
+# 全局计时日志
+_timing_log = None
+_timing_lock = threading.Lock()
+
+
+def new_network_counts() -> dict:
+    """创建一组请求计数：发出的请求数、被拦截数、其他失败数"""
+    return {"requests": 0, "blocked": 0, "failed": 0}
+
+
+def count_network_event(counts: dict, method: str, params: dict):
+    """
+    根据一条 DevTools Network 事件累加请求计数
+
+    被拦截的请求（setBlockedURLs 或 Fetch.failRequest）会以 Network.loadingFailed 结束，
+    带有 blockedReason 或 net::ERR_BLOCKED_BY_CLIENT。
+
+    参数：
+        counts (dict): new_network_counts() 创建的计数
+        method (str): 事件名
+        params (dict): 事件参数
+    """
+    if method == "Network.requestWillBeSent":
+        counts["requests"] += 1
+    elif method == "Network.loadingFailed":
+        if params.get("blockedReason") or "BLOCKED_BY_CLIENT" in params.get("errorText", ""):
+            counts["blocked"] += 1
+        elif not params.get("canceled"):
+            counts["failed"] += 1
+
+
+def count_performance_log(entries: list, counts_by_target: dict):
+    """
+    解析 chromedriver 的 performance 日志，按标签页（target id）累加请求计数
+
+    参数：
+        entries (list[dict]): driver.get_log('performance') 的返回值
+        counts_by_target (dict): {target id: 计数}，缺失的 target 会自动创建
+    """
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])
+        except (KeyError, ValueError):
+            continue
+        inner = message.get("message", {})
+        counts = counts_by_target.setdefault(message.get("webview"), new_network_counts())
+        count_network_event(counts, inner.get("method", ""), inner.get("params", {}))
+
+
+def read_performance_log(driver) -> list:
+    """读取（并清空）驱动的 performance 日志，未开启时返回空列表"""
+    try:
+        return driver.get_log("performance")
+    except Exception:
+        return []
+
+
+def handle_to_target(handle: str) -> str:
+    """把 Selenium 窗口句柄转换为 performance 日志中的 target id"""
+    return handle[len("CDwindow-"):] if handle.startswith("CDwindow-") else handle
+
+
+def normalize_navigation_timing(timing: dict) -> dict:
+    """把页面返回的计时值取整，页面没有导航记录时返回空字典"""
+    result = {}
+    for key, value in (timing or {}).items():
+        result[key] = round(value, 1) if isinstance(value, float) else value
+    return result
+
+
+def collect_driver_timing(driver, counts: dict = None) -> dict:
+    """
+    读取当前标签页的导航计时和请求计数
+
+    参数：
+        driver: Selenium 驱动（已切换到目标标签页）
+        counts (dict): 该标签页的请求计数；None 时读取 performance 日志并汇总所有标签页
+
+    返回：
+        dict: 计时字段（ttfb_ms / dom_content_loaded_ms / transfer_bytes 等）及 requests / blocked / failed
+    """
+    timing = normalize_navigation_timing(driver.execute_script(NAVIGATION_TIMING_SCRIPT))
+    if counts is None:
+        counts_by_target = {}
+        count_performance_log(read_performance_log(driver), counts_by_target)
+        if counts_by_target:
+            counts = new_network_counts()
+            for target_counts in counts_by_target.values():
+                for key in counts:
+                    counts[key] += target_counts[key]
+    if counts:
+        timing.update(counts)
+    return timing
+
+
+def percentile(values: list, pct: float):
+    """
+    最近秩法计算分位数
+
+    参数：
+        values (list[float]): 数值列表
+        pct (float): 分位（0-100）
+
+    返回：
+        float: 分位数，列表为空时返回 None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class FetchTimingLog:
+    """
+    每次抓取的计时记录：逐行写入 JSONL 文件，运行结束时按站点输出分位数汇总
+    """
+
+    def __init__(self, path: str):
+        """
+        参数：
+            path (str): JSONL 文件路径（每次运行覆盖）
+        """
+        self.path = path
+        self._records = defaultdict(list)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def record(self, product_id, site_name: str, url: str, engine: str, ok: bool, timing: dict = None):
+        """
+        写入一条抓取记录
+
+        参数：
+            product_id (str): 商品 ID
+            site_name (str): 站点名称
+            url (str): 页面 URL
+            engine (str): 实际使用的方式（http / browser）
+            ok (bool): 是否抓取成功
+            timing (dict): 计时与请求计数，如 wall_ms / ttfb_ms / blocked 等
+        """
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "product_id": product_id,
+            "site": site_name,
+            "url": url,
+            "engine": engine,
+            "ok": ok,
+        }
+        record.update(timing or {})
+        with self._lock:
+            self._records[site_name].append(record)
+            if self._file:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def format_summary(self) -> list:
+        """
+        按站点生成各指标的分位数汇总（只统计成功的抓取）
+
+        返回：
+            list[str]: 每个站点每种方式一行
+        """
+        lines = []
+        with self._lock:
+            records = {site: list(items) for site, items in self._records.items()}
+        for site, items in sorted(records.items()):
+            by_engine = defaultdict(list)
+            for item in items:
+                if item["ok"]:
+                    by_engine[item["engine"]].append(item)
+            for engine, rows in sorted(by_engine.items()):
+                parts = []
+                for key, label in SUMMARY_METRICS:
+                    values = [row[key] for row in rows if isinstance(row.get(key), (int, float))]
+                    if not values:
+                        continue
+                    stats = "/".join(_format_value(key, percentile(values, p)) for p in SUMMARY_PERCENTILES)
+                    parts.append(f"{label} {stats}")
+                pct_label = "/".join(f"p{p}" for p in SUMMARY_PERCENTILES)
+                lines.append(f"{site} [{engine}, {len(rows)} pages, {pct_label}]: " + ", ".join(parts))
+        return lines
+
+    def close(self):
+        """关闭 JSONL 文件"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def _format_value(key: str, value) -> str:
+    """格式化汇总中的单个数值"""
+    if key == "transfer_bytes":
+        return f"{value / 1024:.0f}KB"
+    if key.endswith("_ms"):
+        return f"{value:.0f}ms"
+    return str(value)
+
+
+def init_fetch_timing(timing_config: dict = None):
+    """
+    按 crawler.fetch_timing 配置创建全局计时日志（若已存在则先关闭）
+
+    参数：
+        timing_config (dict): 包含 enabled / file
+
+    返回：
+        FetchTimingLog: 计时日志，未启用时返回 None
+    """
+    global _timing_log
+    config = dict(DEFAULT_TIMING_CONFIG)
+    config.update(timing_config or {})
+    with _timing_lock:
+        if _timing_log is not None:
+            _timing_log.close()
+        _timing_log = FetchTimingLog(config["file"]) if config["enabled"] else None
+        return _timing_log
+
+
+def get_fetch_timing():
+    """获取全局计时日志，未启用时返回 None"""
+    return _timing_log
+
+
+def is_timing_enabled() -> bool:
+    """是否需要采集抓取计时"""
+    return _timing_log is not None
+
+
+def shutdown_fetch_timing():
+    """关闭全局计时日志"""
+    global _timing_log
+    with _timing_lock:
+        if _timing_log is not None:
+            _timing_log.close()
+            _timing_log = None
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# union_scraper/html_minifier.py
+
+import re
+
+# 需要整体删除的块（脚本单独处理，因为部分脚本需要保留）
+STYLE_PATTERN = re.compile(r"<style\b[^>]*>.*?</style\s*>", re.IGNORECASE | re.DOTALL)
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+SCRIPT_PATTERN = re.compile(r"<script\b([^>]*)>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+SCRIPT_TYPE_PATTERN = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+# 只匹配不含嵌套 <svg 的最内层 SVG，循环删除直到没有剩余
+INNER_SVG_PATTERN = re.compile(r"<svg\b[^>]*>(?:(?!<svg\b).)*?</svg\s*>", re.IGNORECASE | re.DOTALL)
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+PLACEHOLDER_PATTERN = re.compile(r"\x00(\d+)\x00")
+
+# 默认规则：不精简
+DEFAULT_MINIFY_RULES = {
+    "enabled": False,
+    "keep_script_types": [],
+    "keep_script_keywords": [],
+}
+
+
+def get_minify_rules(fetch_rules: dict) -> dict:
+    """
+    读取抓取规则中的 HTML 精简配置（sites[].fetch.minify），缺失字段使用默认值
+
+    参数：
+        fetch_rules (dict): 站点抓取规则
+
+    返回：
+        dict: 完整的精简规则
+    """
+    rules = dict(DEFAULT_MINIFY_RULES)
+    rules.update((fetch_rules or {}).get('minify') or {})
+    return rules
+
+
+def _should_keep_script(attrs: str, body: str, minify_rules: dict) -> bool:
+    """判断脚本是否在站点的保留列表中（按 type 属性或内容关键字匹配）"""
+    match = SCRIPT_TYPE_PATTERN.search(attrs)
+    script_type = match.group(1).lower() if match else ""
+    if script_type in [t.lower() for t in minify_rules.get('keep_script_types', [])]:
+        return True
+    return any(keyword in body for keyword in minify_rules.get('keep_script_keywords', []))
+
+
+def minify_html(html: str, minify_rules: dict) -> str:
+    """
+    删除解析用不到的 <style>、<svg>、注释和不在保留列表中的 <script>，其余内容保持原样
+
+    参数：
+        html (str): 原始 HTML
+        minify_rules (dict): 精简规则，包含 keep_script_types / keep_script_keywords
+
+    返回：
+        str: 精简后的 HTML
+    """
+    if not html:
+        return html
+
+    # 保留的脚本先替换为占位符，避免其内容（如 JSON 中的 "<!--"）被后续规则误删
+    kept = []
+
+    def replace_script(match):
+        if not _should_keep_script(match.group(1), match.group(2), minify_rules):
+            return ""
+        kept.append(match.group(0))
+        return f"\x00{len(kept) - 1}\x00"
+
+    html = SCRIPT_PATTERN.sub(replace_script, html)
+    html = STYLE_PATTERN.sub("", html)
+    html = COMMENT_PATTERN.sub("", html)
+    while True:
+        html, count = INNER_SVG_PATTERN.subn("", html)
+        if not count:
+            break
+    html = BLANK_LINES_PATTERN.sub("\n", html)
+    return PLACEHOLDER_PATTERN.sub(lambda m: kept[int(m.group(1))], html)
+
+
+def maybe_minify_html(html: str, fetch_rules: dict) -> str:
+    """
+    按站点规则精简 HTML，未启用时原样返回
+
+    参数：
+        html (str): 原始 HTML
+        fetch_rules (dict): 站点抓取规则
+
+    返回：
+        str: 用于保存的 HTML
+    """
+    minify_rules = get_minify_rules(fetch_rules)
+    if not minify_rules['enabled']:
+        return html
+    return minify_html(html, minify_rules)
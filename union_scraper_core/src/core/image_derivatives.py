@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# union_scraper/image_derivatives.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖，缺失时不生成衍生图
+    Image = None
+    ImageOps = None
+
+# 衍生图保存在商品目录下的子目录
+DERIVED_DIR = "derived"
+
+# 默认配置（crawler.image_derivatives）
+DEFAULT_DERIVATIVE_CONFIG = {
+    "enabled": False,
+    "workers": 2,            # 进程池大小
+    "normalized_px": 1600,   # 标准化 JPEG 的最长边上限
+    "preview_px": 480,       # 中等尺寸预览图的最长边
+    "thumbnail_px": 160,     # 列表缩略图的最长边
+    "quality": 90,           # JPEG 质量
+}
+
+# 衍生图类型 → 配置中的尺寸字段
+DERIVATIVE_SIZES = {
+    "normalized": "normalized_px",
+    "preview": "preview_px",
+    "thumbnail": "thumbnail_px",
+}
+
+
+def derived_paths(image_path: str) -> dict:
+    """
+    图片各衍生版本的保存路径：<商品目录>/derived/<原文件名>_<类型>.jpg
+
+    参数：
+        image_path (str): 原图路径
+
+    返回：
+        dict: {normalized, preview, thumbnail} → 路径
+    """
+    folder, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    return {kind: os.path.join(folder, DERIVED_DIR, f"{stem}_{kind}.jpg") for kind in DERIVATIVE_SIZES}
+
+
+def build_derivatives(image_path: str, config: dict) -> dict:
+    """
+    解码一次原图，生成标准化 JPEG、预览图和缩略图（在子进程中执行）。
+    衍生图都比原图新时直接返回，不重复生成
+
+    参数：
+        image_path (str): 原图路径
+        config (dict): 完整的 crawler.image_derivatives 配置
+
+    返回：
+        dict: {类型: 路径}
+    """
+    paths = derived_paths(image_path)
+    source_mtime = os.path.getmtime(image_path)
+    if all(os.path.exists(path) and os.path.getmtime(path) >= source_mtime for path in paths.values()):
+        return paths
+
+    os.makedirs(os.path.dirname(paths["normalized"]), exist_ok=True)
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            # 透明背景填充为白色
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        # 从大到小依次缩放，每一级都基于上一级的结果，避免重复处理原图
+        for kind in sorted(DERIVATIVE_SIZES, key=lambda k: -int(config[DERIVATIVE_SIZES[k]])):
+            max_px = int(config[DERIVATIVE_SIZES[kind]])
+            img = img.copy()
+            img.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+            part_path = paths[kind] + ".part"
+            img.save(part_path, "JPEG", quality=int(config["quality"]), optimize=True)
+            os.replace(part_path, paths[kind])
+    return paths
+
+
+class DerivativeBuilder:
+    """
+    在进程池中生成衍生图，与图片下载的网络 I/O 并行（解码和缩放是 CPU 密集操作，线程无法并行）
+    """
+
+    def __init__(self, config: dict):
+        """
+        参数：
+            config (dict): 完整的 crawler.image_derivatives 配置
+        """
+        self.config = dict(config)
+        self._executor = ProcessPoolExecutor(max_workers=max(1, int(config["workers"])))
+
+    def submit(self, image_path: str):
+        """
+        提交一张图片的衍生图生成任务
+
+        参数：
+            image_path (str): 已保存的原图路径
+
+        返回：
+            concurrent.futures.Future: 结果为 {类型: 路径}
+        """
+        return self._executor.submit(build_derivatives, image_path, self.config)
+
+    def close(self):
+        """等待未完成的任务并关闭进程池"""
+        self._executor.shutdown(wait=True)
+
+
+def create_derivative_builder(derivative_config: dict = None):
+    """
+    按 crawler.image_derivatives 配置创建衍生图生成器
+
+    参数：
+        derivative_config (dict): 包含 enabled / workers / normalized_px / preview_px / thumbnail_px / quality
+
+    返回：
+        DerivativeBuilder: 生成器；未启用或未安装 Pillow 时返回 None
+    """
+    config = dict(DEFAULT_DERIVATIVE_CONFIG)
+    config.update(derivative_config or {})
+    if not config["enabled"]:
+        return None
+    if Image is None:
+        print("[WARNING] Pillow is not installed, image derivatives are disabled")
+        return None
+    return DerivativeBuilder(config)
@@ -2,49 +2,643 @@
 # union_scraper/image_downloader.py
 
 import os
+import json
+import asyncio
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
-from ..utils.file_utils import save_file, ensure_dir_exists
+from ..utils.file_utils import ensure_dir_exists
+from .image_store import create_image_store, link_or_copy
+from .image_probe import detect_image_format, is_image_complete, parse_image_header
+from .image_derivatives import create_derivative_builder
 
-def download_images(image_urls, folder_path, filename_generator):
+try:
+    import aiohttp
+except ImportError:  # aiohttp 为可选依赖，缺失时在线程中使用共享的 requests.Session
+    aiohttp = None
+
+# 遇到这些状态码时重试（限流或服务端临时错误）
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 流式写入临时文件时每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 探测图片尺寸时默认读取的字节数
+PROBE_BYTES = 16 * 1024
+
+# 保存的文件扩展名对应的图片格式（见 image_probe.detect_image_format）
+EXTENSION_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".gif": "gif", ".webp": "webp", ".avif": "avif"}
+
+# 默认配置（crawler.image_download）
+DEFAULT_DOWNLOAD_CONFIG = {
+    "concurrency": 16,     # 全局同时下载的图片数
+    "per_host": 6,         # 同一主机同时下载的图片数（复用的 keep-alive 连接数）
+    "timeout": 10,         # 单次请求超时秒数
+    "retries": 2,          # 失败后的最大重试次数
+    "retry_backoff": 1.0,  # 重试前的基础等待秒数（指数退避）
+    "max_image_mb": 20,    # 单张图片大小上限（MB），超过时放弃下载；0 表示不限制
+}
+
+# 全局下载器
+_downloader = None
+_downloader_lock = threading.Lock()
+
+
+class RetryableStatus(Exception):
+    """可重试的 HTTP 状态码"""
+
+
+class IncompleteImage(Exception):
+    """下载的文件被截断或不是图片（可重试）"""
+
+
+class ImageTooLarge(Exception):
+    """图片超过大小上限（不重试）"""
+
+
+class FormatMismatch(Exception):
+    """图片格式与保存的扩展名不符（如 .jpg 收到 WebP；不重试，改用下一个候选 URL）"""
+
+
+def matches_extension(path: str, filepath: str) -> bool:
+    """检查 path 的实际图片格式是否与 filepath 的扩展名一致（未知扩展名视为一致）"""
+    expected = EXTENSION_FORMATS.get(os.path.splitext(filepath)[1].lower())
+    if expected is None:
+        return True
+    with open(path, "rb") as f:
+        return detect_image_format(f.read(32)) == expected
+
+
+def is_retryable(error: Exception) -> bool:
+    """判断下载错误是否值得重试：网络错误、超时和 RETRY_STATUSES 重试，其余 HTTP 错误（如 404）不重试"""
+    if isinstance(error, (RetryableStatus, IncompleteImage)):
+        return True
+    if isinstance(error, (ImageTooLarge, FormatMismatch)):
+        return False
+    if isinstance(error, requests.HTTPError):
+        return False
+    if aiohttp is not None and isinstance(error, aiohttp.ClientResponseError):
+        return False
+    return True
+
+
+class ImageDownloader:
     """
-    下载图片列表中的所有图片到指定文件夹。
+    并发图片下载器：在后台线程中运行 asyncio 事件循环，按主机复用连接，
+    限制全局和单主机的并发数，失败时有限次重试。多个商品的图片可以同时提交，一起并发下载。
+    """
+
+    def __init__(self, concurrency: int = 16, per_host: int = 6, timeout: float = 10, retries: int = 2,
+                 retry_backoff: float = 1.0, max_image_mb: float = 20, store=None, derivatives=None):
+        """
+        初始化下载器（连接在首次下载时创建）
+
+        参数：
+            concurrency (int): 全局并发数
+            per_host (int): 单主机并发数
+            timeout (float): 单次请求超时秒数
+            retries (int): 最大重试次数
+            retry_backoff (float): 重试基础等待秒数
+            max_image_mb (float): 单张图片大小上限（MB），0 表示不限制
+            store (ImageStore): 内容寻址图片存储；提供时图片只保存一份，商品目录中为硬链接
+            derivatives (DerivativeBuilder): 衍生图生成器；提供时每张图片保存后在进程池中生成标准化图、预览图和缩略图
+        """
+        self.store = store
+        self.derivatives = derivatives
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.retry_backoff = retry_backoff
+        self.max_bytes = int(float(max_image_mb or 0) * 1024 * 1024)
+        self._session = None
+        self._semaphore = None
+        self._host_semaphores = {}
+        # 正在下载的 URL → asyncio.Future（结果为保存的路径），同一 URL 只下载一次，后来者等待其结果
+        self._inflight = {}
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._stats = {key: 0 for key in
+                       ("downloaded", "not_modified", "reused", "failed", "fallbacks", "derived",
+                        "bytes_downloaded", "bytes_probed", "bytes_saved")}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="image-download", daemon=True)
+        self._thread.start()
+
+    def _ensure_session(self):
+        """在事件循环中按需创建连接池"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._session is not None:
+            return
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.per_host)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """获取 URL 所在主机的并发限制"""
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._host_semaphores[host]
+
+    def _open_part(self, part_path: str, status: int, resume_from: int, etag: str, last_modified: str,
+                   content_length) -> object:
+        """
+        根据响应头准备临时文件：206 时追加，否则重写；超过大小上限时抛出 ImageTooLarge。
+        同时写入旁注文件记录校验值，供中断后续传时使用 If-Range。
+        """
+        offset = resume_from if status == 206 else 0
+        if content_length is not None and self.max_bytes and offset + int(content_length) > self.max_bytes:
+            raise ImageTooLarge(f"image larger than {self.max_bytes} bytes")
+        os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+        with open(part_path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"etag": etag, "last_modified": last_modified}, f)
+        return open(part_path, "ab" if offset else "wb"), offset
+
+    def _write_chunk(self, f, chunk: bytes, written: int) -> int:
+        """写入一个数据块并检查大小上限，返回累计字节数"""
+        written += len(chunk)
+        if self.max_bytes and written > self.max_bytes:
+            raise ImageTooLarge(f"image larger than {self.max_bytes} bytes")
+        f.write(chunk)
+        return written
+
+    def _fetch_blocking(self, url: str, headers: dict, part_path: str, resume_from: int) -> tuple:
+        """未安装 aiohttp 时在线程池中执行的流式下载"""
+        with self._session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code in RETRY_STATUSES:
+                raise RetryableStatus(f"HTTP {response.status_code}")
+            if response.status_code == 416:
+                # 临时文件已不可续传，丢弃后重新下载
+                self._discard_part(part_path)
+                raise RetryableStatus("HTTP 416")
+            response.raise_for_status()
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if response.status_code == 304:
+                return 304, etag, last_modified, 0
+            f, written = self._open_part(part_path, response.status_code, resume_from, etag, last_modified,
+                                         response.headers.get("Content-Length"))
+            received = written
+            with f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    written = self._write_chunk(f, chunk, written)
+            return response.status_code, etag, last_modified, written - received
+
+    async def _fetch(self, url: str, headers: dict, part_path: str, resume_from: int) -> tuple:
+        """
+        流式下载到临时文件
+
+        返回：
+            tuple: (状态码, ETag, Last-Modified, 本次下载的字节数)
+        """
+        if aiohttp is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch_blocking, url, headers, part_path, resume_from
+            )
+        async with self._session.get(url, headers=headers) as response:
+            if response.status in RETRY_STATUSES:
+                raise RetryableStatus(f"HTTP {response.status}")
+            if response.status == 416:
+                # 临时文件已不可续传，丢弃后重新下载
+                self._discard_part(part_path)
+                raise RetryableStatus("HTTP 416")
+            response.raise_for_status()
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if response.status == 304:
+                return 304, etag, last_modified, 0
+            f, written = self._open_part(part_path, response.status, resume_from, etag, last_modified,
+                                         response.headers.get("Content-Length"))
+            received = written
+            with f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    written = self._write_chunk(f, chunk, written)
+            return response.status, etag, last_modified, written - received
+
+    @staticmethod
+    def _resume_headers(part_path: str) -> tuple:
+        """
+        检查上次中断留下的临时文件，能续传时返回 Range / If-Range 请求头
+
+        返回：
+            tuple: (额外请求头, 已下载字节数)；没有可续传的临时文件时返回 ({}, 0)
+        """
+        meta_path = part_path + ".json"
+        try:
+            size = os.path.getsize(part_path)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}, 0
+        validator = meta.get("etag") or meta.get("last_modified")
+        if not size or not validator:
+            return {}, 0
+        return {"Range": f"bytes={size}-", "If-Range": validator}, size
+
+    @staticmethod
+    def _discard_part(part_path: str):
+        """删除临时文件及其旁注"""
+        for path in (part_path, part_path + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _count(self, key: str, amount: int = 1):
+        """累加本次运行的下载统计（只在事件循环线程中调用）"""
+        self._stats[key] += amount
+
+    async def _derive(self, path: str):
+        """在进程池中生成衍生图（此时已释放下载配额，不阻塞其他图片的下载）"""
+        if self.derivatives is None:
+            return
+        try:
+            await asyncio.wrap_future(self.derivatives.submit(path))
+            self._count("derived")
+        except Exception as e:
+            print(f"[WARN] Failed to build derivatives for {path}: {e}")
+
+    async def _download_candidates(self, candidates, filepath: str, label: str) -> str:
+        """
+        按顺序尝试同一张图片的多个 URL（如按尺寸改写的版本和原图），保存第一个成功的
+
+        参数：
+            candidates (str | list[str]): 单个 URL 或按优先级排列的 URL 列表
+        """
+        if isinstance(candidates, str):
+            candidates = [candidates]
+        for idx, url in enumerate(candidates):
+            final = idx == len(candidates) - 1
+            # 改写后的候选 URL 必须与保存的扩展名格式一致；最后一个（原图）照常保存
+            path = await self._download_one(url, filepath, label, count_failure=final, check_format=not final)
+            if path:
+                if idx:
+                    self._count("fallbacks")
+                await self._derive(path)
+                return path
+            if not final:
+                print(f"[INFO] Falling back to next URL for image {label}: {candidates[idx + 1]}")
+        return None
+
+    async def _download_one(self, url: str, filepath: str, label: str, count_failure: bool = True,
+                            check_format: bool = False) -> str:
+        """
+        下载一张图片并保存，重试后仍失败时返回 None（count_failure 为 False 时不计入失败数，
+        check_format 为 True 时格式与 filepath 扩展名不符的图片视为失败）。
+        同一 URL 同时只有一个下载任务（多个商品共享图片时，两个任务写同一个临时文件会损坏图片），
+        后来的任务等待第一个完成后链接其结果
+        """
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            source = await asyncio.shield(inflight)
+            if not source or (check_format and not matches_extension(source, filepath)):
+                if count_failure:
+                    self._count("failed")
+                return None
+            try:
+                if source != filepath:
+                    link_or_copy(source, filepath)
+            except OSError as e:
+                if count_failure:
+                    self._count("failed")
+                print(f"[WARN] Failed to link image {source} to {filepath}: {e}")
+                return None
+            self._count("reused")
+            print(f"[INFO] Reused concurrent download {label}: {url}")
+            return filepath
+
+        inflight = self._loop.create_future()
+        self._inflight[url] = inflight
+        path = None
+        try:
+            path = await self._download_url(url, filepath, label, count_failure, check_format)
+            return path
+        finally:
+            del self._inflight[url]
+            inflight.set_result(path)
+
+    async def _download_url(self, url: str, filepath: str, label: str, count_failure: bool,
+                            check_format: bool) -> str:
+        """下载一张图片的实际过程（由 _download_one 保证同一 URL 不会并发进入）"""
+        record = self.store.lookup(url) if self.store is not None else None
+        # 已入库且未过免校验时长的 URL 直接链接到商品目录，不发请求
+        if record and self.store.is_fresh(record) and (not check_format or matches_extension(record["path"], filepath)):
+            link_or_copy(record["path"], filepath)
+            self._count("reused")
+            self._count("bytes_saved", record["size"])
+            print(f"[INFO] Reused stored image {label}: {url}")
+            return filepath
+        # 未使用图片存储时，上次已完整下载的文件不再下载
+        if self.store is None and is_image_complete(filepath):
+            self._count("reused")
+            self._count("bytes_saved", os.path.getsize(filepath))
+            print(f"[INFO] Image already complete {label}: {filepath}")
+            return filepath
+
+        part_path = self.store.partial_path(url) if self.store is not None else filepath + ".part"
+        conditional = self.store.conditional_headers(record) if record else {}
+
+        for attempt in range(self.retries + 1):
+            try:
+                resume, resume_from = self._resume_headers(part_path)
+                if resume_from:
+                    print(f"[INFO] Resuming image {label} from byte {resume_from}: {url}")
+                # 先占用主机配额再占用全局配额，避免某个主机排队时占满全局并发
+                async with self._host_semaphore(url), self._semaphore:
+                    print(f"[INFO] Downloading image {label}: {url}")
+                    status, etag, last_modified, received = await self._fetch(
+                        url, {**conditional, **resume}, part_path, resume_from
+                    )
+                self._count("bytes_downloaded", received)
+                if status == 304 and record:
+                    # 内容未变化，沿用已保存的图片
+                    self.store.touch(url)
+                    link_or_copy(record["path"], filepath)
+                    self._count("not_modified")
+                    self._count("bytes_saved", record["size"])
+                    print(f"[INFO] Image not modified {label}: {url}")
+                    return filepath
+
+                # 提交前检查图片是否完整，截断或非图片内容不会进入存储或商品目录
+                if not is_image_complete(part_path):
+                    self._discard_part(part_path)
+                    raise IncompleteImage("downloaded file is truncated or not an image")
+                if check_format and not matches_extension(part_path, filepath):
+                    self._discard_part(part_path)
+                    raise FormatMismatch(f"image format does not match {os.path.basename(filepath)}")
+                if self.store is not None:
+                    link_or_copy(self.store.put_file(url, part_path, etag, last_modified), filepath)
+                else:
+                    os.replace(part_path, filepath)
+                self._discard_part(part_path)
+                self._count("downloaded")
+                print(f"[INFO] Successfully saved image to: {filepath}")
+                return filepath
+            except Exception as e:
+                if isinstance(e, ImageTooLarge):
+                    self._discard_part(part_path)
+                if attempt >= self.retries or not is_retryable(e):
+                    if count_failure:
+                        self._count("failed")
+                    print(f"[WARN] Failed to download image {url}: {e}")
+                    return None
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _read_head_blocking(self, url: str, limit: int) -> bytes:
+        """未安装 aiohttp 时在线程池中执行的头部读取"""
+        head = b""
+        headers = {"Range": f"bytes=0-{limit - 1}"}
+        with self._session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                head += chunk
+                if len(head) >= limit:
+                    break
+        return head[:limit]
+
+    async def _read_head(self, url: str, limit: int) -> bytes:
+        """
+        只读取图片开头的 limit 个字节：请求带 Range，服务端忽略 Range 时读够后提前关闭连接
+        """
+        if aiohttp is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self._read_head_blocking, url, limit)
+        head = b""
+        async with self._session.get(url, headers={"Range": f"bytes=0-{limit - 1}"}) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                head += chunk
+                if len(head) >= limit:
+                    break
+        return head[:limit]
+
+    async def _probe_one(self, url: str, limit: int) -> dict:
+        """探测一张图片的格式和尺寸，已入库的图片直接读取本地文件"""
+        record = self.store.lookup(url) if self.store is not None else None
+        try:
+            if record:
+                with open(record["path"], "rb") as f:
+                    head = f.read(limit)
+            else:
+                async with self._host_semaphore(url), self._semaphore:
+                    head = await self._read_head(url, limit)
+                self._count("bytes_probed", len(head))
+        except Exception as e:
+            print(f"[WARN] Failed to probe image {url}: {e}")
+            return {"url": url, "format": None, "width": None, "height": None}
+        return {"url": url, **parse_image_header(head)}
+
+    async def _probe_all(self, image_urls: list, limit: int) -> list:
+        """并发探测多张图片"""
+        self._ensure_session()
+        return list(await asyncio.gather(*(self._probe_one(url, limit) for url in image_urls)))
+
+    def probe(self, image_urls: list, probe_bytes: int = PROBE_BYTES) -> list:
+        """
+        只读取每张图片开头的若干字节，获取格式和尺寸（等待全部完成后返回）
+
+        参数：
+            image_urls (list): 图片 URL 列表
+            probe_bytes (int): 每张图片最多读取的字节数
+
+        返回：
+            list[dict]: 与 image_urls 顺序一致的 {url, format, width, height}，无法获取的字段为 None
+        """
+        if not image_urls:
+            return []
+        return asyncio.run_coroutine_threadsafe(
+            self._probe_all(list(image_urls), max(32, int(probe_bytes))), self._loop
+        ).result()
+
+    async def _download_product(self, image_urls: list, folder_path: str, filename_generator) -> list:
+        """并发下载一个商品的全部图片，返回成功保存的路径（保持原顺序）"""
+        self._ensure_session()
+        total_images = len(image_urls)
+        tasks = [
+            self._download_candidates(url, os.path.join(folder_path, filename_generator(idx)), f"{idx}/{total_images}")
+            for idx, url in enumerate(image_urls, start=1)
+        ]
+        results = await asyncio.gather(*tasks)
+        saved_paths = [path for path in results if path]
+        print(f"[INFO] Downloaded {len(saved_paths)}/{total_images} images successfully")
+        return saved_paths
+
+    def submit(self, image_urls: list, folder_path: str, filename_generator):
+        """
+        提交一个商品的图片下载任务，立即返回
+
+        参数：
+            image_urls (list): 图片 URL 列表，每项也可以是按优先级排列的候选 URL 列表（前者失败时依次尝试）
+            folder_path (str): 保存图片的本地目录
+            filename_generator (callable): 文件名生成函数，接收从 1 开始的索引，返回文件名
+
+        返回：
+            concurrent.futures.Future: 结果为成功保存的图片路径列表
+        """
+        ensure_dir_exists(folder_path)
+        print(f"[INFO] Found {len(image_urls)} images to download")
+        future = asyncio.run_coroutine_threadsafe(
+            self._download_product(list(image_urls), folder_path, filename_generator), self._loop
+        )
+        with self._pending_lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+        return future
+
+    def download_many(self, jobs: list) -> list:
+        """
+        同时下载多个商品的图片
+
+        参数：
+            jobs (list[tuple]): [(image_urls, folder_path, filename_generator), ...]
+
+        返回：
+            list[list[str]]: 与 jobs 顺序一致的已保存路径列表
+        """
+        futures = [self.submit(*job) for job in jobs if job[0]]
+        results = iter(future.result() for future in futures)
+        return [next(results) if job[0] else [] for job in jobs]
+
+    def wait(self):
+        """等待所有已提交的下载完成"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[ERROR] Image download task failed: {str(e)}")
+
+    def format_stats(self) -> str:
+        """
+        生成本次运行的图片下载报告（应在 wait() 之后调用）
+
+        返回：
+            str: 下载/未修改/免校验复用/失败/退回原图/生成衍生图的数量以及下载、探测和节省的字节数
+        """
+        stats = dict(self._stats)
+        return (
+            f"downloaded {stats['downloaded']}, not modified {stats['not_modified']}, "
+            f"reused without request {stats['reused']}, failed {stats['failed']}, "
+            f"fell back to original {stats['fallbacks']}, derivatives built {stats['derived']}; "
+            f"{stats['bytes_downloaded'] / 1024 / 1024:.1f} MB downloaded, "
+            f"{stats['bytes_probed'] / 1024 / 1024:.1f} MB probed, "
+            f"{stats['bytes_saved'] / 1024 / 1024:.1f} MB saved"
+        )
+
+    async def _close_session(self):
+        """关闭连接池"""
+        if self._session is not None and aiohttp is not None:
+            await self._session.close()
+        elif self._session is not None:
+            self._session.close()
+        self._session = None
+
+    def close(self):
+        """等待未完成的下载，关闭连接并停止事件循环"""
+        self.wait()
+        asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if self.store is not None:
+            self.store.close()
+        if self.derivatives is not None:
+            self.derivatives.close()
+
+
+def init_image_downloader(download_config: dict = None, store_config: dict = None,
+                          derivative_config: dict = None) -> ImageDownloader:
+    """
+    按 crawler.image_download 配置创建全局下载器（若已存在则先关闭）
+
+    参数：
+        download_config (dict): 包含 concurrency / per_host / timeout / retries / retry_backoff / max_image_mb
+        store_config (dict): crawler.image_store 配置，见 image_store.create_image_store
+        derivative_config (dict): crawler.image_derivatives 配置，见 image_derivatives.create_derivative_builder
+
+    返回：
+        ImageDownloader: 全局下载器
+    """
+    global _downloader
+    config = dict(DEFAULT_DOWNLOAD_CONFIG)
+    config.update(download_config or {})
+    with _downloader_lock:
+        if _downloader is not None:
+            _downloader.close()
+        _downloader = ImageDownloader(
+            store=create_image_store(store_config),
+            derivatives=create_derivative_builder(derivative_config),
+            **config
+        )
+        return _downloader
+
+
+def get_image_downloader() -> ImageDownloader:
+    """获取全局下载器，未初始化时按默认配置创建"""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = ImageDownloader(store=create_image_store(), **DEFAULT_DOWNLOAD_CONFIG)
+        return _downloader
+
+
+def shutdown_image_downloader():
+    """等待未完成的下载并关闭全局下载器"""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is not None:
+            _downloader.close()
+            _downloader = None
+
+
+def probe_images(image_urls, probe_bytes=PROBE_BYTES):
+    """
+    探测图片格式和尺寸（只读取开头的若干字节）
 
     参数：
         image_urls (list): 图片 URL 列表
-        folder_path (str): 保存图片的本地目录
-        filename_generator (callable): 文件名生成函数，接收索引参数，返回完整的文件名
+        probe_bytes (int): 每张图片最多读取的字节数
 
     返回：
-        list[str]: 所有下载后图片的本地路径
+        list[dict]: 与 image_urls 顺序一致的 {url, format, width, height}
     """
-    if not image_urls:
-        return []
+    return get_image_downloader().probe(image_urls or [], probe_bytes)
 
-    ensure_dir_exists(folder_path)
-    saved_paths = []
-    total_images = len(image_urls)
 
-    print(f"[INFO] Found {total_images} images to download")
-    
-    for idx, url in enumerate(image_urls, start=1):
-        try:
-            print(f"[INFO] Downloading image {idx}/{total_images}: {url}")
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+def download_images_async(image_urls, folder_path, filename_generator):
+    """
+    提交图片下载任务，不等待完成（用于跨商品并发下载）
 
-            # 使用生成器函数获取文件名
-            filename = filename_generator(idx)
-            filepath = os.path.join(folder_path, filename)
+    参数：
+        image_urls (list): 图片 URL 列表，每项也可以是按优先级排列的候选 URL 列表（前者失败时依次尝试）
+        folder_path (str): 保存图片的本地目录
+        filename_generator (callable): 文件名生成函数，接收索引参数，返回完整的文件名
 
-            save_file(filepath, response.content, mode='wb')
+    返回：
+        concurrent.futures.Future: 结果为所有下载成功的图片本地路径
+    """
+    return get_image_downloader().submit(image_urls or [], folder_path, filename_generator)
 
-            print(f"[INFO] Successfully saved image to: {filepath}")
-            saved_paths.append(filepath)
 
-        except Exception as e:
-            print(f"[WARN] Failed to download image {url}: {e}")
-            continue
+def download_images(image_urls, folder_path, filename_generator):
+    """
+    下载图片列表中的所有图片到指定文件夹。
+
+    参数：
+        image_urls (list): 图片 URL 列表，每项也可以是按优先级排列的候选 URL 列表（前者失败时依次尝试）
+        folder_path (str): 保存图片的本地目录
+        filename_generator (callable): 文件名生成函数，接收索引参数，返回完整的文件名
+
+    返回：
+        list[str]: 所有下载后图片的本地路径
+    """
+    if not image_urls:
+        return []
 
-    print(f"[INFO] Downloaded {len(saved_paths)}/{total_images} images successfully")
-    return saved_paths
+    return download_images_async(image_urls, folder_path, filename_generator).result()
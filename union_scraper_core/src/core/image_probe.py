@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# union_scraper/image_probe.py
+
+import os
+
+# 检查文件结尾时读取的字节数（部分 JPEG 在 EOI 标记后还有少量填充）
+TAIL_BYTES = 1024
+
+# 带有图片尺寸的 JPEG SOF 标记（排除 DHT / JPG / DAC）
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def detect_image_format(head: bytes) -> str:
+    """
+    根据文件开头的魔数判断图片格式
+
+    参数：
+        head (bytes): 文件开头至少 12 个字节
+
+    返回：
+        str: jpeg / png / gif / webp / avif；无法识别时返回 None
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis", b"heic", b"mif1"):
+        return "avif"
+    return None
+
+
+def is_image_complete(path: str) -> bool:
+    """
+    快速检查图片文件是否完整：格式可识别且结尾标记存在（不做完整解码）
+
+    参数：
+        path (str): 图片文件路径
+
+    返回：
+        bool: 文件完整时返回 True；文件不存在、格式无法识别或被截断时返回 False
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(32)
+            f.seek(max(0, size - TAIL_BYTES))
+            tail = f.read()
+    except OSError:
+        return False
+
+    image_format = detect_image_format(head)
+    if image_format == "jpeg":
+        return b"\xff\xd9" in tail
+    if image_format == "png":
+        return b"IEND" in tail[-12:]
+    if image_format == "gif":
+        return tail.endswith(b"\x3b")
+    if image_format == "webp":
+        # RIFF 头中记录了文件总长度（不含前 8 个字节）
+        return int.from_bytes(head[4:8], "little") + 8 <= size
+    return image_format == "avif"
+
+
+def _jpeg_size(head: bytes) -> tuple:
+    """依次跳过 JPEG 段，读取 SOF 段中的宽高"""
+    i = 2
+    while i + 9 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:
+            # 段之间的填充字节
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            return int.from_bytes(head[i + 7:i + 9], "big"), int.from_bytes(head[i + 5:i + 7], "big")
+        i += 2 + int.from_bytes(head[i + 2:i + 4], "big")
+    return None
+
+
+def _webp_size(head: bytes) -> tuple:
+    """读取 WebP 第一个块（VP8 / VP8L / VP8X）中的宽高"""
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        return (int.from_bytes(head[26:28], "little") & 0x3FFF,
+                int.from_bytes(head[28:30], "little") & 0x3FFF)
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def _avif_size(head: bytes) -> tuple:
+    """读取 AVIF 中第一个 ispe 属性的宽高"""
+    i = head.find(b"ispe")
+    if i == -1 or i + 16 > len(head):
+        return None
+    return int.from_bytes(head[i + 8:i + 12], "big"), int.from_bytes(head[i + 12:i + 16], "big")
+
+
+def parse_image_header(head: bytes) -> dict:
+    """
+    只根据文件开头的若干字节解析图片格式和尺寸（无需下载整张图片）
+
+    参数：
+        head (bytes): 文件开头的字节（JPEG 的 EXIF 较大时可能需要几十 KB）
+
+    返回：
+        dict: {format, width, height}；格式无法识别时 format 为 None，尺寸不在 head 范围内时宽高为 None
+    """
+    image_format = detect_image_format(head)
+    size = None
+    if image_format == "jpeg":
+        size = _jpeg_size(head)
+    elif image_format == "png" and len(head) >= 24:
+        size = int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    elif image_format == "gif" and len(head) >= 10:
+        size = int.from_bytes(head[6:8], "little"), int.from_bytes(head[8:10], "little")
+    elif image_format == "webp":
+        size = _webp_size(head)
+    elif image_format == "avif":
+        size = _avif_size(head)
+    width, height = size or (None, None)
+    return {"format": image_format, "width": width, "height": height}
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# union_scraper/image_store.py
+
+import os
+import shutil
+import sqlite3
+import hashlib
+import threading
+import time
+from ..utils.time_utils import get_iso_timestamp
+
+# 默认配置（crawler.image_store）
+DEFAULT_STORE_CONFIG = {
+    "enabled": True,
+    "root": "image_store",
+    "revalidate_ttl_hours": 168,  # 距上次校验不足该时长的图片直接复用，不发请求；0 表示每次都条件请求
+}
+
+# URL → 内容哈希及 HTTP 缓存元数据的索引表结构
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at TEXT NOT NULL
+)
+"""
+
+# 在旧索引上补充的列（列名, 定义）
+INDEX_EXTRA_COLUMNS = [
+    ("etag", "TEXT"),
+    ("last_modified", "TEXT"),
+    ("checked_at", "REAL NOT NULL DEFAULT 0"),
+]
+
+
+def link_or_copy(source: str, target: str):
+    """
+    将 source 以硬链接的形式放到 target（已存在则替换），文件系统不支持硬链接时退回复制
+
+    参数：
+        source (str): 源文件
+        target (str): 目标路径
+    """
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    if os.path.exists(target):
+        if os.path.samefile(source, target):
+            return
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ImageStore:
+    """
+    内容寻址的图片存储：每张图片按 SHA-256 只保存一份（<root>/ab/cd/<hash>），
+    商品目录中的文件是指向它的硬链接；同时维护 URL → 哈希及 ETag / Last-Modified 的索引，
+    已入库的 URL 在 TTL 内直接复用，超过 TTL 后发送条件请求重新校验。
+    """
+
+    def __init__(self, root: str, revalidate_ttl_hours: float = 0):
+        """
+        参数：
+            root (str): 存储根目录，索引保存在 <root>/index.sqlite
+            revalidate_ttl_hours (float): 免校验时长（小时）
+        """
+        self.root = os.path.abspath(root)
+        self.revalidate_ttl = float(revalidate_ttl_hours or 0) * 3600
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(INDEX_SCHEMA)
+        existing = {row["name"] for row in self._db.execute("PRAGMA table_info(images)")}
+        for name, definition in INDEX_EXTRA_COLUMNS:
+            if name not in existing:
+                self._db.execute(f"ALTER TABLE images ADD COLUMN {name} {definition}")
+        self._db.commit()
+
+    def blob_path(self, digest: str) -> str:
+        """按哈希前缀分片的 blob 路径"""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def lookup(self, url: str) -> dict:
+        """
+        查找 URL 已入库的记录
+
+        参数：
+            url (str): 图片 URL
+
+        返回：
+            dict: {path, size, etag, last_modified, checked_at}；未入库或 blob 已丢失时返回 None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash, size, etag, last_modified, checked_at FROM images WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        path = self.blob_path(row["hash"])
+        if not os.path.exists(path):
+            return None
+        return {
+            "path": path,
+            "size": row["size"],
+            "etag": row["etag"],
+            "last_modified": row["last_modified"],
+            "checked_at": row["checked_at"],
+        }
+
+    def is_fresh(self, record: dict) -> bool:
+        """记录是否仍在免校验时长内"""
+        return bool(self.revalidate_ttl) and time.time() - (record["checked_at"] or 0) < self.revalidate_ttl
+
+    def conditional_headers(self, record: dict) -> dict:
+        """根据记录生成条件请求头（If-None-Match / If-Modified-Since）"""
+        headers = {}
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    def touch(self, url: str):
+        """服务端返回 304 后更新校验时间"""
+        with self._lock:
+            self._db.execute("UPDATE images SET checked_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def partial_path(self, url: str) -> str:
+        """下载中的临时文件路径（按 URL 固定，中断后下次运行可续传）"""
+        return os.path.join(self.root, "partial", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+    def put_file(self, url: str, file_path: str, etag: str = None, last_modified: str = None) -> str:
+        """
+        将已下载并校验过的文件移入存储（相同内容只保留一份）并记录 URL 索引及缓存元数据
+
+        参数：
+            url (str): 图片 URL
+            file_path (str): 已下载的临时文件，调用后会被移走或删除
+            etag (str): 响应的 ETag
+            last_modified (str): 响应的 Last-Modified
+
+        返回：
+            str: blob 路径
+        """
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        size = os.path.getsize(file_path)
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.remove(file_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(file_path, path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO images (url, hash, size, fetched_at, etag, last_modified, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, size, get_iso_timestamp(), etag, last_modified, time.time())
+            )
+            self._db.commit()
+        return path
+
+    def close(self):
+        """关闭索引数据库"""
+        with self._lock:
+            self._db.close()
+
+
+def create_image_store(store_config: dict = None):
+    """
+    按 crawler.image_store 配置创建图片存储
+
+    参数：
+        store_config (dict): 包含 enabled / root / revalidate_ttl_hours
+
+    返回：
+        ImageStore: 图片存储，未启用时返回 None
+    """
+    config = dict(DEFAULT_STORE_CONFIG)
+    config.update(store_config or {})
+    if not config["enabled"]:
+        return None
+    return ImageStore(config["root"], config["revalidate_ttl_hours"])
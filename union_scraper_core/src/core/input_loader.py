@@ -2,8 +2,42 @@
 # union_scraper/input_loader.py
 
 import os
+import sqlite3
 import pandas as pd
-from typing import List, Dict
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict
+from urllib.parse import urlsplit, urlunsplit
+
+# 数据库输入源默认配置（input 中 type 为 database 的项）：直接读取网页端的 product_urls 表
+DEFAULT_DATABASE_INPUT = {
+    "path": "../union_product_marker_webserver/data/database.db",
+    "sources": [],       # 只读取这些来源（product_urls.source_name），空表示全部
+    "stale_hours": 0,    # 只读取网页端数据早于该时长（或尚无数据）的 URL，0 表示不过滤
+    "page_size": 500,    # 每次查询的行数
+}
+
+# 网页端 sources.uploaded_at 的时间格式
+SOURCE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 未标记的 URL（输入文件中没有 url_tag 列）
+DEFAULT_URL_TAG = "main"
+
+def normalize_url_tag(url_tag) -> str:
+    """空值或缺失的 URL 标签视为 main"""
+    if not isinstance(url_tag, str) or not url_tag.strip():
+        return DEFAULT_URL_TAG
+    return url_tag.strip()
+
+def get_product_key(product_id: str, url_tag: str = DEFAULT_URL_TAG, site_name: str = None) -> str:
+    """
+    同一商品的不同 URL（single / package / subpack）分别处理，键与 FileManager 的文件名后缀一致；
+    不同站点的商品 ID 互不相关（同一 ID 可能同时出现在 amazon / fairprice / shopee），键中带上站点名称
+
+    返回：
+        str: main 为商品 ID，其余为 ID_标签；传入 site_name 时为 站点:ID 或 站点:ID_标签
+    """
+    key = str(product_id) if url_tag == DEFAULT_URL_TAG else f"{product_id}_{url_tag}"
+    return f"{site_name}:{key}" if site_name else key
 
 def load_single_file(filepath: str) -> List[Dict]:
     """
@@ -13,7 +47,8 @@ def load_single_file(filepath: str) -> List[Dict]:
         filepath (str): 输入文件路径
 
     返回：
-        list[dict]: 形如 [{'id': '1', 'url': 'https://...'}, ...] 的列表
+        list[dict]: 形如 [{'id': '1', 'url': 'https://...', 'url_tag': 'main'}, ...] 的列表
+                    （url_tag 列可选，缺失时为 main）
     """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"输入文件未找到：{filepath}")
@@ -45,7 +80,60 @@ def load_single_file(filepath: str) -> List[Dict]:
     df['id'] = df['id'].astype(str).str.replace('.0', '', regex=False)
 
     # 转换为字典列表
-    return df[['id', 'url']].to_dict(orient='records')
+    if 'url_tag' not in df.columns:
+        df['url_tag'] = DEFAULT_URL_TAG
+    df['url_tag'] = df['url_tag'].map(normalize_url_tag)
+    return df[['id', 'url', 'url_tag']].to_dict(orient='records')
+
+def load_product_urls(input_config: Dict) -> List[Dict]:
+    """
+    从网页端数据库的 product_urls 表分页读取启用（status='active'）的 URL，省去导出 Excel 的步骤
+
+    参数：
+        input_config (dict): 数据库输入源配置，包含 path / sources / stale_hours / page_size
+
+    返回：
+        list[dict]: 形如 [{'id': '1', 'url': 'https://...', 'url_tag': 'single'}, ...] 的列表（按 URL 记录顺序）
+    """
+    config = dict(DEFAULT_DATABASE_INPUT)
+    config.update(input_config)
+    db_path = config['path']
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"数据库文件未找到：{db_path}")
+
+    conditions = ["pu.status = 'active'", "pu.id > ?"]
+    params = []
+    if config['sources']:
+        conditions.append(f"pu.source_name IN ({', '.join('?' for _ in config['sources'])})")
+        params.extend(config['sources'])
+    if config['stale_hours']:
+        # 只读取网页端该来源的数据早于 stale_hours（或还没有数据）的 URL，实现增量抓取
+        cutoff = (datetime.now() - timedelta(hours=float(config['stale_hours']))).strftime(SOURCE_TIME_FORMAT)
+        conditions.append(
+            "NOT EXISTS (SELECT 1 FROM sources s WHERE s.product_id = pu.product_id "
+            "AND s.source_name = pu.source_name AND s.uploaded_at >= ?)"
+        )
+        params.append(cutoff)
+    query = (
+        f"SELECT pu.id, pu.product_id, pu.url, pu.url_tag FROM product_urls pu "
+        f"WHERE {' AND '.join(conditions)} ORDER BY pu.id LIMIT ?"
+    )
+
+    products = []
+    last_id = 0
+    # 只读方式打开，不影响网页端写入
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    try:
+        while True:
+            rows = conn.execute(query, (last_id, *params, int(config['page_size']))).fetchall()
+            if not rows:
+                break
+            for row_id, product_id, url, url_tag in rows:
+                products.append({'id': str(product_id), 'url': url, 'url_tag': normalize_url_tag(url_tag)})
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+    return products
 
 def load_input_files(config: Dict) -> List[Dict]:
     """
@@ -67,7 +155,10 @@ def load_input_files(config: Dict) -> List[Dict]:
         filepath = file_config['path']
         print(f"[INFO] 正在处理文件：{filepath}")
         try:
-            products = load_single_file(filepath)
+            if file_config.get('type') == 'database':
+                products = load_product_urls(file_config)
+            else:
+                products = load_single_file(filepath)
             print(f"[INFO] 从 {filepath} 加载了 {len(products)} 条数据")
             all_products.extend(products)
         except Exception as e:
@@ -79,3 +170,61 @@ def load_input_files(config: Dict) -> List[Dict]:
 
     print(f"[INFO] 总共加载了 {len(all_products)} 条数据")
     return all_products
+
+def canonicalize_url(url: str) -> str:
+    """
+    生成用于去重的规范 URL：去掉查询参数和片段，协议和域名转小写，去掉路径末尾的斜杠
+
+    参数：
+        url (str): 商品 URL
+
+    返回：
+        str: 规范 URL
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+def build_url_fanout(products: List[Dict], get_site: Callable[[str], str] = None) -> List[Dict]:
+    """
+    按规范 URL 和 URL 标签合并指向同一页面的商品，每个页面只需抓取和解析一次
+
+    参数：
+        products (list[dict]): load_input_files 返回的商品列表
+        get_site (callable): 按 URL 返回站点名称，用于生成带站点的键；None 时键不带站点
+
+    返回：
+        list[dict]: 去重后的列表，保持首次出现的顺序，形如
+                    [{'id': '1', 'url': 'https://...', 'url_tag': 'main', 'key': 'amazon:1', 'ids': ['1', '7', ...],
+                      'keys': ['amazon:1', 'amazon:7', ...]}, ...]，
+                    'id' / 'url' 取自首次出现的行，'ids' 为共享该页面的全部商品 ID（已去重），
+                    'key' 见 get_product_key（抓取日志和失败记录按此区分同一商品的不同 URL），'keys' 为 'ids' 对应的键
+    """
+    unique = []
+    by_url = {}
+    for product in products:
+        url = product['url']
+        url_tag = normalize_url_tag(product.get('url_tag'))
+        site_name = get_site(url) if get_site is not None else None
+        new_entry = {
+            'id': product['id'], 'url': url, 'url_tag': url_tag,
+            'key': get_product_key(product['id'], url_tag, site_name), 'ids': [product['id']],
+        }
+        new_entry['keys'] = [new_entry['key']]
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            # 无效 URL 不参与合并，交由主循环报告
+            unique.append(new_entry)
+            continue
+
+        key = (canonicalize_url(url), url_tag)
+        entry = by_url.get(key)
+        if entry is None:
+            entry = new_entry
+            by_url[key] = entry
+            unique.append(entry)
+        elif product['id'] not in entry['ids']:
+            entry['ids'].append(product['id'])
+            entry['keys'].append(get_product_key(product['id'], url_tag, site_name))
+
+    print(f"[INFO] 合并重复 URL 后共 {len(unique)} 个页面（原 {len(products)} 条数据）")
+    return unique
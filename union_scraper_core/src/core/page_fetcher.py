@@ -1,112 +1,276 @@
 # -*- coding: utf-8 -*-
 # union_scraper/page_fetcher.py
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException
+from concurrent.futures import ThreadPoolExecutor
+import json
 import time
 import os
-import platform
+import re
+from .driver_pool import get_driver_pool
+from .fetch_timing import collect_driver_timing, read_performance_log
+from .html_minifier import maybe_minify_html
+from .fetch_rules import build_block_patterns
+from .crawl_retry import PermanentFetchError, PERMANENT_HTTP_STATUS
 
-def fetch_page(url, save_path=None, filename=None, wait_time=5):
+# 页内提取脚本：按字段选择器收集节点 outerHTML，按关键字收集脚本文本，以一个 JSON 字符串返回
+IN_PAGE_EXTRACT_SCRIPT = """
+var spec = arguments[0] || {};
+var result = {fields: {}, scripts: []};
+var selectors = spec.selectors || {};
+Object.keys(selectors).forEach(function (name) {
+    var nodes = document.querySelectorAll(selectors[name]);
+    result.fields[name] = Array.prototype.map.call(nodes, function (node) { return node.outerHTML; });
+});
+var keywords = spec.script_keywords || [];
+if (keywords.length) {
+    document.querySelectorAll('script').forEach(function (script) {
+        var text = script.textContent || '';
+        for (var i = 0; i < keywords.length; i++) {
+            if (text.indexOf(keywords[i]) !== -1) {
+                result.scripts.push(text);
+                break;
+            }
+        }
+    });
+}
+return JSON.stringify(result);
+"""
+
+# 读取主文档 HTTP 状态码的脚本（Navigation Timing Level 2）
+NAVIGATION_STATUS_SCRIPT = """
+var entry = performance.getEntriesByType('navigation')[0];
+return entry && entry.responseStatus ? entry.responseStatus : null;
+"""
+
+# 脚本文本中会提前结束 <script> 标签的序列
+SCRIPT_END_PATTERN = re.compile(r"</script", re.IGNORECASE)
+
+# 后台保存原始 HTML 的线程（页内提取模式下不阻塞抓取流程）
+_archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="html-archive")
+_archive_futures = []
+
+def get_navigation_status(driver):
+    """
+    读取当前页面主文档的 HTTP 状态码（Navigation Timing 的 responseStatus，Chrome 109+）
+
+    返回：
+        int: 状态码；浏览器不支持或读取失败时返回 None
+    """
+    try:
+        status = driver.execute_script(NAVIGATION_STATUS_SCRIPT)
+    except Exception:
+        return None
+    return status if isinstance(status, int) and status > 0 else None
+
+def apply_request_blocking(driver, fetch_rules):
+    """
+    通过 DevTools 协议设置本次加载需要拦截的请求
+
+    池中的浏览器会被不同站点复用，因此每次加载前都要重新设置（无规则时清空）。
+
+    参数：
+        driver: Chrome 驱动
+        fetch_rules (dict): 抓取规则
+    """
+    patterns = build_block_patterns(fetch_rules)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+def wait_until_ready(driver, fetch_rules, wait_time):
+    """
+    等待页面就绪：任一就绪选择器出现即返回；未配置选择器时退回固定等待
+
+    参数：
+        driver: Chrome 驱动
+        fetch_rules (dict): 抓取规则
+        wait_time (int): 未配置就绪选择器时的固定等待秒数
+
+    返回：
+        bool: 是否在超时前检测到就绪选择器
+    """
+    selectors = (fetch_rules or {}).get('ready_selectors') or []
+    if not selectors:
+        time.sleep(wait_time)
+        return True
+
+    timeout = fetch_rules.get('ready_timeout') or wait_time * 2
+    conditions = [EC.presence_of_element_located((By.CSS_SELECTOR, selector)) for selector in selectors]
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(EC.any_of(*conditions))
+        return True
+    except TimeoutException:
+        return False
+
+def save_html_snapshot(html, save_path=None, filename=None, fetch_rules=None):
+    """
+    将 HTML 保存到 save_path/filename（两者缺一则不保存）
+
+    参数：
+        html (str): 页面 HTML
+        save_path (str): 保存目录
+        filename (str): 文件名
+        fetch_rules (dict): 站点抓取规则，启用 minify 时先精简再保存
+    """
+    if save_path and filename is not None:
+        os.makedirs(save_path, exist_ok=True)
+        html_file = os.path.join(save_path, filename)
+        with open(html_file, "w", encoding="utf-8") as f:
+            f.write(maybe_minify_html(html, fetch_rules))
+
+def save_html_async(html, save_path=None, filename=None, fetch_rules=None):
+    """
+    在后台线程中保存 HTML，调用 flush_html_archive() 等待全部写完
+
+    参数：
+        html (str): 页面 HTML
+        save_path (str): 保存目录
+        filename (str): 文件名
+        fetch_rules (dict): 站点抓取规则，启用 minify 时先精简再保存
+    """
+    if save_path and filename is not None:
+        _archive_futures.append(
+            _archive_executor.submit(save_html_snapshot, html, save_path, filename, fetch_rules)
+        )
+
+def get_archive_html(driver, html, save_path, fetch_rules):
+    """
+    页内提取模式下要存档的 HTML：默认为提取后的精简 HTML；启用 archive_raw_html 时在归还浏览器前读取整页源码
+    （多一次整页传输，精简和写入仍在后台线程进行）
+
+    参数：
+        driver: 当前页面所在的 Chrome 驱动
+        html (str): 提取后的精简 HTML
+        save_path (str): 保存目录，None 时不存档
+        fetch_rules (dict): 站点抓取规则
+
+    返回：
+        str: 要存档的 HTML
+    """
+    if save_path and (fetch_rules or {}).get('archive_raw_html'):
+        return driver.page_source
+    return html
+
+def flush_html_archive():
+    """等待所有后台 HTML 保存任务完成"""
+    while _archive_futures:
+        future = _archive_futures.pop(0)
+        try:
+            future.result()
+        except Exception as e:
+            print(f"[ERROR] Failed to archive HTML: {str(e)}")
+
+def payload_to_html(payload):
+    """
+    将页内提取脚本返回的 JSON 载荷拼装为精简 HTML，供各爬虫的 parse_product_data 直接解析
+
+    参数：
+        payload (str): IN_PAGE_EXTRACT_SCRIPT 返回的 JSON 字符串
+
+    返回：
+        str: 仅包含所需节点的 HTML
+    """
+    data = json.loads(payload) if isinstance(payload, str) else (payload or {})
+    fragments = []
+    for nodes in data.get('fields', {}).values():
+        fragments.extend(nodes)
+    for text in data.get('scripts', []):
+        # 脚本文本中的 </script> 会提前结束标签，转义为 <\/script（在 JS 中含义不变）
+        escaped = SCRIPT_END_PATTERN.sub(r"<\\/script", text)
+        fragments.append(f"<script>{escaped}</script>")
+    return "<html><body>\n" + "\n".join(fragments) + "\n</body></html>"
+
+def fetch_page(url, save_path=None, filename=None, wait_time=5, fetch_rules=None, extract_spec=None, site_name=None,
+               timing=None):
     """
-    使用 Selenium 加载商品页面，返回完整 HTML，可选保存到本地。
+    从驱动池租借一个 Chrome 加载商品页面，返回完整 HTML，可选保存到本地。
 
     参数：
         url (str): 商品页面 URL
         save_path (str): 保存 HTML 的目录（可选）
         filename (str): HTML 文件名（如 f_1.html）
-        wait_time (int): 页面加载等待秒数
+        wait_time (int): 未配置就绪选择器时的页面等待秒数
+        fetch_rules (dict): 站点抓取规则（拦截的资源类型/URL 模式、就绪选择器），见 fetch_rules.get_fetch_rules
+        extract_spec (dict): 页内提取规格 {"selectors": {字段: CSS选择器}, "script_keywords": [...]}；
+                             提供时不再传输整页源码，只返回拼装后的精简 HTML，存档的也是精简 HTML（在后台保存）；
+                             fetch_rules.archive_raw_html 为 true 时另取整页源码存档
+        site_name (str): 站点名称，启用持久化浏览器目录时用于选择该站点的驱动池
+        timing (dict): 传入时写入本次抓取的计时（wall_ms / wait_ms / Navigation Timing）及请求计数
 
     返回：
         str: 页面 HTML 字符串
-    """
-    # 配置Chrome选项
-    options = Options()
-    
-    # 基本配置
-    options.add_argument("--headless=new")  # 使用新版无头模式
-    options.add_argument("--no-sandbox")  # 禁用沙箱
-    options.add_argument("--disable-dev-shm-usage")  # 禁用/dev/shm使用
-    
-    # 禁用不必要的功能
-    options.add_argument("--disable-extensions")  # 禁用扩展
-    options.add_argument("--disable-notifications")  # 禁用通知
-    options.add_argument("--disable-popup-blocking")  # 禁用弹窗阻止
-    
-    # GPU相关（保持基本渲染功能）
-    options.add_argument("--disable-gpu")  # 禁用GPU加速
-    
-    # 内存相关
-    options.add_argument("--disable-dev-shm-usage")  # 禁用共享内存
-    options.add_argument("--disable-features=IsolateOrigins,site-per-process")  # 禁用站点隔离
-    
-    # 安全相关
-    options.add_argument("--ignore-certificate-errors")  # 忽略证书错误
-    options.add_argument("--allow-insecure-localhost")  # 允许不安全的本地连接
-    
-    # 窗口设置
-    options.add_argument("--window-size=1280,800")
-    options.add_argument("--force-device-scale-factor=1")
-    
-    # 用户代理
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36")
-
-    # 实验性选项
-    options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
-    options.add_experimental_option("useAutomationExtension", False)
 
+    异常：
+        PermanentFetchError: 主文档返回 404 / 410
+    """
     try:
-        # 创建Chrome服务
-        service = ChromeService(ChromeDriverManager().install())
-        
-        # Windows特定配置
-        if platform.system() == "Windows":
-            # 在Windows上禁用日志
-            service.creation_flags = 0x08000000  # CREATE_NO_WINDOW
-        
-        # 创建Chrome实例
-        driver = webdriver.Chrome(service=service, options=options)
-        
-        try:
-            # 设置页面加载超时
-            driver.set_page_load_timeout(wait_time * 2)
-            
-            # 加载页面
-            driver.get(url)
-            
-            # 等待页面渲染
-            time.sleep(wait_time)
-
-            # 获取页面源码
-            html = driver.page_source
-
-            # 保存HTML（如果需要）
-            if save_path and filename is not None:
-                os.makedirs(save_path, exist_ok=True)
-                html_file = os.path.join(save_path, filename)
-                with open(html_file, "w", encoding="utf-8") as f:
-                    f.write(html)
-
-            return html
-
-        except TimeoutException as e:
-            print(f"[ERROR] Timeout when loading: {url}")
-            return None
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch page {url}: {str(e)}")
-            return None
-        finally:
+        with get_driver_pool(site_name).lease() as driver:
             try:
-                if driver:
-                    driver.quit()
+                # 设置页面加载超时
+                driver.set_page_load_timeout(wait_time * 2)
+
+                # 拦截解析用不到的资源
+                apply_request_blocking(driver, fetch_rules)
+
+                # 丢弃上一个页面残留的 performance 日志
+                if timing is not None:
+                    read_performance_log(driver)
+                started = time.time()
+
+                # 加载页面（eager 策略：DOMContentLoaded 后即返回）
+                driver.get(url)
+
+                # 页面不存在时不再等待就绪选择器，交由调用方记为永久失败
+                status = get_navigation_status(driver)
+                if status in PERMANENT_HTTP_STATUS:
+                    raise PermanentFetchError(f"HTTP {status}", status)
+
+                # 等待页面就绪
+                wait_started = time.time()
+                ready = wait_until_ready(driver, fetch_rules, wait_time)
+                if not ready:
+                    print(f"[WARNING] Ready selectors not found before timeout: {url}")
+
+                if timing is not None:
+                    timing['wait_ms'] = round((time.time() - wait_started) * 1000, 1)
+                    timing['ready'] = ready
+                    timing.update(collect_driver_timing(driver))
+
+                if extract_spec:
+                    # 在页面内提取所需节点，一次性返回 JSON 载荷
+                    html = payload_to_html(driver.execute_script(IN_PAGE_EXTRACT_SCRIPT, extract_spec))
+
+                    # 默认只存档提取结果（解析所需的全部节点），启用 archive_raw_html 时存档整页源码
+                    save_html_async(get_archive_html(driver, html, save_path, fetch_rules), save_path, filename,
+                                    fetch_rules)
+                    if timing is not None:
+                        timing['wall_ms'] = round((time.time() - started) * 1000, 1)
+                    return html
+
+                # 获取页面源码
+                html = driver.page_source
+                if timing is not None:
+                    timing['wall_ms'] = round((time.time() - started) * 1000, 1)
+
+            except TimeoutException as e:
+                print(f"[ERROR] Timeout when loading: {url}")
+                return None
+            except PermanentFetchError:
+                raise
             except Exception as e:
-                print(f"[WARNING] Error while closing Chrome driver: {str(e)}")
-                # 不抛出异常，让程序继续运行
-                
+                print(f"[ERROR] Failed to fetch page {url}: {str(e)}")
+                return None
+
+    except PermanentFetchError:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to initialize Chrome: {str(e)}")
         return None
+
+    # 保存HTML（如果需要）
+    save_html_snapshot(html, save_path, filename, fetch_rules)
+
+    return html
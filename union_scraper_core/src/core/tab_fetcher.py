@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# union_scraper/tab_fetcher.py
+
+import time
+from .crawl_retry import PermanentFetchError, PERMANENT_HTTP_STATUS
+from .driver_pool import get_driver_pool
+from .fetch_timing import (
+    collect_driver_timing,
+    count_performance_log,
+    handle_to_target,
+    new_network_counts,
+    read_performance_log,
+)
+from .page_fetcher import (
+    IN_PAGE_EXTRACT_SCRIPT,
+    apply_request_blocking,
+    get_archive_html,
+    get_navigation_status,
+    payload_to_html,
+    save_html_async,
+    save_html_snapshot,
+)
+
+# 导航前在旧文档上打标记，新文档加载后标记消失，用来区分“旧页面”与“新页面”
+NAVIGATE_SCRIPT = "window.__tabStale = true; window.location.href = arguments[0];"
+
+# 就绪检查：返回 stale / loading / loaded / ready
+READY_STATE_SCRIPT = """
+var selectors = arguments[0] || [];
+if (window.__tabStale) { return 'stale'; }
+if (document.readyState === 'loading') { return 'loading'; }
+for (var i = 0; i < selectors.length; i++) {
+    if (document.querySelector(selectors[i])) { return 'ready'; }
+}
+return 'loaded';
+"""
+
+
+class _TabJob:
+    """单个标签页中正在进行的抓取任务"""
+
+    def __init__(self, index: int, job: dict):
+        self.index = index
+        self.job = job
+        self.started = time.time()
+        self.status_checked = False
+
+
+def _collect_html(driver, tab_job: _TabJob, network: dict = None) -> str:
+    """读取当前标签页的 HTML（或页内提取结果），并按需保存；任务带 timing 时同时写入计时"""
+    job = tab_job.job
+    timing = job.get('timing')
+    if timing is not None:
+        counts = (network or {}).get(handle_to_target(driver.current_window_handle))
+        timing.update(collect_driver_timing(driver, counts))
+        timing['wall_ms'] = round((time.time() - tab_job.started) * 1000, 1)
+
+    save_path = job.get('save_path')
+    filename = job.get('filename')
+    extract_spec = job.get('extract_spec')
+
+    if extract_spec:
+        html = payload_to_html(driver.execute_script(IN_PAGE_EXTRACT_SCRIPT, extract_spec))
+        # 默认只存档提取结果，启用 archive_raw_html 时存档整页源码
+        save_html_async(get_archive_html(driver, html, save_path, job.get('fetch_rules')), save_path, filename,
+                        job.get('fetch_rules'))
+        return html
+
+    html = driver.page_source
+    save_html_snapshot(html, save_path, filename, job.get('fetch_rules'))
+    return html
+
+
+def fetch_pages_in_tabs(jobs: list, max_tabs: int = 4, wait_time: int = 5, poll_interval: float = 0.2,
+                        site_name: str = None) -> list:
+    """
+    在同一个 Chrome 进程的多个标签页中并发加载页面
+
+    各标签页的导航同时进行，主循环轮询每个标签页的就绪状态，就绪后立即取回 HTML 并分配下一个 URL。
+
+    参数：
+        jobs (list[dict]): 抓取任务，每项包含 url / fetch_rules / save_path / filename / extract_spec，
+                           可选的 timing 字典用于写入该页面的计时
+        max_tabs (int): 同时打开的标签页数量
+        wait_time (int): 未配置就绪选择器时的页面等待秒数
+        poll_interval (float): 每轮轮询之间的间隔秒数
+        site_name (str): 站点名称，启用持久化浏览器目录时用于选择该站点的驱动池
+
+    返回：
+        list: 与 jobs 顺序一致的 HTML 列表，失败项为 None，页面不存在的项为 PermanentFetchError
+    """
+    results = [None] * len(jobs)
+    if not jobs:
+        return results
+
+    pending = list(enumerate(jobs))
+    max_tabs = max(1, min(int(max_tabs), len(jobs)))
+
+    # 记录计时时按标签页（target id）累计 performance 日志中的请求计数
+    track_network = any(job.get('timing') is not None for job in jobs)
+    network = {}
+
+    try:
+        with get_driver_pool(site_name).lease(pages=len(jobs)) as driver:
+            main_handle = driver.current_window_handle
+            handles = [main_handle]
+            for _ in range(max_tabs - 1):
+                driver.switch_to.new_window('tab')
+                handles.append(driver.current_window_handle)
+
+            active = {}
+            try:
+                while pending or active:
+                    # 为空闲标签页分配新任务（只发起导航，不等待加载）
+                    for handle in handles:
+                        if handle in active or not pending:
+                            continue
+                        index, job = pending.pop(0)
+                        try:
+                            driver.switch_to.window(handle)
+                            apply_request_blocking(driver, job.get('fetch_rules'))
+                            if track_network:
+                                count_performance_log(read_performance_log(driver), network)
+                                network[handle_to_target(handle)] = new_network_counts()
+                            driver.execute_script(NAVIGATE_SCRIPT, job['url'])
+                            active[handle] = _TabJob(index, job)
+                        except Exception as e:
+                            print(f"[ERROR] Failed to start tab navigation {job['url']}: {str(e)}")
+
+                    # 轮询各标签页的就绪状态
+                    if track_network and active:
+                        count_performance_log(read_performance_log(driver), network)
+                    for handle in list(active):
+                        tab_job = active[handle]
+                        rules = tab_job.job.get('fetch_rules') or {}
+                        selectors = rules.get('ready_selectors') or []
+                        timeout = rules.get('ready_timeout') or wait_time * 2
+                        elapsed = time.time() - tab_job.started
+                        timing = tab_job.job.get('timing')
+                        try:
+                            driver.switch_to.window(handle)
+                            state = driver.execute_script(READY_STATE_SCRIPT, selectors)
+                            if state in ('loaded', 'ready') and not tab_job.status_checked:
+                                # 新文档可用后检查一次主文档状态码，页面不存在时不再等待就绪选择器
+                                tab_job.status_checked = True
+                                status = get_navigation_status(driver)
+                                if status in PERMANENT_HTTP_STATUS:
+                                    print(f"[WARNING] Page not found in tab: {tab_job.job['url']}")
+                                    results[tab_job.index] = PermanentFetchError(f"HTTP {status}", status)
+                                    del active[handle]
+                                    continue
+                            done = (
+                                state == 'ready'
+                                or (state == 'loaded' and not selectors and elapsed >= wait_time)
+                                or elapsed >= timeout
+                            )
+                            if not done:
+                                continue
+                            if state == 'stale' or state == 'loading':
+                                print(f"[ERROR] Timeout when loading in tab: {tab_job.job['url']}")
+                            else:
+                                if selectors and state != 'ready':
+                                    print(f"[WARNING] Ready selectors not found before timeout: {tab_job.job['url']}")
+                                if timing is not None:
+                                    timing['ready'] = state == 'ready' or not selectors
+                                results[tab_job.index] = _collect_html(driver, tab_job, network)
+                        except Exception as e:
+                            print(f"[ERROR] Failed to fetch page in tab {tab_job.job['url']}: {str(e)}")
+                        del active[handle]
+
+                    if active:
+                        time.sleep(poll_interval)
+            finally:
+                # 关闭额外的标签页，只保留主标签页供下次租借
+                for handle in handles[1:]:
+                    try:
+                        driver.switch_to.window(handle)
+                        driver.close()
+                    except Exception:
+                        pass
+                try:
+                    driver.switch_to.window(main_handle)
+                except Exception:
+                    pass
+
+    except Exception as e:
+        print(f"[ERROR] Failed to initialize Chrome: {str(e)}")
+
+    return results
@@ -1,6 +1,11 @@
 """
 File naming model for managing file names across the application
 """
+import re
+from typing import Optional
+
+# 图片文件名末尾的序号（get_image_filename 生成的 "_<index>.jpg"）
+IMAGE_INDEX_PATTERN = re.compile(r"_(\d+)\.[A-Za-z0-9]+$")
 
 class FileManager:
     """文件名管理器，负责生成不同类型文件的标准文件名"""
@@ -38,6 +43,21 @@ class FileManager:
         suffix = self._get_filename_suffix()
         return f"{self.prefix}_{self.product_id}{suffix}_{index}.jpg"
     
+    @staticmethod
+    def parse_image_index(filename: str) -> Optional[int]:
+        """
+        从图片文件名中读取序号（get_image_filename 的逆操作）
+        :param filename: 图片文件名或路径
+        :return: 从 1 开始的序号，无法识别时返回 None
+        """
+        match = IMAGE_INDEX_PATTERN.search(filename)
+        return int(match.group(1)) if match else None
+    
+    def get_image_manifest_filename(self) -> str:
+        """生成图片清单文件名（延迟下载模式下记录图片文件名与 URL 的对应关系）"""
+        suffix = self._get_filename_suffix()
+        return f"{self.prefix}_{self.product_id}{suffix}.images.json"
+    
     def get_product_folder(self) -> str:
         """
         生成商品文件夹名，直接使用商品ID作为文件夹名
@@ -19,6 +19,7 @@ class ProductData:
     price_current: str = ""  # 当前价格    
     image_urls_original: List[str] = field(default_factory=list)  # 原始图片URL
     image_urls_simplified: List[str] = field(default_factory=list)  # 简化后的图片URL
+    image_probes: List[dict] = field(default_factory=list)  # 图片探测结果（格式、尺寸、是否跳过）
     infos: dict = field(default_factory=dict)  # 其他信息
     
     def to_dict(self) -> dict:
@@ -34,6 +35,7 @@ class ProductData:
             "price_original": self.price_original,
             "image_urls_original": self.image_urls_original,
             "image_urls_simplified": self.image_urls_simplified,
+            "image_probes": self.image_probes,
             "infos": self.infos
         }
     
@@ -54,5 +56,6 @@ class ProductData:
             price_current="",
             image_urls_original=[],
             image_urls_simplified=[],
+            image_probes=[],
             infos={}
         ) 
\ No newline at end of file
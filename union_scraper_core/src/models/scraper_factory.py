@@ -4,6 +4,7 @@ Factory model for creating scrapers
 
 from typing import Dict, Type
 from .site_type import SiteType
+from ..core.crawl_retry import UnsupportedSiteError
 from ..scrapers.base import BaseScraper
 from ..scrapers.amazon import AmazonScraper
 from ..scrapers.fairprice import FairpriceScraper
@@ -20,7 +21,7 @@ class ScraperFactory:
     }
     
     @classmethod
-    def create_scraper(cls, url: str, product_id: str, config: dict) -> BaseScraper:
+    def create_scraper(cls, url: str, product_id: str, config: dict, url_tag: str = "main") -> BaseScraper:
         """
         根据URL创建对应的爬虫实例
         
@@ -28,6 +29,7 @@ class ScraperFactory:
             url: str - 商品URL
             product_id: str - 商品ID
             config: dict - 配置字典
+            url_tag: str - URL标签（single/package/subpack 等），决定输出文件名后缀
             
         返回：
             BaseScraper - 爬虫实例
@@ -35,9 +37,9 @@ class ScraperFactory:
         site_type = SiteType.from_url(url, config)
         
         if site_type.site_name not in cls._scrapers:
-            raise ValueError(f"No scraper implemented for site: {site_type.site_name}")
+            raise UnsupportedSiteError(f"No scraper implemented for site: {site_type.site_name}")
             
         scraper_class = cls._scrapers[site_type.site_name]
         scraper = scraper_class(site_type.site_name, config)  # type: ignore
-        scraper.set_current_product_info(product_id, url)
+        scraper.set_current_product_info(product_id, url, url_tag)
         return scraper 
\ No newline at end of file
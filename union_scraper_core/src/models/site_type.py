@@ -3,6 +3,7 @@ Site type model
 """
 
 from typing import Dict
+from ..core.crawl_retry import UnsupportedSiteError
 
 class SiteType:
     """网站类型类，从配置文件动态生成支持的网站类型"""
@@ -29,4 +30,4 @@ class SiteType:
         for site_name, site_type in cls._types.items():
             if site_name in url:
                 return site_type
-        raise ValueError(f"Unsupported site type for url: {url}") 
\ No newline at end of file
+        raise UnsupportedSiteError(f"Unsupported site type for url: {url}") 
\ No newline at end of file
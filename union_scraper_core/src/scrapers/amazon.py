@@ -8,6 +8,26 @@ from .base import BaseScraper
 from ..models.product_data import ProductData
 
 class AmazonScraper(BaseScraper):
+    # 页内提取：解析所需的各区块及包含 colorImages 的脚本
+    IN_PAGE_EXTRACT = {
+        "selectors": {
+            "title": "#productTitle",
+            "brand": "#bylineInfo",
+            "price": "#corePriceDisplay_desktop_feature_div",
+            "image_block": "#imageBlock",
+            "meta_info": "#productOverview_feature_div",
+            "about_this_item": "#feature-bullets",
+            "product_description": "#productDescription_feature_div",
+            "technical_details": "#productDetails_techSpec_section_1",
+            "additional_information": "#productDetails_detailBullets_sections1",
+            "product_details": "#detailBullets_feature_div",
+            "important_information": "#important-information",
+        },
+        "script_keywords": ["colorImages"],
+    }
+    # 可以按尺寸改写的图片 URL（已去掉尺寸后缀）：(不含扩展名的部分, 扩展名)
+    MEDIA_URL_PATTERN = re.compile(r'^(https?://[^/]*(?:media-amazon|images-amazon)\.com/images/I/[^/.]+)(\.[A-Za-z]+)$')
+
     def __init__(self, site_name: str, config: dict):
         super().__init__(site_name, config)
 
@@ -62,6 +82,19 @@ class AmazonScraper(BaseScraper):
             url
         )
 
+    def rewrite_image_url(self, url: str, target_px: int) -> Optional[str]:
+        """
+        在简化后的图片 URL 中加入 ._SL<n>_ 尺寸标记，由 CDN 返回最长边为 n 像素的版本
+
+        示例：
+            输入: https://m.media-amazon.com/images/I/71abc.jpg, 800
+            输出: https://m.media-amazon.com/images/I/71abc._SL800_.jpg
+        """
+        match = self.MEDIA_URL_PATTERN.match(url or "")
+        if not match or target_px <= 0:
+            return None
+        return f"{match.group(1)}._SL{target_px}_{match.group(2)}"
+
     def _extract_color_images_script(self, content: str) -> List[Dict]:
         """从脚本中安全提取 'colorImages': {'initial': [ {...}, {...} ] } 数组内容"""
         start_marker = "'colorImages': { 'initial': "
@@ -1,16 +1,39 @@
 from abc import ABC, abstractmethod
 import os
+from dataclasses import replace
 from typing import List, Dict, Optional
 from ..models.site_type import SiteType
 from ..models.file_manager import FileManager
 from ..utils.file_utils import save_file, write_json
-from ..core.page_fetcher import fetch_page
-from ..core.image_downloader import download_images
+from ..core.fetch_engine import get_fetch_engine
+from ..core.fetch_rules import get_fetch_rules
+from ..core.crawl_retry import UnsupportedSiteError
+from ..core.image_downloader import download_images, download_images_async, probe_images
+from ..core.image_store import link_or_copy
+from ..core.image_derivatives import derived_paths
 from loguru import logger
 from ..models.product_data import ProductData
 import re
 
+# 未配置 sites[].image_variant 时不改写图片 URL
+DEFAULT_IMAGE_VARIANT = {
+    "enabled": False,
+    "target_px": 800,  # 与网页端 ImageProcessor 的输出尺寸一致
+}
+
+# 未配置 crawler.image_probe 时不探测图片
+DEFAULT_IMAGE_PROBE = {
+    "enabled": False,
+    "min_width": 100,      # 宽度小于该值的图片不下载
+    "min_height": 100,     # 高度小于该值的图片不下载
+    "probe_bytes": 16384,  # 每张图片最多读取的字节数
+}
+
 class BaseScraper(ABC):
+    # 页内提取规格：{"selectors": {字段: CSS选择器}, "script_keywords": [脚本关键字]}
+    # 站点开启 fetch.in_page_extract 时，浏览器只返回这些节点拼成的精简 HTML
+    IN_PAGE_EXTRACT: Optional[Dict] = None
+
     def __init__(self, site_name: str, config: dict):
         """
         初始化爬虫
@@ -22,7 +45,7 @@ class BaseScraper(ABC):
         # 从配置中获取站点配置
         site_config = next((site for site in config['sites'] if site['name'] == site_name), None)
         if site_config is None:
-            raise ValueError(f"Site configuration not found for: {site_name}")
+            raise UnsupportedSiteError(f"Site configuration not found for: {site_name}")
             
         # 处理 base_url
         base_url = site_config['base_url'].replace('https://', '').replace('http://', '')
@@ -35,6 +58,9 @@ class BaseScraper(ABC):
         self.output_config = config['output']
         self.debug_config = config.get('debug', {})
         self.crawler_config = config.get('crawler', {})
+        self.fetch_rules = get_fetch_rules(site_config)
+        self.image_variant = dict(DEFAULT_IMAGE_VARIANT)
+        self.image_variant.update(site_config.get('image_variant', {}))
         
         
         # 初始化当前处理的商品信息
@@ -128,9 +154,41 @@ class BaseScraper(ABC):
         """
         self._check_if_initialized()
         
-        # 生成HTML文件名
-        filename = self.file_manager.get_html_filename(self._current_product_id)
-        return fetch_page(self._current_url, save_path=self.output_config['html_dir'], filename=filename)
+        # 生成HTML文件名（由抓取引擎按站点规则选择 HTTP 或浏览器获取）
+        filename = self.file_manager.get_html_filename()
+        save_path = self.output_config['html_dir'] if self.output_config.get('archive_html', True) else None
+        extract_spec = self.IN_PAGE_EXTRACT if self.fetch_rules.get('in_page_extract') else None
+        return get_fetch_engine().fetch(
+            self._current_url,
+            self.fetch_rules,
+            save_path=save_path,
+            filename=filename,
+            site_name=self.site_config['name'],
+            extract_spec=extract_spec,
+            product_id=self._current_product_id
+        )
+
+    def get_fetch_job(self) -> Optional[Dict]:
+        """
+        生成供多标签页批量抓取使用的任务描述
+
+        返回：
+            dict: 抓取任务；站点不使用浏览器引擎时返回 None（仍走 fetch_page）
+        """
+        self._check_if_initialized()
+
+        if self.fetch_rules.get('engine', 'browser') != 'browser':
+            return None
+
+        return {
+            "url": self._current_url,
+            "product_id": self._current_product_id,
+            "site_name": self.site_config['name'],
+            "fetch_rules": self.fetch_rules,
+            "save_path": self.output_config['html_dir'] if self.output_config.get('archive_html', True) else None,
+            "filename": self.file_manager.get_html_filename(),
+            "extract_spec": self.IN_PAGE_EXTRACT if self.fetch_rules.get('in_page_extract') else None
+        }
 
     def parse_data(self, html: str) -> dict:
         """
@@ -167,7 +225,32 @@ class BaseScraper(ABC):
             logger.error(str(e))
             self._current_data = ProductData.create_empty(self._current_product_id, self._current_url)
         
-                    
+        # 同一商品的不同 URL（single / package / subpack）在数据中保留各自的标签
+        self._current_data.url_tag = self._current_url_tag
+        return self._current_data.to_dict()
+
+    def get_parsed_data(self) -> Optional[ProductData]:
+        """
+        获取 parse_data 的解析结果
+
+        返回：
+            Optional[ProductData]: 解析后的数据对象，尚未解析时返回 None
+        """
+        return self._current_data
+
+    def set_parsed_data(self, data: ProductData) -> dict:
+        """
+        采用在解析进程中得到的结果（解析进程按商品信息重建爬虫，只把 ProductData 传回）
+
+        参数：
+            data (ProductData): 解析后的数据对象
+
+        返回：
+            dict: 解析后的数据
+        """
+        self._check_if_initialized()
+
+        self._current_data = data
         return self._current_data.to_dict()
 
     @abstractmethod
@@ -185,6 +268,88 @@ class BaseScraper(ABC):
         """
         raise NotImplementedError("Subclasses must implement parse_product_data()")
 
+    def probe_images(self) -> dict:
+        """
+        按 crawler.image_probe 配置在下载前探测图片（只读取开头几 KB 获取格式和尺寸），
+        尺寸低于下限的占位图、雪碧图和小缩略图标记为跳过，不再下载；结果记录在 image_probes 中
+
+        返回：
+            dict: 加入探测结果后的数据
+        """
+        self._check_if_initialized()
+
+        probe_config = dict(DEFAULT_IMAGE_PROBE)
+        probe_config.update(self.crawler_config.get('image_probe', {}))
+        if not probe_config['enabled'] or not self._current_data or not self._current_data.image_urls_simplified:
+            return self._current_data.to_dict() if self._current_data else {}
+
+        # 探测实际下载的版本（启用 image_variant 时为按尺寸改写的 URL），结果仍按原图 URL 记录
+        image_urls = self._current_data.image_urls_simplified
+        probe_urls = [self.get_variant_url(url) or url for url in image_urls]
+        probes = probe_images(probe_urls, probe_config['probe_bytes'])
+        for url, probe in zip(image_urls, probes):
+            if probe['url'] != url:
+                probe['probe_url'] = probe['url']
+                probe['url'] = url
+            # 尺寸未知（探测失败或头部不含尺寸）时照常下载
+            probe['skipped'] = (
+                (probe['width'] is not None and probe['width'] < probe_config['min_width'])
+                or (probe['height'] is not None and probe['height'] < probe_config['min_height'])
+            )
+        skipped = sum(probe['skipped'] for probe in probes)
+        if skipped:
+            logger.info(f"Skipping {skipped}/{len(probes)} images below "
+                        f"{probe_config['min_width']}x{probe_config['min_height']} for ID={self._current_product_id}")
+        self._current_data.image_probes = probes
+        return self._current_data.to_dict()
+
+    def rewrite_image_url(self, url: str, target_px: int) -> Optional[str]:
+        """
+        将图片 URL 改写为 CDN 上略大于目标尺寸的版本（子类按站点的 URL 规则实现）
+
+        参数：
+            url (str): 简化后的原图 URL
+            target_px (int): 目标尺寸（最长边像素）
+
+        返回：
+            Optional[str]: 改写后的 URL；站点不支持或无法改写时返回 None
+        """
+        return None
+
+    def get_variant_url(self, url: str) -> Optional[str]:
+        """
+        按 image_variant 配置改写图片 URL
+
+        返回：
+            Optional[str]: 改写后的 URL；未启用、无法改写或与原图相同时返回 None
+        """
+        if not self.image_variant['enabled']:
+            return None
+        variant = self.rewrite_image_url(url, int(self.image_variant['target_px']))
+        return variant if variant and variant != url else None
+
+    def get_image_download_urls(self) -> List:
+        """
+        生成图片下载列表：启用 image_variant 时每项为 [按尺寸改写的 URL, 原图 URL]，
+        下载器先请求改写后的 URL，失败时退回原图；未启用或无法改写时为原图 URL。
+        探测时标记为跳过的图片不在列表中
+
+        返回：
+            List: 按 image_urls_simplified 顺序排列的下载项
+        """
+        image_urls = self._current_data.image_urls_simplified if self._current_data else []
+        if self._current_data and self._current_data.image_probes:
+            skipped = {probe['url'] for probe in self._current_data.image_probes if probe.get('skipped')}
+            image_urls = [url for url in image_urls if url not in skipped]
+        if not self.image_variant['enabled']:
+            return list(image_urls)
+
+        download_urls = []
+        for url in image_urls:
+            variant = self.get_variant_url(url)
+            download_urls.append([variant, url] if variant else url)
+        return download_urls
+
     def download_images(self) -> List[str]:
         """
         下载商品图片
@@ -197,20 +362,146 @@ class BaseScraper(ABC):
         if not self._current_data:
             return []
 
-        image_urls = self._current_data.image_urls_simplified
+        image_urls = self.get_image_download_urls()
         if not image_urls:
             return []
             
         folder_path = os.path.join(self.output_config['image_dir'], str(self._current_product_id))
         # 使用file_manager的方法生成文件名模式
         filename_pattern = lambda idx: self.file_manager.get_image_filename(idx)
-        # 使用简化后的URL进行下载
+        # 使用简化后的URL（或按尺寸改写的版本）进行下载
         return download_images(
             image_urls,
             folder_path,
             filename_pattern
         )
 
+    def download_images_async(self, limit: Optional[int] = None):
+        """
+        提交商品图片下载任务，不等待完成（多个商品的图片一起并发下载）
+
+        参数：
+            limit (Optional[int]): 只下载前 limit 张图片（延迟下载模式的预取），None 表示全部
+
+        返回：
+            concurrent.futures.Future: 结果为下载的图片文件路径列表；没有图片时返回 None
+        """
+        self._check_if_initialized()
+
+        image_urls = self.get_image_download_urls()
+        if limit is not None:
+            image_urls = image_urls[:limit]
+        if not image_urls:
+            return None
+
+        folder_path = os.path.join(self.output_config['image_dir'], str(self._current_product_id))
+        return download_images_async(
+            image_urls,
+            folder_path,
+            lambda idx: self.file_manager.get_image_filename(idx)
+        )
+
+    def write_image_manifest(self) -> Optional[str]:
+        """
+        延迟下载模式：只记录图片文件名与下载 URL 的对应关系，不下载图片。
+        清单与商品 JSON 保存在同一目录，网页端首次请求某张图片时按清单下载到相同的位置
+
+        返回：
+            Optional[str]: 清单文件路径；没有图片时返回 None
+        """
+        self._check_if_initialized()
+
+        image_urls = self.get_image_download_urls()
+        if not image_urls:
+            return None
+
+        manifest = {
+            "id": self._current_product_id,
+            "images": [
+                {
+                    "file": self.file_manager.get_image_filename(idx),
+                    "urls": list(url) if isinstance(url, list) else [url],
+                }
+                for idx, url in enumerate(image_urls, start=1)
+            ],
+        }
+        folder_path = os.path.join(self.output_config['image_dir'], str(self._current_product_id))
+        manifest_path = os.path.join(folder_path, self.file_manager.get_image_manifest_filename())
+        write_json(manifest_path, manifest)
+        return manifest_path
+
+    def get_local_image_paths(self, image_paths: Optional[List[str]] = None) -> List[str]:
+        """
+        图片相对于图片目录的路径（与 tool_merge_json 生成的 local_images 格式一致）
+
+        参数：
+            image_paths (Optional[List[str]]): 实际保存的图片路径（可以是共享页面的其他商品 ID 的下载结果），
+                                               按文件名中的序号换算为当前商品的文件名；
+                                               None 时按计划的文件名生成（延迟下载模式，图片等待网页端按需下载）
+
+        返回：
+            List[str]: 形如 "123/a_123_1.jpg" 的路径列表
+        """
+        self._check_if_initialized()
+
+        if image_paths is None:
+            indices = range(1, len(self.get_image_download_urls()) + 1)
+        else:
+            indices = [FileManager.parse_image_index(os.path.basename(path)) or position
+                       for position, path in enumerate(image_paths, start=1)]
+        return [f"{self._current_product_id}/{self.file_manager.get_image_filename(idx)}" for idx in indices]
+
+    def adopt_parsed_data(self, source: 'BaseScraper') -> dict:
+        """
+        复用另一个爬虫对同一页面的解析结果（多个商品 ID 指向同一 URL 时只解析一次）
+
+        参数：
+            source (BaseScraper): 已完成解析的爬虫
+
+        返回：
+            dict: 替换为当前商品 ID 后的数据
+        """
+        self._check_if_initialized()
+
+        if source._current_data is None:
+            self._current_data = ProductData.create_empty(self._current_product_id, self._current_url)
+            self._current_data.url_tag = self._current_url_tag
+        else:
+            self._current_data = replace(source._current_data, id=self._current_product_id, url=self._current_url,
+                                         url_tag=self._current_url_tag)
+        return self._current_data.to_dict()
+
+    def copy_images(self, image_paths: List[str]) -> List[str]:
+        """
+        将已下载的图片链接（不支持硬链接时复制）到当前商品的目录，并按当前商品重新命名。
+        保留源文件名中的序号：部分图片下载失败时，复制后的编号仍与图片清单和 local_images 一致。
+        源图片已生成的衍生图（derived/ 下的标准化图、预览图和缩略图）一并链接，不重复解码
+
+        参数：
+            image_paths (List[str]): 已下载的图片路径（按下载顺序）
+
+        返回：
+            List[str]: 复制后的图片文件路径列表
+        """
+        self._check_if_initialized()
+
+        folder_path = os.path.join(self.output_config['image_dir'], str(self._current_product_id))
+        os.makedirs(folder_path, exist_ok=True)
+        copied = []
+        for position, path in enumerate(image_paths, start=1):
+            idx = FileManager.parse_image_index(os.path.basename(path)) or position
+            target = os.path.join(folder_path, self.file_manager.get_image_filename(idx))
+            try:
+                link_or_copy(path, target)
+                copied.append(target)
+                target_derived = derived_paths(target)
+                for kind, derived_path in derived_paths(path).items():
+                    if os.path.exists(derived_path):
+                        link_or_copy(derived_path, target_derived[kind])
+            except OSError as e:
+                logger.warning(f"Failed to copy image {path}: {e}")
+        return copied
+
     def save_html(self, html: str, output_dir: str):
         """保存HTML文件"""
         self._check_if_initialized()
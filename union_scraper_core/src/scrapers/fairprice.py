@@ -9,6 +9,19 @@ from .base import BaseScraper
 from ..models.product_data import ProductData
 
 class FairpriceScraper(BaseScraper):
+    # 页内提取：JSON-LD、tagWrapper 所在容器（_parse_meta 依赖其兄弟节点）、详情与图片区域
+    IN_PAGE_EXTRACT = {
+        "selectors": {
+            "json_ld": 'script[type="application/ld+json"][data-next-head]',
+            "og_title": 'meta[property="og:title"]',
+            "title": "h1.product-name",
+            "meta": "div:has(> .tagWrapper)",
+            "description": 'div[data-testid="productDescription"]',
+            "images": "div.product-image-container, div.thumbnail-container",
+        },
+        "script_keywords": [],
+    }
+
     def __init__(self, site_name: str, config: dict):
         super().__init__(site_name, config)
 
@@ -7,6 +7,9 @@ from ..models.product_data import ProductData
 from loguru import logger
 
 class ShopeeScraper(BaseScraper):
+    # 页面 srcset 中出现的 CDN 缩放宽度（1x / 2x）
+    RESIZE_WIDTHS = [450, 900]
+
     def __init__(self, site_name: str, config: dict):
         super().__init__(site_name, config)
 
@@ -14,6 +17,10 @@ class ShopeeScraper(BaseScraper):
         logger.warning(f"fetch_page is banned by shopee, use local html instead")
         return self.get_local_html()
 
+    def get_fetch_job(self) -> Optional[Dict]:
+        # Shopee 禁止在线抓取，不参与多标签页批量抓取
+        return None
+
 
     def parse_product_data(self, html: str, product_id: str, url: str) -> ProductData:
         """解析 Shopee 页面数据"""
@@ -234,6 +241,22 @@ class ShopeeScraper(BaseScraper):
 
 
 
+    def rewrite_image_url(self, url: str, target_px: int) -> Optional[str]:
+        """
+        为简化后的图片 URL 加上 @resize_w<n>_nl 后缀，n 取 RESIZE_WIDTHS 中不小于目标尺寸的最小值；
+        不带 .webp 扩展名，CDN 返回与原图相同的 JPEG（图片按 .jpg 保存）。目标尺寸超过所有宽度时返回 None（下载原图）
+
+        示例：
+            输入: https://down-sg.img.susercontent.com/file/sg-abc, 800
+            输出: https://down-sg.img.susercontent.com/file/sg-abc@resize_w900_nl
+        """
+        if not url or '@' in url:
+            return None
+        width = next((w for w in self.RESIZE_WIDTHS if w >= target_px), None)
+        if width is None:
+            return None
+        return f"{url}@resize_w{width}_nl"
+
     def _clean_text(self, text: str) -> str:
         """清理文本"""
         if not text:
@@ -0,0 +1,23 @@
+"""
+爬虫测试包
+
+这个包包含爬虫核心模块的测试代码，用于：
+1. 验证调度、重试和抓取日志的逻辑
+2. 验证数据库输出的写入方式
+
+当前包含的测试模块：
+- test_crawl_scheduler: 按站点调度、令牌桶和延后重试测试
+- test_crawl_journal: 抓取日志的续跑筛选测试
+- test_crawl_retry: 失败分类、退避时间和重试次数测试
+- test_crawl_pipeline: 流水线阶段顺序和失败记录测试
+- test_db_sink: 写入网页端数据库的插入、更新和失败重试测试
+
+运行方式（在 union_scraper_core 目录下）：
+    python -m pytest tests
+    python tests/test_crawl_scheduler.py
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+# Tests package
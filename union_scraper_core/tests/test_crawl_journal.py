@@ -0,0 +1,134 @@
+"""
+抓取日志测试模块
+
+测试中断后续跑时的商品筛选，包括：
+1. 已完成且未过期的商品默认跳过，未完成、过期或 URL 变化的重新处理
+2. --force 处理全部商品，--only-failed 只处理失败的商品
+3. 共享同一页面的商品 ID 任一未完成或失败时重新处理该页面
+4. 不同站点的同一商品 ID 各有一条记录，互不覆盖
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.crawl_journal import CrawlJournal, MODE_RESUME, MODE_FORCE, MODE_ONLY_FAILED
+from src.core.input_loader import build_url_fanout
+
+URL = "https://example.com/p/1"
+
+
+def make_product(*ids, url=URL):
+    """build_url_fanout 形式的页面（url_tag 为 main，键即商品 ID）"""
+    return {"id": ids[0], "url": url, "url_tag": "main", "key": ids[0], "ids": list(ids), "keys": list(ids)}
+
+
+def open_journal(fresh_hours=72):
+    """在临时目录中创建抓取日志，返回 (journal, 临时目录)"""
+    folder = tempfile.mkdtemp()
+    return CrawlJournal(os.path.join(folder, "journal.sqlite"), fresh_hours), folder
+
+
+def test_is_fresh():
+    """测试新近完成的判断：只有 done 且 URL 相同、未过期的记录算新近完成"""
+    print("🧪 测试新近完成...")
+
+    journal, folder = open_journal(fresh_hours=1)
+    try:
+        journal.mark("1", "fetched", url=URL)
+        assert not journal.is_fresh(journal.get("1"), URL)
+        journal.mark("1", "done")
+        record = journal.get("1")
+        assert journal.is_fresh(record, URL)
+        assert not journal.is_fresh(record, "https://example.com/p/other")
+        assert not journal.is_fresh(None, URL)
+        record["images_at"] = time.time() - 2 * 3600
+        assert not journal.is_fresh(record, URL)
+        print("✅ 新近完成测试通过")
+    finally:
+        journal.close()
+        shutil.rmtree(folder)
+
+
+def test_select_modes():
+    """测试三种运行模式的筛选结果"""
+    print("🧪 测试运行模式...")
+
+    journal, folder = open_journal()
+    try:
+        done, failed, partial, new = (make_product(i, url=f"{URL}/{i}") for i in ("1", "2", "3", "4"))
+        journal.mark("1", "done", url=done["url"])
+        journal.mark_failed("2", "fetch", "timeout", url=failed["url"])
+        journal.mark("3", "saved", url=partial["url"])
+        products = [done, failed, partial, new]
+
+        assert journal.select(products, MODE_RESUME) == [failed, partial, new]
+        assert journal.select(products, MODE_FORCE) == products
+        assert journal.select(products, MODE_ONLY_FAILED) == [failed]
+        print("✅ 运行模式测试通过")
+    finally:
+        journal.close()
+        shutil.rmtree(folder)
+
+
+def test_select_shared_page():
+    """测试共享页面：所有商品 ID 都完成才跳过，任一失败时 --only-failed 选中该页面"""
+    print("🧪 测试共享页面...")
+
+    journal, folder = open_journal()
+    try:
+        page = make_product("1", "7")
+        journal.mark("1", "done", url=URL)
+        assert journal.select([page]) == [page]
+
+        journal.mark("7", "done", url=URL)
+        assert journal.select([page]) == []
+
+        journal.mark_failed("7", "images", "saved 1/3 images", url=URL)
+        assert journal.select([page]) == [page]
+        assert journal.select([page], MODE_ONLY_FAILED) == [page]
+        print("✅ 共享页面测试通过")
+    finally:
+        journal.close()
+        shutil.rmtree(folder)
+
+
+def test_same_id_on_two_sites():
+    """测试同一商品 ID 出现在两个站点：按 站点:ID 分别记录，一个站点的结果不覆盖另一个"""
+    print("🧪 测试不同站点的同一 ID...")
+
+    sites = {"https://www.amazon.sg/dp/B01": "amazon", "https://www.fairprice.com.sg/product/2": "fairprice"}
+    rows = [{"id": "2", "url": url} for url in sites]
+    amazon, fairprice = build_url_fanout(rows, sites.get)
+    assert (amazon["key"], fairprice["key"]) == ("amazon:2", "fairprice:2")
+
+    journal, folder = open_journal()
+    try:
+        journal.mark(amazon["key"], "done", url=amazon["url"], site="amazon")
+        journal.mark(fairprice["key"], "done", url=fairprice["url"], site="fairprice")
+        assert journal.get("amazon:2")["url"] == amazon["url"]
+        assert journal.select([amazon, fairprice]) == []
+
+        journal.mark_failed(fairprice["key"], "fetch", "timeout", url=fairprice["url"])
+        assert journal.select([amazon, fairprice]) == [fairprice]
+        assert journal.select([amazon, fairprice], MODE_ONLY_FAILED) == [fairprice]
+        print("✅ 不同站点的同一 ID 测试通过")
+    finally:
+        journal.close()
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    test_is_fresh()
+    test_select_modes()
+    test_select_shared_page()
+    test_same_id_on_two_sites()
+    print("🎉 所有测试通过")
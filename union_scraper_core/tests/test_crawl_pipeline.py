@@ -0,0 +1,67 @@
+"""
+抓取流水线测试模块
+
+测试分阶段流水线的任务传递和失败处理，包括：
+1. 任务依次经过各阶段，返回 None 时到此结束
+2. 处理函数抛出异常时计入失败并交给 on_error 记录，其余任务照常处理
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.crawl_pipeline import CrawlPipeline
+
+
+def test_stages_in_order():
+    """测试任务依次经过各阶段"""
+    print("🧪 测试阶段顺序...")
+
+    written = []
+    pipeline = CrawlPipeline()
+    pipeline.add_stage("double", lambda item: item * 2, workers=2, queue_size=2)
+    pipeline.add_stage("write", lambda item: written.append(item), workers=1, queue_size=2)
+    pipeline.start()
+    for item in range(5):
+        pipeline.submit(item)
+    pipeline.close()
+
+    assert sorted(written) == [0, 2, 4, 6, 8]
+    assert [stage.metrics.processed for stage in pipeline.stages] == [5, 5]
+    print("✅ 阶段顺序测试通过")
+
+
+def test_stage_errors_reported():
+    """测试处理函数抛出异常时调用 on_error，且不影响其他任务"""
+    print("🧪 测试阶段失败...")
+
+    errors, written = [], []
+
+    def images(item):
+        if item == 3:
+            raise RuntimeError("probe failed")
+        return item
+
+    pipeline = CrawlPipeline(on_error=lambda stage, item, error: errors.append((stage, item, str(error))))
+    pipeline.add_stage("images", images)
+    pipeline.add_stage("write", written.append)
+    pipeline.start()
+    for item in range(5):
+        pipeline.submit(item)
+    pipeline.close()
+
+    assert errors == [("images", 3, "probe failed")]
+    assert sorted(written) == [0, 1, 2, 4]
+    assert pipeline.stages[0].metrics.failed == 1
+    print("✅ 阶段失败测试通过")
+
+
+if __name__ == "__main__":
+    test_stages_in_order()
+    test_stage_errors_reported()
+    print("🎉 所有测试通过")
@@ -0,0 +1,114 @@
+"""
+失败重试测试模块
+
+测试抓取失败的分类和重试等待时间，包括：
+1. 404 / 未支持的网站为永久失败，一般异常（包括 ValueError）为临时失败
+2. 指数退避的等待时间、上限和抖动范围
+3. 临时失败在次数上限内重试，成功后计入恢复
+4. 不同站点的同一商品 ID 分别计数，互不清除
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.crawl_retry import (
+    FailureTracker, PermanentFetchError, UnsupportedSiteError, classify_error, get_backoff,
+    DEFAULT_RETRY_CONFIG, FAILURE_PERMANENT, FAILURE_TRANSIENT
+)
+
+
+class FakeResponse:
+    """只带状态码的响应"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeHTTPError(Exception):
+    """与 requests.HTTPError 一样通过 response 携带状态码的异常"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code)
+
+
+def test_classify_error():
+    """测试失败分类"""
+    print("🧪 测试失败分类...")
+
+    assert classify_error(PermanentFetchError("HTTP 404", 404)) == FAILURE_PERMANENT
+    assert classify_error(UnsupportedSiteError("Unsupported site type for url: x")) == FAILURE_PERMANENT
+    assert classify_error(FileNotFoundError("local html")) == FAILURE_PERMANENT
+    assert classify_error(FakeHTTPError(410)) == FAILURE_PERMANENT
+    assert classify_error(FakeHTTPError(503)) == FAILURE_TRANSIENT
+    # 抓取过程中的一般 ValueError 不再视为永久失败
+    assert classify_error(ValueError("could not convert string to float")) == FAILURE_TRANSIENT
+    assert classify_error(TimeoutError("page load")) == FAILURE_TRANSIENT
+    assert classify_error("invalid url") == FAILURE_PERMANENT
+    assert classify_error("no html") == FAILURE_TRANSIENT
+    print("✅ 失败分类测试通过")
+
+
+def test_get_backoff():
+    """测试退避时间：按倍数增长，不超过上限，抖动在 ±20% 以内"""
+    print("🧪 测试退避时间...")
+
+    config = dict(DEFAULT_RETRY_CONFIG, backoff_seconds=10, backoff_factor=2, max_backoff_seconds=35)
+    for attempt, base in ((1, 10), (2, 20), (3, 35), (6, 35)):
+        for _ in range(50):
+            delay = get_backoff(attempt, config)
+            assert base * 0.8 <= delay <= base * 1.2, (attempt, delay)
+    print("✅ 退避时间测试通过")
+
+
+def test_failure_tracker():
+    """测试重试次数上限、永久失败不重试以及重试后成功"""
+    print("🧪 测试失败记录...")
+
+    tracker = FailureTracker({"max_attempts": 2, "backoff_seconds": 1})
+    kind, delay = tracker.record_failure("1", "u1", "amazon", "fetch", "no html")
+    assert kind == FAILURE_TRANSIENT and delay is not None
+    assert tracker.attempt("1") == 2
+    kind, delay = tracker.record_failure("1", "u1", "amazon", "fetch", "no html")
+    assert delay is None
+
+    kind, delay = tracker.record_failure("2", "u2", "amazon", "fetch", PermanentFetchError("HTTP 404", 404))
+    assert kind == FAILURE_PERMANENT and delay is None
+
+    tracker.record_failure("3", "u3", "amazon", "fetch", "no html")
+    tracker.record_success("3")
+    assert [failure["id"] for failure in tracker.failures()] == ["1", "2"]
+    assert tracker.failures(FAILURE_PERMANENT)[0]["id"] == "2"
+    assert "recovered 1" in tracker.format_summary()[0]
+    print("✅ 失败记录测试通过")
+
+
+def test_same_id_on_two_sites():
+    """测试同一商品 ID 出现在两个站点：重试次数和失败记录按 站点:ID 分开"""
+    print("🧪 测试不同站点的同一 ID...")
+
+    tracker = FailureTracker({"max_attempts": 2, "backoff_seconds": 1})
+    tracker.record_failure("amazon:2", "u1", "amazon", "fetch", "no html")
+    tracker.record_failure("fairprice:2", "u2", "fairprice", "fetch", "no html")
+    assert tracker.attempt("amazon:2") == 2 and tracker.attempt("fairprice:2") == 2
+
+    # 一个站点重试成功不清除另一个站点的失败，另一个站点用完自己的次数后放弃
+    tracker.record_success("amazon:2")
+    kind, delay = tracker.record_failure("fairprice:2", "u2", "fairprice", "fetch", "no html")
+    assert delay is None
+    assert [failure["id"] for failure in tracker.failures()] == ["fairprice:2"]
+    print("✅ 不同站点的同一 ID 测试通过")
+
+
+if __name__ == "__main__":
+    test_classify_error()
+    test_get_backoff()
+    test_failure_tracker()
+    test_same_id_on_two_sites()
+    print("🎉 所有测试通过")
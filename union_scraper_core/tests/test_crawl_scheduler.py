@@ -0,0 +1,128 @@
+"""
+调度器测试模块
+
+测试按站点调度商品，包括：
+1. 令牌桶的突发容量和限速等待
+2. 取批次时先取到期的重试商品，只剩等待重试的商品时等到重试时间
+3. 重试计入任务总数，全部处理完（含重试）后 run() 才返回
+4. 站点并发不超过 max_concurrency，工作函数抛出的异常计入失败
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.crawl_scheduler import CrawlScheduler, TokenBucket, DEFAULT_SITE_BUDGET
+
+
+def make_budget(**fields):
+    """默认站点预算加上指定字段"""
+    budget = dict(DEFAULT_SITE_BUDGET)
+    budget.update(fields)
+    return budget
+
+
+def test_token_bucket():
+    """测试令牌桶：容量内立即取到，用完后按速率等待，速率为 0 时不限速"""
+    print("🧪 测试令牌桶...")
+
+    bucket = TokenBucket(requests_per_minute=600, burst=2)  # 每 0.1 秒一个令牌
+    started = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - started < 0.05
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.08
+
+    unlimited = TokenBucket(requests_per_minute=0, burst=1)
+    started = time.monotonic()
+    for _ in range(100):
+        unlimited.acquire()
+    assert time.monotonic() - started < 0.05
+    print("✅ 令牌桶测试通过")
+
+
+def test_take_batch_prefers_due_retries():
+    """测试取批次：到期的重试商品优先，未到期的留在堆中，只剩未到期的商品时等待"""
+    print("🧪 测试取批次...")
+
+    scheduler = CrawlScheduler({"a": make_budget(requests_per_minute=0)}, batch_size=2, progress_interval=0)
+    scheduler.add("a", "new-1")
+    scheduler.add("a", "new-2")
+    site = scheduler.sites["a"]
+    scheduler.retry("a", "retry-due", 0)
+    scheduler.retry("a", "retry-later", 0.2)
+    assert site.total == 4 and site.retries == 2
+
+    assert scheduler._take_batch(site) == ["retry-due", "new-1"]
+    assert scheduler._take_batch(site) == ["new-2"]
+    started = time.monotonic()
+    assert scheduler._take_batch(site) == ["retry-later"]
+    assert time.monotonic() - started >= 0.15
+    assert scheduler._take_batch(site) == []
+    print("✅ 取批次测试通过")
+
+
+def test_run_waits_for_retries():
+    """测试 run()：工作函数中重新加入的商品处理完后才返回，完成数包含重试"""
+    print("🧪 测试重试后完成...")
+
+    scheduler = CrawlScheduler({"a": make_budget(requests_per_minute=0)}, progress_interval=0)
+    for item in ("x", "y"):
+        scheduler.add("a", item)
+    seen = []
+
+    def worker(site_name, batch):
+        for item in batch:
+            seen.append(item)
+            if item == "x":
+                scheduler.retry(site_name, "x-retry", 0.05)
+
+    scheduler.run(worker)
+    site = scheduler.sites["a"]
+    assert sorted(seen) == ["x", "x-retry", "y"]
+    assert site.done == site.total == 3
+    assert site.finished is not None and not site.delayed
+    print("✅ 重试后完成测试通过")
+
+
+def test_concurrency_limit_and_failures():
+    """测试站点并发不超过上限，工作函数的异常计入失败但不影响其他商品"""
+    print("🧪 测试并发上限...")
+
+    scheduler = CrawlScheduler({"a": make_budget(max_concurrency=2, requests_per_minute=0)}, progress_interval=0)
+    for item in range(6):
+        scheduler.add("a", item)
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def worker(site_name, batch):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        if batch == [3]:
+            raise RuntimeError("boom")
+
+    scheduler.run(worker)
+    site = scheduler.sites["a"]
+    assert state["peak"] == 2
+    assert site.done == 6 and site.failed == 1
+    print("✅ 并发上限测试通过")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_take_batch_prefers_due_retries()
+    test_run_waits_for_retries()
+    test_concurrency_limit_and_failures()
+    print("🎉 所有测试通过")
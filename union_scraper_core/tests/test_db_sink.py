@@ -0,0 +1,132 @@
+"""
+数据库输出测试模块
+
+测试将商品写入网页端数据库的 sources / products 表，包括：
+1. 新商品插入、已有来源更新，已有商品的标注数据保留
+2. 带 URL 标签的商品与网页端导入一样按站点名称更新已有的来源
+3. 一批中有商品写入失败时，其余商品逐个重试后仍然写入
+
+作者: Union Product Marker Team
+版本: 1.0.0
+"""
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.db_sink import DbSink
+
+# 与网页端 app/utils/db_util.init_db 中 products / sources 表的结构一致
+SCHEMA = """
+CREATE TABLE products (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    brand TEXT,
+    price_orig REAL,
+    price_curr REAL,
+    description TEXT,
+    meta_info TEXT,
+    specs TEXT,
+    extra_sections TEXT,
+    status TEXT,
+    completeness INTEGER,
+    annotation_data TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id TEXT,
+    source_name TEXT,
+    raw_json TEXT,
+    uploaded_at TEXT
+);
+"""
+
+
+def create_database():
+    """在临时目录中创建网页端数据库，返回 (数据库路径, 临时目录)"""
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "database.db")
+    with sqlite3.connect(path) as db:
+        db.executescript(SCHEMA)
+    return path, folder
+
+
+def read_sources(path):
+    """读取 {(商品 ID, 来源): raw_json}"""
+    with sqlite3.connect(path) as db:
+        rows = db.execute("SELECT product_id, source_name, raw_json FROM sources").fetchall()
+    return {(product_id, source_name): json.loads(raw) for product_id, source_name, raw in rows}
+
+
+def test_insert_and_update():
+    """测试插入与更新的计数，带 URL 标签的商品更新站点名称下已有的来源"""
+    print("🧪 测试插入与更新...")
+
+    path, folder = create_database()
+    try:
+        with sqlite3.connect(path) as db:
+            # 网页端已导入的数据：来源为站点名称，商品已有标注
+            db.execute("INSERT INTO products (id, name, annotation_data) VALUES ('1', 'old', '{\"checked\": true}')")
+            db.execute("INSERT INTO sources (product_id, source_name, raw_json) VALUES ('1', 'amazon', '{}')")
+
+        sink = DbSink(path, batch_size=10, flush_seconds=0.1)
+        sink.put("amazon", {"id": "1", "product_name": "A pack", "url_tag": "package"})
+        sink.put("amazon", {"id": "2", "product_name": "B", "url_tag": "package"})
+        sink.put("fairprice", {"id": "2", "product_name": "B fp"})
+        sink.close()
+        assert (sink.inserted, sink.updated, sink.failed) == (2, 1, 0)
+
+        sink = DbSink(path, batch_size=10, flush_seconds=0.1)
+        sink.put("amazon", {"id": "2", "product_name": "B2", "url_tag": "package"})
+        sink.close()
+        assert (sink.inserted, sink.updated, sink.failed) == (0, 1, 0)
+
+        sources = read_sources(path)
+        assert set(sources) == {("1", "amazon"), ("2", "amazon"), ("2", "fairprice")}
+        assert sources[("1", "amazon")]["product_name"] == "A pack"
+        assert sources[("2", "amazon")]["product_name"] == "B2"
+        with sqlite3.connect(path) as db:
+            row = db.execute("SELECT name, annotation_data FROM products WHERE id = '1'").fetchone()
+            assert row == ("old", '{"checked": true}')
+            assert db.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 2
+        print("✅ 插入与更新测试通过")
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_retry_rows_after_batch_failure():
+    """测试一批中有商品写入失败时其余商品逐个写入"""
+    print("🧪 测试逐个重试...")
+
+    path, folder = create_database()
+    try:
+        with sqlite3.connect(path) as db:
+            # 模拟只拒绝某一个商品的约束
+            db.execute(
+                "CREATE TRIGGER reject_bad BEFORE INSERT ON sources WHEN NEW.product_id = 'bad' "
+                "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+            )
+
+        sink = DbSink(path, batch_size=10, flush_seconds=0.1)
+        for product_id in ("1", "bad", "2"):
+            sink.put("fairprice", {"id": product_id, "product_name": product_id})
+        sink.close()
+        assert (sink.inserted, sink.failed) == (2, 1)
+        assert set(read_sources(path)) == {("1", "fairprice"), ("2", "fairprice")}
+        print("✅ 逐个重试测试通过")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    test_insert_and_update()
+    test_retry_rows_after_batch_failure()
+    print("🎉 所有测试通过")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+多标签页抓取基准测试工具
+
+此工具用于比较在同一个 Chrome 进程中使用不同数量标签页抓取时的表现，主要指标包括：
+1. 吞吐量（页面/分钟）
+2. Chrome 进程树的内存峰值（需安装 psutil）
+3. 成功抓取的页面数
+
+使用方法：
+    在项目根目录运行：python -m tools.tool_bench_tabs [页面数量]
+    默认从 config.json 启用的输入文件中取前 16 个使用浏览器引擎的 URL，
+    依次以 1、4、8 个标签页抓取，每轮都使用全新的浏览器。
+"""
+
+import sys
+import json
+import time
+import threading
+from loguru import logger
+from src.core.input_loader import load_input_files
+from src.core.driver_pool import init_driver_pool, shutdown_driver_pool
+from src.core.tab_fetcher import fetch_pages_in_tabs
+from src.models.scraper_factory import ScraperFactory
+
+# ===== 配置常量 =====
+# 要比较的标签页数量
+TAB_COUNTS = (1, 4, 8)
+# 默认抓取的页面数量
+DEFAULT_PAGE_COUNT = 16
+# 内存采样间隔（秒）
+RSS_SAMPLE_INTERVAL = 0.5
+# ====================
+
+def build_jobs(config, page_count):
+    """
+    从输入文件中挑选使用浏览器引擎的商品，生成抓取任务（不保存 HTML）
+
+    Args:
+        config (dict): 配置字典
+        page_count (int): 需要的任务数量
+
+    Returns:
+        list[dict]: 抓取任务列表
+    """
+    jobs = []
+    for product in load_input_files(config):
+        url = product["url"]
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            continue
+        try:
+            scraper = ScraperFactory.create_scraper(url, product["id"], config)
+        except Exception:
+            continue
+        job = scraper.get_fetch_job()
+        if not job:
+            continue
+        job["save_path"] = None
+        jobs.append(job)
+        if len(jobs) >= page_count:
+            break
+    return jobs
+
+def run_round(jobs, tabs):
+    """
+    使用指定标签页数量抓取一轮
+
+    Args:
+        jobs (list[dict]): 抓取任务
+        tabs (int): 标签页数量
+
+    Returns:
+        dict: 本轮的耗时、成功数和内存峰值
+    """
+    pool = init_driver_pool({"size": 1, "max_pages_per_driver": 0})
+    pool.warm_up()
+
+    peak_rss = [0.0]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.is_set():
+            peak_rss[0] = max(peak_rss[0], pool.rss_mb())
+            stop.wait(RSS_SAMPLE_INTERVAL)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    started = time.time()
+    results = fetch_pages_in_tabs(jobs, max_tabs=tabs)
+    elapsed = time.time() - started
+
+    stop.set()
+    sampler.join()
+    shutdown_driver_pool()
+
+    return {
+        "tabs": tabs,
+        "pages": len(jobs),
+        "succeeded": sum(1 for html in results if html),
+        "seconds": elapsed,
+        "pages_per_minute": len(jobs) / elapsed * 60 if elapsed else 0,
+        "peak_rss_mb": peak_rss[0],
+    }
+
+def main(page_count=DEFAULT_PAGE_COUNT):
+    """
+    主函数：依次运行各标签页数量的基准测试并输出对比表
+
+    Args:
+        page_count (int): 每轮抓取的页面数量
+    """
+    config = json.load(open('config.json', 'r', encoding='utf-8'))
+    jobs = build_jobs(config, page_count)
+    if not jobs:
+        logger.error("没有可用于基准测试的浏览器抓取任务")
+        return
+
+    logger.info(f"使用 {len(jobs)} 个页面进行基准测试")
+    rows = []
+    for tabs in TAB_COUNTS:
+        logger.info(f"开始测试：{tabs} 个标签页")
+        rows.append(run_round(jobs, tabs))
+
+    logger.info("tabs | pages | ok | seconds | pages/min | peak RSS (MB)")
+    for row in rows:
+        logger.info(
+            f"{row['tabs']:>4} | {row['pages']:>5} | {row['succeeded']:>2} | {row['seconds']:>7.1f} | "
+            f"{row['pages_per_minute']:>9.1f} | {row['peak_rss_mb']:>13.0f}"
+        )
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PAGE_COUNT)
@@ -4,8 +4,10 @@
 
 此工具用于合并output目录下所有的商品JSON文件，主要功能包括：
 1. 按照不同网站来源对商品数据进行分类
-2. 为每个商品数据添加本地图片路径信息（local_images字段）
-3. 生成一个包含所有商品数据的合并JSON文件
+2. 为每个商品数据添加本地图片路径信息（local_images字段），
+   延迟下载模式下图片清单（*.images.json）中尚未下载的图片也会列入，网页端首次访问时下载
+3. 启用 crawler.image_derivatives 时，添加已生成的衍生图路径（derived_images字段）
+4. 生成一个包含所有商品数据的合并JSON文件
 
 使用方法：
     直接运行此脚本：python tools/tool_merge_json.py
@@ -16,12 +18,15 @@ import json
 from loguru import logger
 from src.utils.file_utils import write_json
 from src.utils.time_utils import get_iso_timestamp
+from src.core.image_derivatives import derived_paths
 
 # ===== 配置常量 =====
 # output目录的绝对路径，用于存放商品数据和图片
 OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../output"))
 # 配置文件路径，包含各网站的配置信息
 CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../config.json"))
+# 图片清单文件后缀（延迟下载模式，见 BaseScraper.write_image_manifest）
+MANIFEST_SUFFIX = ".images.json"
 # ====================
 
 def load_config():
@@ -51,6 +56,28 @@ def get_prefix_from_filename(filename):
     parts = filename.split('_')
     return parts[0] if parts else None
 
+def load_manifest_images(sub_path, prefix):
+    """
+    读取目录中与网站前缀匹配的图片清单，返回清单中列出的图片文件名
+
+    Args:
+        sub_path (str): 商品目录
+        prefix (str): 网站前缀
+
+    Returns:
+        list: 图片文件名列表（按清单顺序）
+    """
+    filenames = []
+    for fname in sorted(os.listdir(sub_path)):
+        if not fname.endswith(MANIFEST_SUFFIX) or get_prefix_from_filename(fname) != prefix:
+            continue
+        try:
+            with open(os.path.join(sub_path, fname), "r", encoding="utf-8") as f:
+                filenames.extend(image["file"] for image in json.load(f).get("images", []))
+        except Exception as e:
+            logger.error(f"无法读取图片清单 {fname}: {e}")
+    return filenames
+
 def merge_all_jsons(output_dir, sites_config):
     """
     遍历output目录下所有子目录，合并商品JSON数据并添加本地图片信息
@@ -82,7 +109,7 @@ def merge_all_jsons(output_dir, sites_config):
 
         # 遍历目录中的所有JSON文件
         for filename in os.listdir(sub_path):
-            if not filename.endswith('.json'):
+            if not filename.endswith('.json') or filename.endswith(MANIFEST_SUFFIX):
                 continue
 
             # 从JSON文件名获取前缀
@@ -106,7 +133,24 @@ def merge_all_jsons(output_dir, sites_config):
                             if img_prefix == prefix:
                                 local_images.append(f"{subdir}/{fname}")
 
+                    # 延迟下载模式：补充清单中尚未下载的图片
+                    for fname in load_manifest_images(sub_path, prefix):
+                        if f"{subdir}/{fname}" not in local_images:
+                            local_images.append(f"{subdir}/{fname}")
+
                     data["local_images"] = local_images
+
+                    # 衍生图（标准化图、预览图、缩略图），只列出已生成的文件
+                    derived_images = {}
+                    for image in local_images:
+                        paths = derived_paths(os.path.join(output_dir, image))
+                        if all(os.path.exists(path) for path in paths.values()):
+                            derived_images[image] = {
+                                kind: os.path.relpath(path, output_dir).replace(os.sep, "/")
+                                for kind, path in paths.items()
+                            }
+                    if derived_images:
+                        data["derived_images"] = derived_images
                     
                     # 将数据添加到对应网站的列表中
                     site_name = prefix_to_name[prefix]
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+HTML 精简校验工具
+
+此工具用于确认 HTML 精简（sites[].fetch.minify）不会影响解析结果，主要功能包括：
+1. 对 html_dir 中的每个 HTML 文件，分别解析原始内容和精简后的内容
+2. 比较两次解析得到的 ProductData（忽略 crawled_at），报告不一致的文件
+3. 统计精简前后的文件大小
+4. 使用 --apply 时，将解析结果一致的文件原地替换为精简版本
+
+使用方法：
+    在项目根目录运行：python -m tools.tool_verify_minify [--apply]
+    精简规则取自 config.json 中各站点的 fetch.minify（未启用的站点也会按其保留列表校验）。
+"""
+
+import os
+import sys
+import json
+from loguru import logger
+from src.core.fetch_rules import get_fetch_rules
+from src.core.html_minifier import get_minify_rules, minify_html
+from src.models.scraper_factory import ScraperFactory
+
+# ===== 配置常量 =====
+# 比较时忽略的字段（每次解析都会变化）
+IGNORED_FIELDS = ("crawled_at",)
+# ====================
+
+def parse_html(scraper, html, product_id):
+    """
+    使用站点爬虫解析 HTML，返回用于比较的字典
+
+    Args:
+        scraper (BaseScraper): 站点爬虫
+        html (str): HTML 内容
+        product_id (str): 商品 ID
+
+    Returns:
+        dict: 解析结果（已去掉忽略字段），解析异常时返回 {"error": 异常信息}
+    """
+    try:
+        data = scraper.parse_product_data(html, product_id, "").to_dict()
+    except Exception as e:
+        return {"error": str(e)}
+    for key in IGNORED_FIELDS:
+        data.pop(key, None)
+    return data
+
+def verify_file(scraper, minify_rules, html_file, product_id):
+    """
+    校验单个 HTML 文件
+
+    Args:
+        scraper (BaseScraper): 站点爬虫
+        minify_rules (dict): 精简规则
+        html_file (str): HTML 文件路径
+        product_id (str): 商品 ID
+
+    Returns:
+        tuple: (是否一致, 原始大小, 精简后大小, 精简后的 HTML)
+    """
+    with open(html_file, "r", encoding="utf-8") as f:
+        html = f.read()
+    minified = minify_html(html, minify_rules)
+    same = parse_html(scraper, html, product_id) == parse_html(scraper, minified, product_id)
+    return same, len(html.encode("utf-8")), len(minified.encode("utf-8")), minified
+
+def main(apply=False):
+    """
+    主函数：校验 html_dir 下所有 HTML 文件的精简结果
+
+    Args:
+        apply (bool): 是否将校验通过的文件替换为精简版本
+    """
+    config = json.load(open('config.json', 'r', encoding='utf-8'))
+    html_dir = config['output']['html_dir']
+    if not os.path.isdir(html_dir):
+        logger.error(f"HTML 目录不存在: {html_dir}")
+        return
+
+    sites = {site['prefix']: site for site in config['sites']}
+    totals = {"files": 0, "mismatched": 0, "before": 0, "after": 0}
+
+    for filename in sorted(os.listdir(html_dir)):
+        if not filename.endswith('.html'):
+            continue
+        prefix, _, rest = filename[:-len('.html')].partition('_')
+        site = sites.get(prefix)
+        if not site or site['name'] not in ScraperFactory._scrapers:
+            logger.warning(f"跳过无法识别站点的文件: {filename}")
+            continue
+
+        scraper = ScraperFactory._scrapers[site['name']](site['name'], config)
+        minify_rules = get_minify_rules(get_fetch_rules(site))
+        html_file = os.path.join(html_dir, filename)
+        same, before, after, minified = verify_file(scraper, minify_rules, html_file, rest)
+
+        totals["files"] += 1
+        totals["before"] += before
+        totals["after"] += after
+        if not same:
+            totals["mismatched"] += 1
+            logger.error(f"解析结果不一致: {filename}")
+            continue
+        if apply and after < before:
+            with open(html_file, "w", encoding="utf-8") as f:
+                f.write(minified)
+
+    saved = (1 - totals["after"] / totals["before"]) * 100 if totals["before"] else 0
+    logger.info(
+        f"共校验 {totals['files']} 个文件，不一致 {totals['mismatched']} 个；"
+        f"大小 {totals['before'] / 1024 / 1024:.1f} MB -> {totals['after'] / 1024 / 1024:.1f} MB（减少 {saved:.1f}%）"
+    )
+    if apply:
+        logger.info("已将解析结果一致的文件替换为精简版本")
+
+if __name__ == "__main__":
+    main(apply="--apply" in sys.argv[1:])